@@ -0,0 +1,46 @@
+// Build the static site for production into dist/ (or the directory given as argument):
+// - JS and CSS files get a content hash in their name (styles.3f2a9c0b1d.css) and the
+//   pages are rewritten to reference them, so they can be cached forever (immutable)
+// - every page and asset gets a gzip copy (.gz) next to it, which nginx sends to
+//   clients accepting gzip (gzip_static) instead of compressing on each request
+import { createHash } from "node:crypto";
+import { mkdirSync, readdirSync, readFileSync, rmSync, writeFileSync } from "node:fs";
+import { extname, join } from "node:path";
+import { gzipSync } from "node:zlib";
+
+const outDir = process.argv[2] || "dist";
+const assets = ["styles.css", "predict.js", "navigation.js"];
+const pages = readdirSync(".").filter((file) => extname(file) === ".html");
+const compressible = new Set([".html", ".css", ".js"]);
+
+function fingerprint(file) {
+  const hash = createHash("sha256").update(readFileSync(file)).digest("hex").slice(0, 10);
+  const ext = extname(file);
+  return `${file.slice(0, -ext.length)}.${hash}${ext}`;
+}
+
+function write(file, content) {
+  const path = join(outDir, file);
+  writeFileSync(path, content);
+  if (compressible.has(extname(file))) {
+    writeFileSync(`${path}.gz`, gzipSync(content, { level: 9 }));
+  }
+}
+
+rmSync(outDir, { recursive: true, force: true });
+mkdirSync(outDir, { recursive: true });
+
+const renamed = new Map(assets.map((asset) => [asset, fingerprint(asset)]));
+for (const [asset, name] of renamed) {
+  write(name, readFileSync(asset));
+}
+
+for (const page of pages) {
+  let html = readFileSync(page, "utf8");
+  for (const [asset, name] of renamed) {
+    html = html.replace(new RegExp(`(src|href)="(\\./|/)?${asset.replace(".", "\\.")}"`, "g"), `$1="$2${name}"`);
+  }
+  write(page, html);
+}
+
+console.log(`Built ${pages.length} pages and ${renamed.size} fingerprinted assets into ${outDir}/`);
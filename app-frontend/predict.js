@@ -32,7 +32,7 @@ window.addEventListener('DOMContentLoaded', () => {
     document.getElementById("restaurant-name-display").innerHTML = `🍽️ ${selectedRestaurant}`;
     document.title = `${selectedRestaurant} - Sentiment Review`;
 
-    // Load sample reviews
+    // Load the restaurant's review feed
     loadReviews(selectedRestaurant);
   }
 });
@@ -135,45 +135,62 @@ async function send_review() {
   }
 }
 
-// Sample review data
-const sampleReviews = {
-  "McDonald's": [
-    { user: "User1", review: "Great value meals and fast service!", sentiment: "positive" },
-    { user: "User2", review: "The fries were cold when I got them.", sentiment: "negative" },
-  ],
-  KFC: [
-    { user: "User3", review: "Best fried chicken in town!", sentiment: "positive" },
-    { user: "User4", review: "Too greasy and the wait was too long.", sentiment: "negative" },
-  ],
-  "Burger King": [
-    { user: "User5", review: "The Whopper is still my favorite burger.", sentiment: "positive" },
-    { user: "User6", review: "Service was slow during lunch hour.", sentiment: "negative" },
-  ],
-  "Wendy's": [
-    { user: "User7", review: "Fresh ingredients and great salad options.", sentiment: "positive" },
-    { user: "User8", review: "The restaurant was not clean.", sentiment: "negative" },
-  ],
-  "Pizza Planet": [
-    { user: "User1", review: "This place is amazing!", sentiment: "positive" },
-    { user: "User2", review: "Worst restaurant in town!", sentiment: "negative" },
-  ],
-};
-
-// Load sample reviews for the selected restaurant
-function loadReviews(selectedRestaurant) {
-  const reviews = sampleReviews[selectedRestaurant] || [];
+// Load the review feed of the selected restaurant from the app-service, one page at a time.
+// Sentiments are computed by the app-service when reviews are ingested, so showing them costs
+// no predictions, and the browser revalidates unchanged pages with their ETag (304).
+async function loadReviews(selectedRestaurant, cursor = null) {
   const container = document.getElementById("reviews-container");
   if (!container) return;
 
-  container.innerHTML = "";
+  let apiBaseUrlToUse;
+  if (window.APP_CONFIG && window.APP_CONFIG.API_BASE_URL) {
+    apiBaseUrlToUse = window.APP_CONFIG.API_BASE_URL;
+  } else if (window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1") {
+    apiBaseUrlToUse = "http://localhost:5000";
+  } else {
+    apiBaseUrlToUse = "http://app-service:5000";
+  }
+
+  const params = new URLSearchParams({ restaurant: selectedRestaurant });
+  if (cursor !== null) params.set("cursor", cursor);
+
+  const loadMoreButton = document.getElementById("load-more-reviews");
+  if (loadMoreButton) loadMoreButton.remove();
+  if (cursor === null) container.innerHTML = "";
 
-  reviews.forEach((item, index) => {
+  let feed;
+  try {
+    const response = await fetch(`${apiBaseUrlToUse}/reviews?${params}`);
+    if (!response.ok) throw new Error(await response.text());
+    feed = await response.json();
+  } catch (error) {
+    console.error("Loading reviews failed:", error);
+    const message = document.createElement("p");
+    message.textContent = "Reviews could not be loaded.";
+    container.appendChild(message);
+    return;
+  }
+
+  feed.reviews.forEach((item) => {
     const emoji = item.sentiment === "positive" ? "😄" : "☹️";
     const reviewCard = document.createElement("div");
     reviewCard.className = "review-card";
-    reviewCard.innerHTML = `<p><strong>User${index + 1}:</strong> ${emoji} ${item.review}</p>`;
+    const paragraph = document.createElement("p");
+    const author = document.createElement("strong");
+    // Review texts are user input, never insert them as HTML
+    author.textContent = `${item.author || "Guest"}:`;
+    paragraph.append(author, ` ${emoji} ${item.review}`);
+    reviewCard.appendChild(paragraph);
     container.appendChild(reviewCard);
   });
+
+  if (feed.next_cursor !== null) {
+    const button = document.createElement("button");
+    button.id = "load-more-reviews";
+    button.textContent = "Load more reviews";
+    button.addEventListener("click", () => loadReviews(selectedRestaurant, feed.next_cursor));
+    container.after(button);
+  }
 }
 
 // Function to show star rating options after prediction
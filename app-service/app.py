@@ -1,39 +1,66 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flasgger import Swagger
+from flasgger.utils import CachedLazyString
 import requests
-import json
+import math
 import os
 from loguru import logger
-import sys
 import time
-from prometheus_client import Counter, Gauge, Histogram, make_wsgi_app
+from prometheus_client import Counter, Histogram
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from config import (
     LIB_VERSION_AVAILABLE, 
     get_app_version, 
     SWAGGER_CONFIG, 
     SWAGGER_TEMPLATE,
-    get_model_service_url
+    MODEL_SERVICE_VERSION_READ_TIMEOUT,
+    LAZY_STARTUP,
+    PROFILER_ENABLED,
+    PROFILER_MAX_SECONDS,
+    PROFILER_INTERVAL_MS,
+    MODEL_SERVICE_BATCH_PATH,
+    PREDICT_BATCH_MAX_SIZE,
+    TRACK_BATCH_MAX_EVENTS,
+    MICRO_BATCH_ENABLED,
+    SINGLE_FLIGHT_ENABLED,
+    PREDICT_PASSTHROUGH,
+    STREAM_CHUNK_SIZE,
+    STREAM_MAX_IN_FLIGHT,
+    STREAM_WORKERS,
+    STREAM_MAX_LINE_BYTES,
+    RATINGS_WRITE_BEHIND,
+    RATINGS_PAGE_SIZE,
+    RATINGS_MAX_PAGE_SIZE,
+    RATINGS_HISTOGRAM_MAX_BUCKETS,
+    REVIEWS_PAGE_SIZE,
+    REVIEWS_MAX_PAGE_SIZE
 )
+from model_client import model_client, ModelServiceError
+from load_balancer import model_router
+from circuit_breaker import CircuitOpenError, model_service_breaker
+from batching import MicroBatcher
+from singleflight import SingleFlight, make_flight_key
+from concurrency_limit import ConcurrencyLimitExceeded, create_concurrency_limiter, is_priority_variant
+from profiling import StageTimer, ProfilerBusy, sampling_profiler
+from passthrough import PassthroughResponse, read_passthrough
+from http_caching import finalize_response, matching_etag
+from sentiment_windows import SlidingWindowStats, WINDOW_GAUGES
+from json_provider import create_json_provider, json_dumps, json_loads
+from ratings_store import RatingsStore, INTERVALS
+from rating_writer import WriteBehindRatingWriter
+from metrics_exporter import create_metrics_app, metrics_source, read_window_stats
+from prediction_cache import create_prediction_cache, make_cache_key
+from version_cache import VersionCache
+from readiness import StartupProbe
+from logging_setup import configure_logging
 from datetime import datetime
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-# Global storage (replace with DB in production)
-RATINGS_FILE = 'ratings.json'
-
-# Configure loguru
-logger.remove()  # Remove default handler
-
-# Add stdout handler - this is what Docker will capture
-logger.add(
-    sys.stdout,
-    colorize=True,  # Enable colors for better readability
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{function}</cyan>: {message}",
-    level="INFO",
-    backtrace=True,
-    diagnose=True,
-)
+# Configure loguru (queued stdout sink, see logging_setup.py)
+configure_logging()
 
 # Initialize Prometheus metrics
 # 1. Counter for tracking total number of predictions
@@ -48,10 +75,8 @@ PREDICTION_COUNT.labels(sentiment='negative').inc(0)
 PREDICTION_COUNT.labels(sentiment='unknown').inc(0)
 
 # 2. Gauge for tracking ratio of positive to negative sentiments
-SENTIMENT_RATIO = Gauge(
-    'sentiment_positive_ratio',
-    'Ratio of positive to total sentiments (0-1)'
-)
+# sentiment_positive_ratio is derived from sentiment_predictions_total at scrape time
+# (see metrics_exporter.SentimentRatioCollector) so it aggregates correctly across workers.
 
 # 3. Histogram for tracking prediction response time
 PREDICTION_LATENCY = Histogram(
@@ -81,28 +106,48 @@ USER_RATINGS = Histogram(
     buckets=[1, 2, 3, 4, 5, 6]  # Buckets for rating values (1-5 stars)
 )
 
-# Initialize counters for calculating the ratio
-# Note: These global variables may not behave as expected in a multi-worker setup
-# without specific prometheus_client multi-process configuration.
-positive_count = 0
-total_count = 0
-
-# Get MODEL_SERVICE_URL dynamically (can be updated at runtime via env var)
-MODEL_SERVICE_URL = get_model_service_url()
-logger.info("Current MODEL_SERVICE_URL: {}", MODEL_SERVICE_URL)
-logger.info("Testing connection to model service at {}", MODEL_SERVICE_URL)
-
-# Test the current MODEL_SERVICE_URL "/" endpoint
-try:
-    response = requests.get(f"{MODEL_SERVICE_URL}/", timeout=5)
-    if response.status_code == 200:
-        logger.info("Model service is reachable at {}", MODEL_SERVICE_URL)
+# Prediction volume, sentiment mix and latency per experiment variant over sliding windows,
+# read back for GET /stats/sentiment from the gauges of every worker
+window_stats = SlidingWindowStats()
+window_stats_source = metrics_source(*WINDOW_GAUGES)
+
+# Append-only ratings storage
+ratings_store = RatingsStore()
+
+# Write-behind queue for /submit-rating (None when ratings are written in the request thread)
+rating_writer = WriteBehindRatingWriter(ratings_store) if RATINGS_WRITE_BEHIND else None
+
+# Prediction result cache (None when PREDICTION_CACHE_BACKEND=none)
+prediction_cache = create_prediction_cache()
+
+# Micro-batcher grouping concurrent /predict calls (requires a model-service batch endpoint)
+micro_batcher = None
+if MICRO_BATCH_ENABLED:
+    if MODEL_SERVICE_BATCH_PATH:
+        micro_batcher = MicroBatcher(model_client.predict_batch)
     else:
-        logger.error("Model service returned status code {}: {}", response.status_code, response.text)
-except requests.RequestException as e:
-    logger.error("Error connecting to model service: {}", str(e))
-    # If the model service is not reachable, we can still start the app
-    # but it will not be able to make predictions until the service is available
+        logger.warning("MICRO_BATCH_ENABLED is set but MODEL_SERVICE_BATCH_PATH is empty; micro-batching disabled")
+
+# Coalesces identical in-flight /predict calls into one upstream call (None when disabled)
+prediction_flights = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+
+# Adaptive cap on concurrent model-service calls from /predict (None when disabled)
+concurrency_limiter = create_concurrency_limiter()
+
+# Threads scoring chunks of streamed NDJSON records, shared by all streams
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="stream-scoring")
+
+# Model-service instances (MODEL_SERVICE_URLS, or the single MODEL_SERVICE_URL)
+MODEL_SERVICE_URLS = model_router.default_pool.urls
+logger.info("Model service instances: {}", MODEL_SERVICE_URLS)
+
+def probe_model_service():
+    """Check that the model service answers on "/", raising when it does not."""
+    logger.info("Testing connection to model service at {}", MODEL_SERVICE_URLS)
+    response = model_client.get("/", read_timeout=5)
+    if response.status_code != 200:
+        raise ModelServiceError(response.status_code, response.text)
+    logger.info("Model service is reachable at {}", MODEL_SERVICE_URLS)
 
 # Try to import get_version if LIB_VERSION_AVAILABLE is True
 if LIB_VERSION_AVAILABLE:
@@ -116,16 +161,23 @@ else:
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+# Compress responses and answer conditional requests (the /metrics app below is not affected)
+app.after_request(finalize_response)
 
 # Add Prometheus WSGI middleware to expose metrics
 app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {
-    '/metrics': make_wsgi_app()
+    '/metrics': create_metrics_app(PREDICTION_COUNT, *WINDOW_GAUGES)
 })
 
-# Configure Swagger documentation
-swagger = Swagger(app, config=SWAGGER_CONFIG, template=SWAGGER_TEMPLATE)
+# Configure Swagger documentation; the spec is only generated when /apispec.json is first
+# requested and the app version (a libversion lookup) only resolved at that point
+app.json = create_json_provider(app)
+swagger = Swagger(app, config=SWAGGER_CONFIG, template={
+    **SWAGGER_TEMPLATE,
+    "info": {**SWAGGER_TEMPLATE["info"], "version": CachedLazyString(get_app_version)}
+})
 
-logger.info("App service started with MODEL_SERVICE_URL: {}", MODEL_SERVICE_URL)
+logger.info("App service started with model-service instances: {}", MODEL_SERVICE_URLS)
 
 # Get version information from libversion
 def get_lib_version_info():
@@ -152,17 +204,157 @@ def get_lib_version_info():
             "error": "Library not available"
         }
 
+def fetch_model_service_version():
+    """Request the model-service version, raising on connection errors and non-200 answers."""
+    logger.info("Requesting version from model-service at {}", MODEL_SERVICE_URLS)
+    model_response = model_client.get("/version", read_timeout=MODEL_SERVICE_VERSION_READ_TIMEOUT)
+    if model_response.status_code != 200:
+        raise ModelServiceError(model_response.status_code, None)
+    model_version = model_response.json()
+    logger.info("Model service version received: {}", model_version)
+    return model_version
+
+def get_static_version_info():
+    """App and lib-version details for /version; they never change at runtime."""
+    return {"app_version": get_app_version(), "lib_version": get_lib_version_info()}
+
+# Cached /version payload; the app and lib versions are served as soon as the refresher thread
+# has loaded them, whether or not the model service is reachable
+version_cache = VersionCache(fetch_model_service_version, get_static_version_info)
+version_cache.start()
+
+# Readiness (/ready) waits for the model service to be reachable and the version cache to hold
+# its version. With LAZY_STARTUP both run in the background so the app starts serving (and /health
+# answers) immediately; otherwise they block startup as before and are retried in the background
+# if the model service cannot be reached.
+startup_probe = StartupProbe(probe_model_service, warm_ups=[version_cache.load])
+if LAZY_STARTUP or not startup_probe.check():
+    startup_probe.start()
+
+def get_model_version_key(experiment_variant=None):
+    """Return a string identifying the model version serving a request, used to key the prediction cache."""
+    model_version = version_cache.model_version_key()
+    if model_router.routes_variant(experiment_variant):
+        # Variants with their own model-service instances may run a different model
+        return f"{model_version}@{experiment_variant}"
+    return model_version
+
+def normalize_sentiment(original_sentiment_val):
+    """Map a raw model prediction to the 'positive', 'negative' or 'unknown' metrics label."""
+    # Normalize sentiment:
+    # Convert to lowercase string to handle "0"/"1" (str or int) 
+    # and "positive"/"negative" (case-insensitive).
+    normalized_input_str = str(original_sentiment_val).lower()
+
+    if normalized_input_str == "1" or normalized_input_str == "positive":
+        return "positive"
+    if normalized_input_str == "0" or normalized_input_str == "negative":
+        return "negative"
+
+    # This covers "unknown" from .get() or any other unexpected values.
+    # Log a warning if the original value was not 'unknown' and didn't map to positive/negative.
+    if normalized_input_str != "unknown":
+        logger.warning(
+            f"Unexpected sentiment value '{original_sentiment_val}' received from model. "
+            f"Normalized to 'unknown' for metrics."
+        )
+    return "unknown"
+
+def record_predictions(prediction_results, experiment_variant='control'):
+    """Update the sentiment metrics and sliding windows for a list of successful predictions in one pass."""
+    label_counts = {}
+    for prediction_result in prediction_results:
+        label = normalize_sentiment(prediction_result.get("prediction", "unknown"))
+        label_counts[label] = label_counts.get(label, 0) + 1
+    
+    # Update the prediction counter with the normalized sentiment labels;
+    # the positive ratio gauge is derived from it when /metrics is scraped
+    for label, count in label_counts.items():
+        PREDICTION_COUNT.labels(sentiment=label).inc(count)
+    window_stats.record_predictions(experiment_variant, label_counts)
+
+def record_latency(seconds, experiment_variant='control'):
+    """Record the latency of a prediction request in the histogram and the sliding windows."""
+    PREDICTION_LATENCY.observe(seconds)
+    window_stats.record_request(experiment_variant, seconds)
+
+def predict_texts(texts, experiment_variant=None):
+    """
+    Get predictions for a list of texts in input order.
+
+    Texts found in the prediction cache are served locally and only the misses
+    are sent to the model service in one batch, routed by experiment_variant.
+    Raises ModelServiceError or requests.RequestException when the upstream
+    call fails.
+    """
+    results = [None] * len(texts)
+    cache_keys = [None] * len(texts)
+    if prediction_cache is not None:
+        model_version = get_model_version_key(experiment_variant)
+        for i, text in enumerate(texts):
+            cache_keys[i] = make_cache_key(text, model_version)
+            results[i] = prediction_cache.get(cache_keys[i])
+    missing = [i for i, result in enumerate(results) if result is None]
+    
+    if missing:
+        logger.info("Requesting {} predictions from model service", len(missing))
+        fetched = model_client.predict_batch([texts[i] for i in missing], experiment_variant=experiment_variant)
+        for i, prediction_result in zip(missing, fetched):
+            results[i] = prediction_result
+            if cache_keys[i] is not None:
+                prediction_cache.set(cache_keys[i], prediction_result)
+    return results
+
+def circuit_open_response(e):
+    """503 response telling the client when the model service may be tried again."""
+    response = jsonify({
+        "error": "Model service is unavailable (circuit breaker open)",
+        "retry_after": e.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def overload_response(e):
+    """503 response for a request shed at the concurrency limit."""
+    response = jsonify({
+        "error": "Model service is overloaded, request shed",
+        "concurrency_limit": e.limit
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
-    Health check endpoint
+    Liveness check endpoint
     ---
     responses:
       200:
-        description: Service is healthy
+        description: The process is up and serving requests, including the circuit breaker state and the state of every model-service instance
     """
     logger.info("Health check request received")
-    return jsonify({"status": "ok"})
+    return jsonify({
+        "status": "ok",
+        "model_service_circuit": model_service_breaker.state if model_service_breaker is not None else "disabled",
+        "model_service_backends": model_router.status()
+    })
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness check endpoint
+    ---
+    responses:
+      200:
+        description: The service is ready for traffic (the model service has been reached and its version loaded)
+      503:
+        description: Still starting up, the model service has not been reached or its version not loaded yet
+    """
+    if startup_probe.ready:
+        return jsonify({"status": "ready"})
+    return jsonify({"status": "starting", "error": startup_probe.error}), 503
 
 @app.route('/version', methods=['GET'])
 def get_version_info():
@@ -174,36 +366,80 @@ def get_version_info():
         description: Version information
     """
     logger.info("Version info request received")
+    return Response(version_cache.body(), mimetype='application/json')
+
+@app.route('/debug/profile', methods=['GET'])
+def capture_profile():
+    """
+    Capture a sampling profile of this worker (requires PROFILER_ENABLED)
+    ---
+    tags:
+      - Debug
+    parameters:
+      - name: seconds
+        in: query
+        type: number
+        required: false
+        description: How long to sample live traffic (default 10, at most PROFILER_MAX_SECONDS)
+      - name: interval_ms
+        in: query
+        type: number
+        required: false
+        description: Time between samples (default PROFILER_INTERVAL_MS)
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Stacks of all threads in folded format ("frame;frame;frame count" per line), ready for flamegraph.pl or speedscope
+      400:
+        description: Invalid seconds or interval_ms
+      404:
+        description: Profiling is disabled
+      409:
+        description: A profile is already being captured by this worker
+    """
+    if not PROFILER_ENABLED:
+        return jsonify({"error": "Profiling is disabled (set PROFILER_ENABLED=true)"}), 404
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', PROFILER_INTERVAL_MS))
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not 0 < seconds <= PROFILER_MAX_SECONDS:
+        return jsonify({"error": f"seconds must be greater than 0 and at most {PROFILER_MAX_SECONDS:g}"}), 400
+    if not 1 <= interval_ms <= 1000:
+        return jsonify({"error": "interval_ms must be between 1 and 1000"}), 400
+
+    logger.info("Capturing a {}s profile every {}ms", seconds, interval_ms)
+    try:
+        folded, samples = sampling_profiler.capture(seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    response = Response(folded, mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(samples)
+    response.headers['X-Profile-Pid'] = str(os.getpid())
+    return response
+
+def forward_prediction(upstream, cache_key, timer, experiment_variant):
+    """Send a passthrough model-service answer to the client, taking only its prediction field for the metrics."""
+    logger.info("Prediction successful: {}", upstream.result)
+    record_predictions([upstream.result], experiment_variant)
     
-    # Get libversion info
-    lib_version_info = get_lib_version_info()
-    
-    # Use lib_version for app_version
-    app_version = get_app_version()
+    if cache_key is not None and not upstream.streamed:
+        # The cache holds decoded answers; streamed (oversized) answers are not cached
+        try:
+            prediction_cache.set(cache_key, json_loads(upstream.body))
+        except ValueError:
+            logger.warning("Model service answer is not valid JSON, not caching it")
     
-    try:
-        logger.info("Requesting version from model-service at {}", MODEL_SERVICE_URL)
-        model_response = requests.get(f"{MODEL_SERVICE_URL}/version", timeout=5)
-        if model_response.status_code == 200:
-            model_version = model_response.json()
-            logger.info("Model service version received: {}", model_version)
+    with timer.stage('serialize'):
+        if upstream.streamed:
+            response = Response(upstream.iter_body(), status=upstream.status_code, content_type=upstream.content_type)
         else:
-            error_msg = f"Could not retrieve model service version (status code: {model_response.status_code})"
-            logger.error(error_msg)
-            model_version = {"error": error_msg}
-    except requests.RequestException as e:
-        error_msg = f"Could not connect to model service: {str(e)}"
-        logger.error(error_msg)
-        model_version = {"error": error_msg}
+            response = Response(upstream.body, status=upstream.status_code, content_type=upstream.content_type)
     
-    response_data = {
-        "app_version": app_version,
-        "model_service": model_version,
-        "lib_version": lib_version_info  # NOTE: Same as app_version
-    }
-    
-    logger.info("Returning version info: {}", response_data)
-    return jsonify(response_data)
+    record_latency(timer.finish(), experiment_variant)
+    return response
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -240,17 +476,20 @@ def predict():
         description: Bad Request
       500:
         description: Internal Server Error
+      503:
+        description: Model service unavailable (circuit open) or overloaded (request shed), see Retry-After
     """
     logger.info("Prediction request received")
     
-    # Start timing for latency histogram
-    start_time = time.time()
+    # Start timing for the latency histograms (total and per stage)
+    timer = StageTimer()
     
     if not request.is_json:
         logger.warning("Prediction request not in JSON format")
         return jsonify({"error": "Request must be JSON"}), 400
         
-    data = request.get_json()
+    with timer.stage('parse'):
+        data = request.get_json()
     
     # Check if data contains the expected 'data' field
     if 'data' not in data:
@@ -268,91 +507,324 @@ def predict():
     log_text = input_text[:100] + "..." if len(input_text) > 100 else input_text
     logger.info("Processing prediction for text: '{}', variant: '{}'", log_text, experiment_variant)
     
-    try:
-        # Get the latest MODEL_SERVICE_URL value (in case it was changed)
-        current_model_url = get_model_service_url()
-        # Forward the request to the model service
-        logger.info("Forwarding request to model service at {}", current_model_url)
-        model_response = requests.post(
-            f"{current_model_url}/predict",
-            json=data,  # Keep the format as {"data": "input text"}
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
+    # Serve repeated reviews from the prediction cache
+    cache_key = None
+    if prediction_cache is not None:
+        with timer.stage('cache'):
+            cache_key = make_cache_key(input_text, get_model_version_key(experiment_variant))
+            cached_result = prediction_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Prediction served from cache: {}", cached_result)
+            record_predictions([cached_result], experiment_variant)
+            with timer.stage('serialize'):
+                response = jsonify(cached_result)
+            record_latency(timer.finish(), experiment_variant)
+            return response, 200
+    
+    def call_model_service():
+        if concurrency_limiter is None:
+            return call_upstream()
+        if not concurrency_limiter.try_acquire(is_priority_variant(experiment_variant)):
+            raise ConcurrencyLimitExceeded(concurrency_limiter.limit)
+        call_start = time.perf_counter()
+        try:
+            prediction_result, status_code = call_upstream()
+        except CircuitOpenError:
+            concurrency_limiter.release()  # Failed fast, no model-service call was made
+            raise
+        except Exception:
+            concurrency_limiter.release(time.perf_counter() - call_start, failed=True)
+            raise
+        concurrency_limiter.release(time.perf_counter() - call_start, failed=status_code >= 500)
+        return prediction_result, status_code
+    
+    def call_upstream():
+        # Micro-batches go to the default instances, variants with their own instances are sent directly
+        if micro_batcher is not None and not model_router.routes_variant(experiment_variant):
+            logger.info("Queueing prediction for the next micro-batch")
+            return micro_batcher.predict(input_text), 200
         
-        if model_response.status_code == 200:
-            prediction_result = model_response.json()
-            logger.info("Prediction successful: {}", prediction_result)
-            
-            # Update metrics for successful predictions
-            original_sentiment_val = prediction_result.get("prediction", "unknown")
-            
-            # Normalize sentiment:
-            # Convert to lowercase string to handle "0"/"1" (str or int) 
-            # and "positive"/"negative" (case-insensitive).
-            normalized_input_str = str(original_sentiment_val).lower()
-
-            final_sentiment_label: str
-            if normalized_input_str == "1" or normalized_input_str == "positive":
-                final_sentiment_label = "positive"
-            elif normalized_input_str == "0" or normalized_input_str == "negative":
-                final_sentiment_label = "negative"
-            else:
-                # This covers "unknown" from .get() or any other unexpected values.
-                final_sentiment_label = "unknown"
-                # Log a warning if the original value was not 'unknown' and didn't map to positive/negative.
-                if normalized_input_str != "unknown":
-                    logger.warning(
-                        f"Unexpected sentiment value '{original_sentiment_val}' received from model. "
-                        f"Normalized to '{final_sentiment_label}' for metrics."
-                    )
-            
-            # 1. Update the prediction counter with the normalized sentiment label
-            PREDICTION_COUNT.labels(sentiment=final_sentiment_label).inc()
-
-            # 2. Update the positive/negative ratio
-            global positive_count, total_count
-            total_count += 1
-            if final_sentiment_label == "positive": 
-                positive_count += 1
-            
-            # Update the gauge with the new ratio
-            if total_count > 0:
-                SENTIMENT_RATIO.set(positive_count / total_count)
-            else:
-                SENTIMENT_RATIO.set(0)
+        # Forward the request to a model-service instance over the shared keep-alive pool
+        logger.info("Forwarding request to model service")
+        if PREDICT_PASSTHROUGH:
+            # The client's body already has the {"data": "input text"} format, send its bytes as-is
+            model_response = model_client.post(
+                "/predict",
+                experiment_variant=experiment_variant,
+                idempotent=True,  # Predictions have no side effects, slow or failed calls may be sent again
+                hedge=True,
+                data=request.get_data(),
+                headers={"Content-Type": "application/json"},
+                stream=True
+            )
         else:
+            model_response = model_client.post(
+                "/predict",
+                experiment_variant=experiment_variant,
+                idempotent=True,
+                hedge=True,
+                json=data,  # Keep the format as {"data": "input text"}
+                headers={"Content-Type": "application/json"}
+            )
+        if model_response.status_code != 200:
             logger.error("Model service returned error status code: {}", model_response.status_code)
             logger.error("Model service error response: {}", model_response.text)
-        
-        # Calculate elapsed time and record in the histogram
-        elapsed_time = time.time() - start_time
-        PREDICTION_LATENCY.observe(elapsed_time)
-        
-        return jsonify(model_response.json()), model_response.status_code
-        
+        elif PREDICT_PASSTHROUGH:
+            return read_passthrough(model_response), 200
+        return model_response.json(), model_response.status_code
+    
+    try:
+        with timer.stage('upstream'):
+            if prediction_flights is not None:
+                # Identical concurrent requests share one upstream call
+                flight_key = make_flight_key(input_text, experiment_variant)
+                prediction_result, status_code = prediction_flights.do(flight_key, call_model_service)
+                if isinstance(prediction_result, PassthroughResponse) and not prediction_result.claim():
+                    # A streamed answer can only be sent once and another request took it
+                    prediction_result, status_code = call_model_service()
+            else:
+                prediction_result, status_code = call_model_service()
+    except ModelServiceError as e:
+        logger.error("Model service returned error status code: {}", e.status_code)
+        record_latency(timer.finish(), experiment_variant)
+        return jsonify(e.payload), e.status_code
+    except CircuitOpenError as e:
+        logger.warning("Model service circuit open, failing fast")
+        record_latency(timer.finish(), experiment_variant)
+        return circuit_open_response(e)
+    except ConcurrencyLimitExceeded as e:
+        logger.warning("Shedding prediction request: {}", str(e))
+        return overload_response(e)
     except requests.RequestException as e:
         error_msg = f"Error connecting to model service: {str(e)}"
         logger.error(error_msg)
         
         # Record the latency even for errors
-        elapsed_time = time.time() - start_time
-        PREDICTION_LATENCY.observe(elapsed_time)
+        record_latency(timer.finish(), experiment_variant)
         
         return jsonify({"error": error_msg}), 500
+    
+    if isinstance(prediction_result, PassthroughResponse):
+        return forward_prediction(prediction_result, cache_key, timer, experiment_variant)
+    
+    if status_code == 200:
+        logger.info("Prediction successful: {}", prediction_result)
+        
+        # Update metrics for successful predictions
+        record_predictions([prediction_result], experiment_variant)
+        
+        if cache_key is not None:
+            prediction_cache.set(cache_key, prediction_result)
+    
+    with timer.stage('serialize'):
+        response = jsonify(prediction_result)
+    
+    # Calculate elapsed time and record in the histograms
+    record_latency(timer.finish(), experiment_variant)
+    
+    return response, status_code
 
-def load_ratings():
-    if not os.path.exists(RATINGS_FILE):
-        return []
-    with open(RATINGS_FILE, 'r') as f:
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Make predictions for a list of texts using the model-service
+    ---
+    tags:
+      - Prediction
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            data:
+              type: array
+              items:
+                type: string
+              example: ["I love this product!", "The food was cold."]
+            experiment_variant:
+              type: string
+              example: "variant_a"
+              description: "A/B test variant identifier (optional)"
+          required:
+            - data
+    responses:
+      200:
+        description: Predictions in the same order as the input texts
+        schema:
+          type: object
+          properties:
+            predictions:
+              type: array
+              items:
+                type: object
+                properties:
+                  prediction:
+                    type: string
+      400:
+        description: Bad Request
+      500:
+        description: Internal Server Error
+    """
+    start_time = time.perf_counter()
+    
+    if not request.is_json:
+        logger.warning("Batch prediction request not in JSON format")
+        return jsonify({"error": "Request must be JSON"}), 400
+    
+    data = request.get_json()
+    texts = data.get('data') if isinstance(data, dict) else None
+    
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        logger.warning("Batch prediction request without a list of texts in 'data'")
+        return jsonify({"error": "'data' must be a list of strings"}), 400
+    
+    if len(texts) > PREDICT_BATCH_MAX_SIZE:
+        logger.warning("Batch prediction request with {} texts exceeds the limit", len(texts))
+        return jsonify({"error": f"At most {PREDICT_BATCH_MAX_SIZE} texts are allowed per batch"}), 400
+    
+    experiment_variant = data.get('experiment_variant', 'control')
+    USER_CLICKS.labels(experiment_variant=experiment_variant).inc()
+    logger.info("Processing batch prediction for {} texts, variant: '{}'", len(texts), experiment_variant)
+    
+    try:
+        results = predict_texts(texts, experiment_variant)
+    except ModelServiceError as e:
+        logger.error("Model service returned error status code: {}", e.status_code)
+        record_latency(time.perf_counter() - start_time, experiment_variant)
+        return jsonify(e.payload), e.status_code
+    except CircuitOpenError as e:
+        logger.warning("Model service circuit open, failing fast")
+        record_latency(time.perf_counter() - start_time, experiment_variant)
+        return circuit_open_response(e)
+    except requests.RequestException as e:
+        error_msg = f"Error connecting to model service: {str(e)}"
+        logger.error(error_msg)
+        record_latency(time.perf_counter() - start_time, experiment_variant)
+        return jsonify({"error": error_msg}), 500
+    
+    record_predictions(results, experiment_variant)
+    record_latency(time.perf_counter() - start_time, experiment_variant)
+    logger.info("Batch prediction successful for {} texts", len(texts))
+    
+    return jsonify({"predictions": results})
+
+def read_ndjson_records(stream):
+    """
+    Incrementally parse NDJSON records from a request stream.
+
+    Yields (line_number, record, error) tuples; blank lines are skipped and lines
+    longer than STREAM_MAX_LINE_BYTES are reported as errors without being buffered.
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(STREAM_MAX_LINE_BYTES)
+        if not line:
+            return
+        line_number += 1
+        if not line.endswith(b"\n") and len(line) >= STREAM_MAX_LINE_BYTES:
+            # Discard the rest of the oversized line
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(STREAM_MAX_LINE_BYTES)
+            yield line_number, None, f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes"
+            continue
+        if not line.strip():
+            continue
         try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+            record = json_loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if isinstance(record, str):
+            record = {"data": record}
+        if not isinstance(record, dict) or not isinstance(record.get('data'), str):
+            yield line_number, None, "Missing 'data' field in record"
+            continue
+        yield line_number, record, None
+
+def score_stream_chunk(chunk, experiment_variant=None):
+    """Score one chunk of streamed records and return its NDJSON output lines in input order."""
+    start_time = time.perf_counter()
+    valid = [(line_number, record) for line_number, record, error in chunk if error is None]
+    try:
+        results = predict_texts([record['data'] for _, record in valid], experiment_variant)
+        record_predictions(results, experiment_variant)
+        outcome = {line_number: result for (line_number, _), result in zip(valid, results)}
+    except (ModelServiceError, requests.RequestException) as e:
+        logger.error("Scoring {} streamed records failed: {}", len(valid), str(e))
+        outcome = {line_number: {"error": str(e)} for line_number, _ in valid}
+    if valid:
+        record_latency(time.perf_counter() - start_time, experiment_variant)
+
+    lines = []
+    for line_number, record, error in chunk:
+        output = {"line": line_number}
+        if record is not None and 'id' in record:
+            output["id"] = record['id']
+        output.update({"error": error} if error is not None else outcome[line_number])
+        lines.append(json_dumps(output) + "\n")
+    return "".join(lines)
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Score a stream of NDJSON records using the model-service
+    ---
+    tags:
+      - Prediction
+    consumes:
+      - application/x-ndjson
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: body
+        in: body
+        required: true
+        description: >
+          One JSON record per line, either {"data": "review text", "id": "optional"}
+          or a bare JSON string. Records are read incrementally and results are
+          streamed back in input order, one JSON object per line.
+        schema:
+          type: string
+          example: '{"id": 1, "data": "I love this product!"}'
+      - name: experiment_variant
+        in: query
+        type: string
+        required: false
+        description: "A/B test variant identifier (optional)"
+    responses:
+      200:
+        description: >
+          NDJSON stream with one result per input record, e.g.
+          {"line": 1, "id": 1, "prediction": 1} or {"line": 2, "error": "Invalid JSON"}
+    """
+    experiment_variant = request.args.get('experiment_variant', 'control')
+    USER_CLICKS.labels(experiment_variant=experiment_variant).inc()
+    logger.info("Streaming prediction request received, variant: '{}'", experiment_variant)
+    stream = request.stream
 
-def save_ratings(ratings):
-    with open(RATINGS_FILE, 'w') as f:
-        json.dump(ratings, f, indent=2)
+    def generate():
+        # Only STREAM_MAX_IN_FLIGHT chunks are pending at a time; input is not read
+        # further until the oldest chunk has been written out, so a slow client or
+        # model service applies back-pressure and memory use stays flat.
+        pending = deque()
+        chunk = []
+        for item in read_ndjson_records(stream):
+            chunk.append(item)
+            if len(chunk) < STREAM_CHUNK_SIZE:
+                continue
+            pending.append(stream_executor.submit(score_stream_chunk, chunk, experiment_variant))
+            chunk = []
+            if len(pending) >= STREAM_MAX_IN_FLIGHT:
+                yield pending.popleft().result()
+        if chunk:
+            pending.append(stream_executor.submit(score_stream_chunk, chunk, experiment_variant))
+        while pending:
+            yield pending.popleft().result()
+        logger.info("Streaming prediction request completed")
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/submit-rating', methods=['POST'])
 def submit_rating():
@@ -376,6 +848,8 @@ def submit_rating():
               maximum: 5
             sentiment:
               type: string
+            restaurant:
+              type: string
           required:
             - review_text
             - rating
@@ -387,14 +861,29 @@ def submit_rating():
         description: Invalid input
     """
     data = request.get_json()
-    logger.info("Rating submission received: {}", data)
+    logger.info(
+        "Rating submission received: rating={}, restaurant='{}'",
+        data.get('rating') if isinstance(data, dict) else None,
+        data.get('restaurant', 'Unknown') if isinstance(data, dict) else None
+    )
     
     # Validation
     if not data or 'rating' not in data or 'review_text' not in data or 'sentiment' not in data:
         return jsonify({"error": "Missing required fields"}), 400
     
-    if not 1 <= data['rating'] <= 5:
+    rating = data['rating']
+    if isinstance(rating, bool) or not isinstance(rating, int):
+        return jsonify({"error": "Rating must be an integer"}), 400
+    if not 1 <= rating <= 5:
         return jsonify({"error": "Rating must be between 1-5"}), 400
+    if not isinstance(data['review_text'], str) or not isinstance(data['sentiment'], str):
+        return jsonify({"error": "'review_text' and 'sentiment' must be strings"}), 400
+    # A missing or null restaurant is stored as 'Unknown', as with the old ratings.json storage
+    restaurant = data.get('restaurant')
+    if restaurant is None:
+        restaurant = 'Unknown'
+    elif not isinstance(restaurant, str):
+        return jsonify({"error": "'restaurant' must be a string"}), 400
 
     # Record the star rating in Prometheus histogram
     USER_RATINGS.observe(data['rating'])
@@ -407,20 +896,338 @@ def submit_rating():
         "rating": data['rating'],
         "sentiment": data['sentiment'],
         "timestamp": datetime.utcnow().isoformat(),
-        "restaurant": data.get('restaurant', 'Unknown')
+        "restaurant": restaurant
     }
 
-    # Save to file
+    # Append to the ratings store, or queue it for the background writer
     try:
-        ratings = load_ratings()
-        ratings.append(rating_data)
-        save_ratings(ratings)
-        logger.info("Rating saved successfully")
+        if rating_writer is not None:
+            rating_writer.submit(rating_data)
+            logger.info("Rating queued for writing")
+        else:
+            ratings_store.add(rating_data)
+            logger.info("Rating saved successfully")
         return jsonify({"status": "success", "id": rating_data["id"]}), 200
     except Exception as e:
         logger.error("Error saving rating: {}", str(e))
         return jsonify({"error": "Internal server error"}), 500
 
+def parse_timestamp_arg(name):
+    """Read an optional ISO-8601 query argument, normalized to the stored timestamp format."""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).isoformat()
+
+@app.route('/ratings/stats', methods=['GET'])
+def ratings_stats():
+    """
+    Rating counts and averages per restaurant and per sentiment
+    ---
+    tags:
+      - Ratings
+    parameters:
+      - name: restaurant
+        in: query
+        type: string
+        required: false
+      - name: sentiment
+        in: query
+        type: string
+        required: false
+    responses:
+      200:
+        description: Totals, average rating and star distribution overall, by restaurant and by sentiment
+    """
+    return jsonify(ratings_store.stats(
+        restaurant=request.args.get('restaurant'),
+        sentiment=request.args.get('sentiment')
+    ))
+
+@app.route('/ratings/histogram', methods=['GET'])
+def ratings_histogram():
+    """
+    Rating counts and averages per time bucket
+    ---
+    tags:
+      - Ratings
+    parameters:
+      - name: interval
+        in: query
+        type: string
+        enum: [hour, day]
+        default: day
+      - name: restaurant
+        in: query
+        type: string
+        required: false
+      - name: sentiment
+        in: query
+        type: string
+        required: false
+      - name: since
+        in: query
+        type: string
+        format: date-time
+        required: false
+      - name: until
+        in: query
+        type: string
+        format: date-time
+        required: false
+    responses:
+      200:
+        description: Buckets in ascending order (at most RATINGS_HISTOGRAM_MAX_BUCKETS, the most recent ones)
+      400:
+        description: Invalid interval or timestamp
+    """
+    interval = request.args.get('interval', 'day')
+    if interval not in INTERVALS:
+        return jsonify({"error": f"interval must be one of: {', '.join(INTERVALS)}"}), 400
+    try:
+        since = parse_timestamp_arg('since')
+        until = parse_timestamp_arg('until')
+    except ValueError:
+        return jsonify({"error": "since and until must be ISO-8601 timestamps"}), 400
+
+    buckets = ratings_store.histogram(
+        interval=interval,
+        restaurant=request.args.get('restaurant'),
+        sentiment=request.args.get('sentiment'),
+        since=since,
+        until=until,
+        limit=RATINGS_HISTOGRAM_MAX_BUCKETS
+    )
+    return jsonify({"interval": interval, "buckets": buckets})
+
+@app.route('/ratings', methods=['GET'])
+def list_ratings():
+    """
+    List submitted ratings, newest first
+    ---
+    tags:
+      - Ratings
+    parameters:
+      - name: restaurant
+        in: query
+        type: string
+        required: false
+      - name: sentiment
+        in: query
+        type: string
+        required: false
+      - name: limit
+        in: query
+        type: integer
+        required: false
+      - name: cursor
+        in: query
+        type: integer
+        required: false
+        description: next_cursor value returned by the previous page
+    responses:
+      200:
+        description: A page of ratings and the cursor of the next page (null on the last page)
+      400:
+        description: Invalid limit or cursor
+    """
+    try:
+        limit = int(request.args.get('limit', RATINGS_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor is not None else None
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    if not 1 <= limit <= RATINGS_MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {RATINGS_MAX_PAGE_SIZE}"}), 400
+
+    ratings, next_cursor = ratings_store.list(
+        restaurant=request.args.get('restaurant'),
+        sentiment=request.args.get('sentiment'),
+        limit=limit,
+        cursor=cursor
+    )
+    return jsonify({"ratings": ratings, "next_cursor": next_cursor})
+
+@app.route('/reviews', methods=['GET'])
+def review_feed():
+    """
+    Review feed of a restaurant, newest first, with the sentiment of each review
+    ---
+    tags:
+      - Reviews
+    parameters:
+      - name: restaurant
+        in: query
+        type: string
+        required: true
+      - name: limit
+        in: query
+        type: integer
+        required: false
+      - name: cursor
+        in: query
+        type: integer
+        required: false
+        description: next_cursor value returned by the previous page
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag of a previously fetched copy of this page
+    responses:
+      200:
+        description: A page of reviews and the cursor of the next page (null on the last page), with an ETag
+      304:
+        description: The feed has not changed since the copy with the given ETag
+      400:
+        description: Missing restaurant, or invalid limit or cursor
+    """
+    restaurant = request.args.get('restaurant')
+    if not restaurant:
+        return jsonify({"error": "Missing 'restaurant' query parameter"}), 400
+    try:
+        limit = int(request.args.get('limit', REVIEWS_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor is not None else None
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    if not 1 <= limit <= REVIEWS_MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {REVIEWS_MAX_PAGE_SIZE}"}), 400
+
+    # Every page of a feed is valid until a review is added to it, so the feed version is
+    # checked (one primary key lookup) before the page is read and serialized
+    etag = f"feed-{ratings_store.feed_version(restaurant)}"
+    cached_etag = matching_etag(etag)
+    if cached_etag is not None:
+        response = Response(status=304)
+        response.set_etag(cached_etag)
+    else:
+        reviews, next_cursor = ratings_store.feed(restaurant, limit=limit, cursor=cursor)
+        response = jsonify({"restaurant": restaurant, "reviews": reviews, "next_cursor": next_cursor})
+        response.set_etag(etag)
+    # Browsers keep the page but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/reviews', methods=['POST'])
+def ingest_reviews():
+    """
+    Add reviews to the restaurant review feeds, scoring their sentiment once
+    ---
+    tags:
+      - Reviews
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            reviews:
+              type: array
+              items:
+                type: object
+                properties:
+                  restaurant:
+                    type: string
+                  review:
+                    type: string
+                  author:
+                    type: string
+                required:
+                  - restaurant
+                  - review
+          required:
+            - reviews
+    responses:
+      200:
+        description: Number of reviews added
+      400:
+        description: Invalid input
+      500:
+        description: The model service could not be reached
+      503:
+        description: Model service unavailable (circuit open)
+    """
+    data = request.get_json(silent=True)
+    reviews = data.get('reviews') if isinstance(data, dict) else None
+    if not isinstance(reviews, list) or not all(
+        isinstance(review, dict) and isinstance(review.get('restaurant'), str) and isinstance(review.get('review'), str)
+        for review in reviews
+    ):
+        return jsonify({"error": "'reviews' must be a list of objects with 'restaurant' and 'review' strings"}), 400
+    if len(reviews) > PREDICT_BATCH_MAX_SIZE:
+        return jsonify({"error": f"At most {PREDICT_BATCH_MAX_SIZE} reviews are allowed per request"}), 400
+
+    try:
+        results = predict_texts([review['review'] for review in reviews])
+    except ModelServiceError as e:
+        logger.error("Model service returned error status code: {}", e.status_code)
+        return jsonify(e.payload), e.status_code
+    except CircuitOpenError as e:
+        logger.warning("Model service circuit open, failing fast")
+        return circuit_open_response(e)
+    except requests.RequestException as e:
+        error_msg = f"Error connecting to model service: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({"error": error_msg}), 500
+
+    timestamp = datetime.utcnow().isoformat()
+    ratings_store.add_reviews([
+        {
+            "restaurant": review['restaurant'],
+            "author": review.get('author'),
+            "review_text": review['review'],
+            "sentiment": normalize_sentiment(result.get("prediction", "unknown")),
+            "rating": None,
+            "timestamp": timestamp
+        }
+        for review, result in zip(reviews, results)
+    ])
+    logger.info("Ingested {} reviews into the review feeds", len(reviews))
+    return jsonify({"status": "success", "ingested": len(reviews)})
+
+@app.route('/stats/sentiment', methods=['GET'])
+def sentiment_stats():
+    """
+    Recent prediction volume, positive ratio and latency per experiment variant
+    ---
+    tags:
+      - Analytics
+    parameters:
+      - name: window
+        in: query
+        type: string
+        required: false
+        description: Only this window (one of SENTIMENT_WINDOWS, e.g. 5m)
+      - name: experiment_variant
+        in: query
+        type: string
+        required: false
+    responses:
+      200:
+        description: Totals of each variant over each sliding window, summed over all workers
+      400:
+        description: Unknown window
+    """
+    window = request.args.get('window')
+    if window is not None and window not in window_stats.windows:
+        return jsonify({"error": f"window must be one of: {', '.join(window_stats.windows)}"}), 400
+    experiment_variant = request.args.get('experiment_variant')
+
+    # Publish this worker's current totals first, the other workers export theirs every bucket
+    window_stats.export()
+    variants = read_window_stats(window_stats_source)
+    if experiment_variant is not None:
+        variants = {experiment_variant: variants.get(experiment_variant, {})}
+    if window is not None:
+        variants = {name: {window: windows[window]} for name, windows in variants.items() if window in windows}
+    return jsonify({
+        "windows": dict(window_stats.windows),
+        "bucket_seconds": window_stats.bucket_seconds,
+        "variants": variants
+    })
+
 @app.route('/metrics-info', methods=['GET'])
 def metrics_info():
     """
@@ -442,7 +1249,7 @@ def metrics_info():
             {
                 "name": "sentiment_positive_ratio",
                 "type": "Gauge",
-                "description": "Ratio of positive to total sentiments (0-1). Note: In multi-worker setups, this reflects worker-local state unless PROMETHEUS_MULTIPROC_DIR is configured."
+                "description": "Ratio of positive to total sentiments (0-1), derived from sentiment_predictions_total aggregated across all workers"
             },
             {
                 "name": "sentiment_prediction_latency_seconds",
@@ -450,6 +1257,59 @@ def metrics_info():
                 "description": "Time taken to process a sentiment prediction",
                 "buckets": [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
             },
+            {
+                "name": "sentiment_window_predictions",
+                "type": "Gauge",
+                "description": "Predictions made in each sliding window (SENTIMENT_WINDOWS), by experiment variant and sentiment",
+                "labels": ["experiment_variant", "window", "sentiment"]
+            },
+            {
+                "name": "sentiment_window_requests",
+                "type": "Gauge",
+                "description": "Prediction requests served in each sliding window, by experiment variant",
+                "labels": ["experiment_variant", "window"]
+            },
+            {
+                "name": "sentiment_window_request_seconds",
+                "type": "Gauge",
+                "description": "Total latency of the prediction requests served in each sliding window, by experiment variant",
+                "labels": ["experiment_variant", "window"]
+            },
+            {
+                "name": "sentiment_window_positive_ratio",
+                "type": "Gauge",
+                "description": "Ratio of positive to total sentiments in each sliding window (0-1), by experiment variant",
+                "labels": ["experiment_variant", "window"]
+            },
+            {
+                "name": "sentiment_window_latency_avg_seconds",
+                "type": "Gauge",
+                "description": "Average latency of the prediction requests served in each sliding window, by experiment variant",
+                "labels": ["experiment_variant", "window"]
+            },
+            {
+                "name": "predict_stage_latency_seconds",
+                "type": "Histogram",
+                "description": "Time spent by /predict requests in each stage of the handler (parse, cache, upstream, serialize, local)",
+                "labels": ["stage"]
+            },
+            {
+                "name": "predict_passthrough_responses_total",
+                "type": "Counter",
+                "description": "Model-service /predict answers forwarded to the client without re-encoding",
+                "labels": ["mode"]
+            },
+            {
+                "name": "http_responses_compressed_total",
+                "type": "Counter",
+                "description": "Responses sent compressed, by content encoding",
+                "labels": ["encoding"]
+            },
+            {
+                "name": "http_responses_not_modified_total",
+                "type": "Counter",
+                "description": "Conditional requests answered with 304 Not Modified"
+            },
             {
                 "name": "model_usage_total",
                 "type": "Counter",
@@ -467,6 +1327,168 @@ def metrics_info():
                 "type": "Histogram",
                 "description": "Distribution of user star ratings (1-5)",
                 "buckets": [1, 2, 3, 4, 5]
+            },
+            {
+                "name": "prediction_cache_hits_total",
+                "type": "Counter",
+                "description": "Number of predictions served from the prediction cache"
+            },
+            {
+                "name": "prediction_cache_misses_total",
+                "type": "Counter",
+                "description": "Number of predictions that had to be requested from the model service"
+            },
+            {
+                "name": "prediction_cache_evictions_total",
+                "type": "Counter",
+                "description": "Number of entries removed from the prediction cache",
+                "labels": ["reason"]
+            },
+            {
+                "name": "prediction_cache_entries",
+                "type": "Gauge",
+                "description": "Number of entries currently held in the prediction cache"
+            },
+            {
+                "name": "prediction_singleflight_requests_total",
+                "type": "Counter",
+                "description": "Upstream prediction calls made (leader) or shared with an identical in-flight call (follower)"
+            },
+            {
+                "name": "model_service_circuit_state",
+                "type": "Gauge",
+                "description": "Current model-service circuit breaker state (1 for the active state)",
+                "labels": ["state"]
+            },
+            {
+                "name": "model_service_circuit_transitions_total",
+                "type": "Counter",
+                "description": "Number of model-service circuit breaker state transitions",
+                "labels": ["from_state", "to_state"]
+            },
+            {
+                "name": "model_service_circuit_rejections_total",
+                "type": "Counter",
+                "description": "Number of model-service calls rejected without being sent because the circuit was open"
+            },
+            {
+                "name": "log_records_dropped_total",
+                "type": "Counter",
+                "description": "Number of log records dropped because the log queue was full"
+            },
+            {
+                "name": "log_records_sampled_out_total",
+                "type": "Counter",
+                "description": "Number of INFO log records skipped by per-route sampling"
+            },
+            {
+                "name": "log_queue_depth",
+                "type": "Gauge",
+                "description": "Number of log records waiting to be written"
+            },
+            {
+                "name": "ratings_write_queue_depth",
+                "type": "Histogram",
+                "description": "Number of ratings waiting in the write-behind queue, observed on every submission"
+            },
+            {
+                "name": "ratings_write_flush_seconds",
+                "type": "Histogram",
+                "description": "Time spent writing and committing one batch of ratings"
+            },
+            {
+                "name": "ratings_write_batch_size",
+                "type": "Histogram",
+                "description": "Number of ratings committed per write-behind flush"
+            },
+            {
+                "name": "ratings_write_failures_total",
+                "type": "Counter",
+                "description": "Number of ratings that could not be written by the write-behind queue"
+            },
+            {
+                "name": "predict_concurrency_limit",
+                "type": "Gauge",
+                "description": "Current adaptive limit on concurrent model-service calls from /predict"
+            },
+            {
+                "name": "predict_concurrency_in_flight",
+                "type": "Gauge",
+                "description": "Model-service calls from /predict currently counted against the limit"
+            },
+            {
+                "name": "predict_requests_shed_total",
+                "type": "Counter",
+                "description": "Number of /predict requests rejected because the concurrency limit was reached",
+                "labels": ["priority"]
+            },
+            {
+                "name": "model_client_pool_size",
+                "type": "Gauge",
+                "description": "Maximum number of pooled connections to the model service"
+            },
+            {
+                "name": "model_client_requests_in_flight",
+                "type": "Gauge",
+                "description": "Number of model-service requests currently holding a pooled connection"
+            },
+            {
+                "name": "model_client_idle_connections",
+                "type": "Gauge",
+                "description": "Number of open keep-alive connections waiting in the pool"
+            },
+            {
+                "name": "model_client_connections_total",
+                "type": "Counter",
+                "description": "Connections used for model-service requests, by whether they were newly opened or reused",
+                "labels": ["state"]
+            },
+            {
+                "name": "model_service_backend_requests_total",
+                "type": "Counter",
+                "description": "Requests sent to each model-service instance, by outcome",
+                "labels": ["backend", "outcome"]
+            },
+            {
+                "name": "model_service_backend_latency_seconds",
+                "type": "Histogram",
+                "description": "Latency of requests to each model-service instance",
+                "labels": ["backend"]
+            },
+            {
+                "name": "model_service_backend_outstanding_requests",
+                "type": "Gauge",
+                "description": "Requests currently in flight to each model-service instance",
+                "labels": ["backend"]
+            },
+            {
+                "name": "model_service_backend_ejected",
+                "type": "Gauge",
+                "description": "1 while a model-service instance is ejected from load balancing as an outlier",
+                "labels": ["backend"]
+            },
+            {
+                "name": "model_service_backend_ejections_total",
+                "type": "Counter",
+                "description": "Number of times each model-service instance was ejected as an outlier",
+                "labels": ["backend"]
+            },
+            {
+                "name": "model_service_hedge_requests_total",
+                "type": "Counter",
+                "description": "Hedgeable model-service calls, by outcome (not_needed, primary_won, hedge_won, budget_exhausted)",
+                "labels": ["outcome"]
+            },
+            {
+                "name": "model_service_hedge_delay_seconds",
+                "type": "Gauge",
+                "description": "Time after which an unanswered model-service call is hedged"
+            },
+            {
+                "name": "model_service_retries_total",
+                "type": "Counter",
+                "description": "Retries of failed idempotent model-service calls, by outcome (sent, budget_exhausted)",
+                "labels": ["outcome"]
             }
         ]
     }
@@ -582,6 +1604,111 @@ def track_session():
         "experiment_variant": experiment_variant
     })
 
+def parse_track_event(event):
+    """Validate one /track/batch event, returning (type, value, experiment_variant)."""
+    if not isinstance(event, dict):
+        raise ValueError("Event must be an object")
+    event_type = event.get('type')
+    experiment_variant = event.get('experiment_variant', 'control')
+    if not isinstance(experiment_variant, str):
+        raise ValueError("Experiment variant must be a string")
+    if event_type == 'session':
+        if 'duration' not in event:
+            raise ValueError("Missing 'duration' field")
+        duration = event['duration']
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not math.isfinite(duration):
+            raise ValueError("Duration must be a finite number")
+        if duration < 0:
+            raise ValueError("Duration must be non-negative")
+        return event_type, float(duration), experiment_variant
+    if event_type == 'click':
+        return event_type, None, experiment_variant
+    if event_type == 'rating':
+        rating = event.get('rating')
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+            raise ValueError("Rating must be an integer between 1-5")
+        return event_type, rating, experiment_variant
+    raise ValueError("Event type must be 'session', 'click' or 'rating'")
+
+@app.route('/track/batch', methods=['POST'])
+def track_batch():
+    """
+    Track a batch of analytics events in one request
+    ---
+    tags:
+      - Analytics
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            events:
+              type: array
+              items:
+                type: object
+                properties:
+                  type:
+                    type: string
+                    enum: [session, click, rating]
+                  duration:
+                    type: number
+                    description: "Session duration in seconds (session events)"
+                  rating:
+                    type: integer
+                    minimum: 1
+                    maximum: 5
+                    description: "Star rating (rating events)"
+                  experiment_variant:
+                    type: string
+                    example: "variant_a"
+          required:
+            - events
+    responses:
+      200:
+        description: Number of recorded events and the index and reason of every rejected event
+      400:
+        description: Bad Request
+    """
+    if not request.is_json:
+        logger.warning("Batch tracking request not in JSON format")
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list):
+        return jsonify({"error": "'events' must be a list"}), 400
+    if len(events) > TRACK_BATCH_MAX_EVENTS:
+        logger.warning("Batch tracking request with {} events exceeds the limit", len(events))
+        return jsonify({"error": f"At most {TRACK_BATCH_MAX_EVENTS} events are allowed per batch"}), 400
+
+    # Validate everything first, then apply the valid events in one pass
+    durations, ratings, clicks, rejected = [], [], {}, []
+    for index, event in enumerate(events):
+        try:
+            event_type, value, experiment_variant = parse_track_event(event)
+        except ValueError as e:
+            rejected.append({"index": index, "error": str(e)})
+            continue
+        if event_type == 'session':
+            durations.append(value)
+        elif event_type == 'click':
+            clicks[experiment_variant] = clicks.get(experiment_variant, 0) + 1
+        else:
+            ratings.append(value)
+
+    for duration in durations:
+        SESSION_DURATION.observe(duration)
+    for rating in ratings:
+        USER_RATINGS.observe(rating)
+    for experiment_variant, count in clicks.items():
+        USER_CLICKS.labels(experiment_variant=experiment_variant).inc(count)
+
+    accepted = len(events) - len(rejected)
+    logger.info("Batch tracked: {} events accepted, {} rejected", accepted, len(rejected))
+    return jsonify({"status": "success", "accepted": accepted, "rejected": rejected})
+
 if __name__ == '__main__':
     # For development only
     logger.info("Starting Flask development server on port 5000")
@@ -0,0 +1,341 @@
+"""
+Async (ASGI) entry point for the app service.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+/predict, /version, /health and /ready are served natively on the event loop with a
+non-blocking model-service client, so a single process can hold thousands of
+in-flight predictions. All other routes (/submit-rating, /track/*, /metrics,
+/metrics-info, /apidocs, ...) are delegated to the Flask app, which keeps the
+Prometheus metrics and Swagger docs identical to the synchronous mode.
+"""
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from loguru import logger
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_service
+from config import (
+    MODEL_SERVICE_CONNECT_TIMEOUT,
+    MODEL_SERVICE_READ_TIMEOUT,
+    ASYNC_MODEL_SERVICE_MAX_CONNECTIONS,
+    ASYNC_WSGI_THREADS,
+    SINGLE_FLIGHT_ENABLED,
+    PREDICT_PASSTHROUGH
+)
+from model_client import MODEL_CLIENT_IN_FLIGHT
+from hedging import hedger as default_hedger, retrier as default_retrier, retry_budget
+from load_balancer import model_router
+from circuit_breaker import CircuitOpenError, model_service_breaker
+from prediction_cache import make_cache_key
+from singleflight import AsyncSingleFlight, make_flight_key
+from concurrency_limit import ConcurrencyLimitExceeded, is_priority_variant
+from profiling import StageTimer
+from passthrough import PassthroughResponse, read_passthrough_async
+from json_provider import json_dumps, json_loads
+from http_caching import finalize_asgi_response
+
+
+class AsyncModelServiceClient:
+    """Non-blocking counterpart of model_client.ModelServiceClient built on httpx."""
+
+    def __init__(self, max_connections=ASYNC_MODEL_SERVICE_MAX_CONNECTIONS,
+                 connect_timeout=MODEL_SERVICE_CONNECT_TIMEOUT,
+                 read_timeout=MODEL_SERVICE_READ_TIMEOUT,
+                 breaker=model_service_breaker,
+                 router=model_router,
+                 hedger=default_hedger,
+                 retrier=default_retrier):
+        self.breaker = breaker
+        self.router = router
+        self.hedger = hedger
+        self.retrier = retrier
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+
+    async def request(self, method, path, read_timeout=None, experiment_variant=None, stream=False,
+                      idempotent=None, hedge=False, **kwargs):
+        """
+        Send a request to the model-service instance picked by the router, raising
+        httpx.HTTPError on connection errors and timeouts and CircuitOpenError
+        while the circuit breaker is open. With stream=True only the headers are
+        read; the caller must read or close the response. Retries and hedging
+        work as in ModelServiceClient.request(); a losing hedged attempt is cancelled.
+        """
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD')
+
+        def attempt():
+            return self._send(method, path, read_timeout, experiment_variant, stream, **kwargs)
+
+        def hedged_attempt():
+            return self.hedger.acall(attempt, _succeeded, _discard)
+
+        hedged = hedge and self.hedger is not None and self.hedger.enabled
+        send = hedged_attempt if hedged else attempt
+
+        with retry_budget.call():
+            if idempotent and self.retrier is not None and self.retrier.enabled:
+                return await self.retrier.acall(send, _retryable, _succeeded, _discard)
+            return await send()
+
+    async def _send(self, method, path, read_timeout, experiment_variant, stream, **kwargs):
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+        pool = self.router.pool(experiment_variant)
+        backend = pool.acquire()
+        timeout = httpx.Timeout(read_timeout or self.read_timeout, connect=self.connect_timeout)
+        MODEL_CLIENT_IN_FLIGHT.inc()
+        start_time = time.perf_counter()
+        try:
+            request = self._client.build_request(
+                method,
+                f"{backend.url}{path}",
+                timeout=timeout,
+                **kwargs
+            )
+            response = await self._client.send(request, stream=stream)
+        except httpx.HTTPError:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            pool.release(backend, time.perf_counter() - start_time, failed=True)
+            raise
+        except BaseException:
+            pool.release(backend, time.perf_counter() - start_time, failed=None)  # Cancelled
+            raise
+        finally:
+            MODEL_CLIENT_IN_FLIGHT.dec()
+
+        failed = response.status_code >= 500
+        pool.release(backend, time.perf_counter() - start_time, failed=failed)
+        if self.breaker is not None:
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        return response
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _succeeded(response):
+    return response.status_code < 500
+
+
+async def _discard(response):
+    await response.aclose()
+
+
+def _retryable(exc):
+    return isinstance(exc, httpx.HTTPError)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded like the Flask routes' responses (with orjson when enabled)."""
+
+    def render(self, content):
+        return json_dumps(content).encode('utf-8')
+
+
+def finalized(endpoint):
+    """Route endpoint whose answers get the ETags, 304s and compression of the Flask routes."""
+    async def route(request):
+        return finalize_asgi_response(request, await endpoint(request))
+    return route
+
+
+async_model_client = AsyncModelServiceClient()
+
+# Coalesces identical in-flight /predict calls on the event loop (None when disabled)
+prediction_flights = AsyncSingleFlight() if SINGLE_FLIGHT_ENABLED else None
+
+
+async def health_check(request):
+    return JSONResponse({
+        "status": "ok",
+        "model_service_circuit": model_service_breaker.state if model_service_breaker is not None else "disabled",
+        "model_service_backends": model_router.status()
+    })
+
+
+async def readiness_check(request):
+    startup_probe = flask_service.startup_probe
+    if startup_probe.ready:
+        return JSONResponse({"status": "ready"})
+    return JSONResponse({"status": "starting", "error": startup_probe.error}, status_code=503)
+
+
+async def get_version_info(request):
+    logger.info("Version info request received")
+    return Response(flask_service.version_cache.body(), media_type='application/json')
+
+
+async def predict(request):
+    timer = StageTimer()
+
+    try:
+        with timer.stage('parse'):
+            data = json_loads(await request.body())
+    except ValueError:
+        logger.warning("Prediction request not in JSON format")
+        return JSONResponse({"error": "Request must be JSON"}, status_code=400)
+
+    if not isinstance(data, dict) or 'data' not in data:
+        logger.warning("Prediction request missing 'data' field")
+        return JSONResponse({"error": "Missing 'data' field in request"}, status_code=400)
+
+    experiment_variant = data.get('experiment_variant', 'control')
+    flask_service.USER_CLICKS.labels(experiment_variant=experiment_variant).inc()
+
+    cache = flask_service.prediction_cache
+    cache_key = None
+    if cache is not None:
+        with timer.stage('cache'):
+            cache_key = make_cache_key(data['data'], flask_service.get_model_version_key(experiment_variant))
+            cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            flask_service.record_predictions([cached_result], experiment_variant)
+            with timer.stage('serialize'):
+                response = FastJSONResponse(cached_result)
+            flask_service.record_latency(timer.finish(), experiment_variant)
+            return response
+
+    async def call_model_service():
+        limiter = flask_service.concurrency_limiter
+        if limiter is None:
+            return await call_upstream()
+        if not limiter.try_acquire(is_priority_variant(experiment_variant)):
+            raise ConcurrencyLimitExceeded(limiter.limit)
+        call_start = time.perf_counter()
+        try:
+            prediction_result, status_code = await call_upstream()
+        except CircuitOpenError:
+            limiter.release()  # Failed fast, no model-service call was made
+            raise
+        except BaseException:
+            limiter.release(time.perf_counter() - call_start, failed=True)
+            raise
+        limiter.release(time.perf_counter() - call_start, failed=status_code >= 500)
+        return prediction_result, status_code
+
+    async def call_upstream():
+        if PREDICT_PASSTHROUGH:
+            # Send the client's body as-is and forward the answer without decoding it
+            model_response = await async_model_client.request(
+                "POST", "/predict", experiment_variant=experiment_variant, content=await request.body(),
+                headers={"Content-Type": "application/json"}, stream=True, idempotent=True, hedge=True
+            )
+            if model_response.status_code == 200:
+                return await read_passthrough_async(model_response), 200
+            await model_response.aread()
+        else:
+            model_response = await async_model_client.request(
+                "POST", "/predict", experiment_variant=experiment_variant, json=data, idempotent=True, hedge=True
+            )
+        try:
+            return model_response.json(), model_response.status_code
+        except ValueError:
+            return {"error": model_response.text}, model_response.status_code
+
+    try:
+        with timer.stage('upstream'):
+            if prediction_flights is not None:
+                # Identical concurrent requests share one upstream call
+                flight_key = make_flight_key(data['data'], experiment_variant)
+                prediction_result, status_code = await prediction_flights.do(flight_key, call_model_service)
+                if isinstance(prediction_result, PassthroughResponse) and not prediction_result.claim():
+                    # A streamed answer can only be sent once and another request took it
+                    prediction_result, status_code = await call_model_service()
+            else:
+                prediction_result, status_code = await call_model_service()
+    except CircuitOpenError as e:
+        logger.warning("Model service circuit open, failing fast")
+        flask_service.record_latency(timer.finish(), experiment_variant)
+        return JSONResponse(
+            {"error": "Model service is unavailable (circuit breaker open)", "retry_after": e.retry_after},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ConcurrencyLimitExceeded as e:
+        logger.warning("Shedding prediction request: {}", str(e))
+        return JSONResponse(
+            {"error": "Model service is overloaded, request shed", "concurrency_limit": e.limit},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
+    except httpx.HTTPError as e:
+        error_msg = f"Error connecting to model service: {str(e)}"
+        logger.error(error_msg)
+        flask_service.record_latency(timer.finish(), experiment_variant)
+        return JSONResponse({"error": error_msg}, status_code=500)
+
+    if isinstance(prediction_result, PassthroughResponse):
+        flask_service.record_predictions([prediction_result.result], experiment_variant)
+        if cache_key is not None and not prediction_result.streamed:
+            try:
+                cache.set(cache_key, json_loads(prediction_result.body))
+            except ValueError:
+                logger.warning("Model service answer is not valid JSON, not caching it")
+        with timer.stage('serialize'):
+            if prediction_result.streamed:
+                response = StreamingResponse(prediction_result.aiter_body(), status_code=status_code,
+                                             media_type=prediction_result.content_type)
+            else:
+                response = Response(prediction_result.body, status_code=status_code,
+                                    media_type=prediction_result.content_type)
+        flask_service.record_latency(timer.finish(), experiment_variant)
+        return response
+
+    if status_code == 200:
+        flask_service.record_predictions([prediction_result], experiment_variant)
+        if cache_key is not None:
+            cache.set(cache_key, prediction_result)
+    else:
+        logger.error("Model service returned error status code: {}", status_code)
+
+    with timer.stage('serialize'):
+        response = FastJSONResponse(prediction_result, status_code=status_code)
+    flask_service.record_latency(timer.finish(), experiment_variant)
+    return response
+
+
+@asynccontextmanager
+async def lifespan(app):
+    logger.info("Async app service started with model-service instances: {}", model_router.default_pool.urls)
+    yield
+    await async_model_client.aclose()
+    if flask_service.rating_writer is not None:
+        # Write the ratings still queued by the write-behind writer before the worker exits
+        await run_in_threadpool(flask_service.rating_writer.flush)
+
+
+# Same CORS policy as CORS(app) in the Flask app; the mounted Flask routes already send their own headers
+cors = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+
+app = Starlette(
+    routes=[
+        Route('/health', finalized(health_check), methods=['GET', 'OPTIONS'], middleware=cors),
+        Route('/ready', finalized(readiness_check), methods=['GET', 'OPTIONS'], middleware=cors),
+        Route('/version', finalized(get_version_info), methods=['GET', 'OPTIONS'], middleware=cors),
+        Route('/predict', finalized(predict), methods=['POST', 'OPTIONS'], middleware=cors),
+        # Everything else, including /metrics and the Swagger docs, is served by Flask
+        Mount('/', app=WSGIMiddleware(flask_service.app.wsgi_app, workers=ASYNC_WSGI_THREADS)),
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,83 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from loguru import logger
+from config import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_MAX_IN_FLIGHT
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single predictions into one upstream batch call.
+
+    Callers block on predict(); a background thread collects pending texts until
+    MICRO_BATCH_MAX_SIZE items are queued or MICRO_BATCH_MAX_WAIT_MS has passed
+    since the first one arrived and hands the batch to a pool of senders, which
+    call predict_batch_fn and give each caller its own result (or the batch's
+    exception). Up to MICRO_BATCH_MAX_IN_FLIGHT batches are sent at a time; when
+    all of them are out, new predictions queue up for the next batch.
+    """
+
+    def __init__(self, predict_batch_fn, max_batch_size=MICRO_BATCH_MAX_SIZE,
+                 max_wait_ms=MICRO_BATCH_MAX_WAIT_MS, max_in_flight=MICRO_BATCH_MAX_IN_FLIGHT):
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+        self._start()
+        # Threads do not survive fork, restart the batcher in every gunicorn worker (preload_app)
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._pending = queue.Queue()
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._senders = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="micro-batch-send")
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, text, timeout=None):
+        """Queue text for the next batch and wait for its prediction result."""
+        future = Future()
+        self._pending.put((text, future))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        # Block for the first item, then fill the batch until it is full or the window closes
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Wait for a free sender before opening the next batch, so that
+            # predictions arriving meanwhile are grouped instead of queued as small batches
+            self._slots.acquire()
+            batch = self._collect()
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch):
+        try:
+            texts = [text for text, _ in batch]
+            try:
+                results = self.predict_batch_fn(texts)
+                if len(results) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} predictions from model service, got {len(results)}")
+            except Exception as e:
+                logger.error("Micro-batch of {} predictions failed: {}", len(batch), str(e))
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
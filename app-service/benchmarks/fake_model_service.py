@@ -0,0 +1,103 @@
+"""
+Local stand-in for the model-service, used for benchmarking the app-service.
+
+Implements /, /version and /predict (single {"data": "text"} or batch
+{"data": ["text", ...]} bodies) with tunable latency and error rate.
+
+Usage:
+    python benchmarks/fake_model_service.py --port 8080 --latency-ms 20 --jitter-ms 5 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POSITIVE_WORDS = ("good", "great", "love", "excellent", "amazing", "delicious", "friendly")
+
+
+def predict_sentiment(text):
+    """Cheap deterministic stand-in for the model: 1 if the text contains a positive word."""
+    lowered = str(text).lower()
+    return 1 if any(word in lowered for word in POSITIVE_WORDS) else 0
+
+
+class FakeModelServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real service behind gunicorn
+    server_version = 'FakeModelService/1.0'
+
+    def log_message(self, format, *args):
+        pass  # Request logging would dominate the cost of the fake
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_work(self):
+        """Sleep for the configured latency; return True if this call should fail."""
+        config = self.server.config
+        latency = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000.0
+        time.sleep(latency)
+        return random.random() < config.error_rate
+
+    def do_GET(self):
+        if self.path == '/version':
+            self._send_json({"version": self.server.config.version})
+        elif self.path == '/':
+            self._send_json({"status": "ok"})
+        else:
+            self._send_json({"error": "Not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            data = json.loads(self.rfile.read(length) or b'{}').get('data')
+        except (ValueError, AttributeError):
+            self._send_json({"error": "Invalid JSON"}, status=400)
+            return
+
+        if self.path not in ('/predict', '/predict/batch'):
+            self._send_json({"error": "Not found"}, status=404)
+            return
+        if self._simulate_work():
+            self._send_json({"error": "Simulated model failure"}, status=500)
+            return
+
+        if isinstance(data, list):
+            self._send_json({"predictions": [predict_sentiment(text) for text in data]})
+        else:
+            self._send_json({"prediction": predict_sentiment(data)})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Mean latency of /predict calls')
+    parser.add_argument('--jitter-ms', type=float, default=5.0, help='Standard deviation of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of /predict calls answered with 500')
+    parser.add_argument('--version', default='benchmark-1.0.0', help='Version reported by /version')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    server = ThreadingHTTPServer((config.host, config.port), FakeModelServiceHandler)
+    server.daemon_threads = True
+    server.config = config
+    print(f"Fake model-service listening on http://{config.host}:{config.port} "
+          f"(latency {config.latency_ms}±{config.jitter_ms} ms, error rate {config.error_rate})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+JSON encoding/decoding benchmark for the app-service.
+
+Compares the standard library provider (flasgger's LazyJSONEncoder, Flask's
+default) with the orjson-backed provider of json_provider.py on payloads shaped
+like the service's real traffic: /predict requests and answers, batch answers,
+review feed pages, rating submissions and the Swagger spec. Encoding is measured
+through provider.response() (what jsonify() does) and decoding through
+provider.loads() (what request.get_json() does).
+
+Usage:
+    python benchmarks/json_providers.py --iterations 20000 --output json-results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+from flasgger import LazyJSONEncoder
+from flask import Flask
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+import json_provider  # noqa: E402
+
+REVIEW = "The food was absolutely amazing, the staff were friendly and the tiramisu was the best we've had in years!"
+
+
+def build_payloads():
+    """Representative request and response bodies, by name."""
+    with open(os.path.join(SERVICE_DIR, 'seed_reviews.json')) as f:
+        seed_reviews = json.load(f)
+    feed_page = {
+        "restaurant": "Trattoria Roma",
+        "reviews": [
+            {"seq": 1000 - i, "author": f"guest{i}", "review_text": REVIEW, "sentiment": "positive",
+             "rating": 5, "timestamp": "2025-06-01T12:00:00+00:00"}
+            for i in range(20)
+        ],
+        "next_cursor": 980
+    }
+    swagger_paths = {
+        f"/route{i}": {"post": {
+            "tags": ["Prediction"], "summary": "Predict sentiment", "consumes": ["application/json"],
+            "parameters": [{"in": "body", "name": "body", "required": True,
+                            "schema": {"type": "object", "properties": {"data": {"type": "string"}}}}],
+            "responses": {"200": {"description": "Prediction result"}, "400": {"description": "Bad Request"}}
+        }}
+        for i in range(40)
+    }
+    return {
+        "predict_request": {"data": REVIEW, "experiment_variant": "control"},
+        "predict_response": {"prediction": 1},
+        "batch_response_100": {"predictions": [{"prediction": i % 2} for i in range(100)]},
+        "feed_page_20": feed_page,
+        "rating_submission": {"rating": 4, "review_text": REVIEW, "sentiment": "positive",
+                              "restaurant": "Trattoria Roma", "experiment_variant": "control"},
+        "seed_reviews": seed_reviews,
+        "swagger_spec": {"swagger": "2.0", "info": {"title": "App Service API", "version": "1.0.0"},
+                         "paths": swagger_paths}
+    }
+
+
+def ops_per_second(fn, iterations):
+    for _ in range(min(1000, iterations)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000, help='Operations timed per payload and provider')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not json_provider.ORJSON_AVAILABLE:
+        print("orjson is not installed, nothing to compare (pip install orjson)")
+        return 1
+
+    app = Flask(__name__)
+    providers = {"stdlib": LazyJSONEncoder(app), "orjson": json_provider.OrjsonProvider(app)}
+    for provider in providers.values():
+        provider.compact = True
+
+    results = {}
+    print(f"{'payload':<20}{'bytes':>8}  {'encode stdlib':>14}{'orjson':>12}{'speedup':>9}"
+          f"  {'decode stdlib':>14}{'orjson':>12}{'speedup':>9}")
+    for name, payload in build_payloads().items():
+        body = providers["stdlib"].response(payload).get_data()
+        result = {"bytes": len(body)}
+        for operation, make_fn in (
+            ("encode", lambda provider: lambda: provider.response(payload)),
+            ("decode", lambda provider: lambda: provider.loads(body))
+        ):
+            rates = {key: ops_per_second(make_fn(provider), args.iterations) for key, provider in providers.items()}
+            result[operation] = {
+                "stdlib_ops_per_s": round(rates["stdlib"]),
+                "orjson_ops_per_s": round(rates["orjson"]),
+                "speedup": round(rates["orjson"] / rates["stdlib"], 2)
+            }
+        results[name] = result
+        print(f"{name:<20}{len(body):>8}  "
+              f"{result['encode']['stdlib_ops_per_s']:>14}{result['encode']['orjson_ops_per_s']:>12}"
+              f"{result['encode']['speedup']:>8}x  "
+              f"{result['decode']['stdlib_ops_per_s']:>14}{result['decode']['orjson_ops_per_s']:>12}"
+              f"{result['decode']['speedup']:>8}x", flush=True)
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "version": os.environ.get('BENCHMARK_VERSION', 'unknown'),
+                "iterations": args.iterations,
+                "python": platform.python_version()
+            },
+            "payloads": results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
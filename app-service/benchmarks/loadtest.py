@@ -0,0 +1,319 @@
+"""
+Load-testing and latency benchmark for the app-service.
+
+Drives /predict, /submit-rating, /track/session and /version (and /track/batch
+when 'track-batch' is added to --mix) either at a fixed concurrency (closed
+loop) or at a target request rate (open loop, latency is measured from the
+scheduled send time so a slow server cannot hide queueing).
+Reports p50/p95/p99 latency, throughput and errors per endpoint and writes
+them to a JSON file that can be compared with a previous run.
+
+Usage:
+    python benchmarks/loadtest.py --base-url http://localhost:5000 --duration 30 --concurrency 32
+    python benchmarks/loadtest.py --rps 200 --output results.json --compare baseline.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+SAMPLE_REVIEWS = [
+    "The food was absolutely amazing and the staff were friendly!",
+    "Terrible service, we waited an hour for cold pasta.",
+    "Great atmosphere, decent prices, would come back.",
+    "The soup was bland and the bread was stale.",
+    "I love their desserts, the tiramisu is excellent.",
+    "Not worth the money, portions were tiny.",
+    "Delicious curry and very quick delivery.",
+    "The waiter was rude and the table was dirty.",
+]
+RESTAURANTS = ["Pasta Palace", "Curry House", "Sushi Corner", "Burger Barn"]
+VARIANTS = ["control", "variant_a", "variant_b"]
+
+DEFAULT_MIX = "predict=70,submit-rating=10,track-session=10,version=10"
+
+
+def build_request(endpoint, unique_texts):
+    """Return (method, path, json_body) for one request to the given endpoint."""
+    review = random.choice(SAMPLE_REVIEWS)
+    if unique_texts:
+        # Defeat the prediction cache so every call reaches the model service
+        review = f"{review} #{random.getrandbits(48):x}"
+
+    if endpoint == 'predict':
+        return 'POST', '/predict', {"data": review, "experiment_variant": random.choice(VARIANTS)}
+    if endpoint == 'submit-rating':
+        return 'POST', '/submit-rating', {
+            "review_text": review,
+            "rating": random.randint(1, 5),
+            "sentiment": random.choice(["positive", "negative"]),
+            "restaurant": random.choice(RESTAURANTS)
+        }
+    if endpoint == 'track-session':
+        return 'POST', '/track/session', {
+            "duration": round(random.uniform(5, 1800), 1),
+            "experiment_variant": random.choice(VARIANTS)
+        }
+    if endpoint == 'track-batch':
+        # One request carrying the events a client would otherwise send one by one
+        return 'POST', '/track/batch', {"events": [
+            {"type": "session", "duration": round(random.uniform(5, 1800), 1), "experiment_variant": random.choice(VARIANTS)},
+            *({"type": "click", "experiment_variant": random.choice(VARIANTS)} for _ in range(5)),
+            {"type": "rating", "rating": random.randint(1, 5)}
+        ]}
+    if endpoint == 'version':
+        return 'GET', '/version', None
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def parse_mix(mix):
+    """Parse 'predict=70,version=30' into a list of endpoints and a list of weights."""
+    endpoints, weights = [], []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        endpoints.append(name.strip())
+        weights.append(float(weight or 1))
+    for endpoint in endpoints:
+        build_request(endpoint, False)  # Validates the endpoint name
+    return endpoints, weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint latencies and errors."""
+
+    def __init__(self, endpoints):
+        self._lock = threading.Lock()
+        self.latencies = {endpoint: [] for endpoint in endpoints}
+        self.errors = {endpoint: 0 for endpoint in endpoints}
+        self.status_codes = {endpoint: {} for endpoint in endpoints}
+
+    def record(self, endpoint, latency, status):
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            codes = self.status_codes[endpoint]
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            if not isinstance(status, int) or status >= 400:
+                self.errors[endpoint] += 1
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.endpoints, self.weights = parse_mix(args.mix)
+        self.recorder = Recorder(self.endpoints)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _send(self, endpoint, scheduled_at):
+        method, path, body = build_request(endpoint, self.args.unique_texts)
+        try:
+            response = self._session().request(
+                method, f"{self.args.base_url}{path}", json=body, timeout=self.args.timeout
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        self.recorder.record(endpoint, time.perf_counter() - scheduled_at, status)
+
+    def _pick(self):
+        return random.choices(self.endpoints, weights=self.weights)[0]
+
+    def run_closed_loop(self, deadline):
+        def worker():
+            while time.perf_counter() < deadline:
+                self._send(self._pick(), time.perf_counter())
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open_loop(self, deadline):
+        interval = 1.0 / self.args.rps
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            next_send = time.perf_counter()
+            while next_send < deadline:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, self._pick(), next_send)
+                next_send += interval
+
+    def run(self):
+        if self.args.warmup > 0:
+            warmup_deadline = time.perf_counter() + self.args.warmup
+            while time.perf_counter() < warmup_deadline:
+                self._send(self._pick(), time.perf_counter())
+            self.recorder = Recorder(self.endpoints)
+
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        if self.args.rps:
+            self.run_open_loop(deadline)
+        else:
+            self.run_closed_loop(deadline)
+        return time.perf_counter() - started
+
+
+def summarize(latencies, errors, status_codes, elapsed):
+    values = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "error_rate": round(errors / len(values), 4) if values else 0.0,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "status_codes": status_codes,
+        "latency_ms": {
+            "mean": to_ms(sum(values) / len(values)) if values else None,
+            "p50": to_ms(percentile(values, 0.50)),
+            "p95": to_ms(percentile(values, 0.95)),
+            "p99": to_ms(percentile(values, 0.99)),
+            "max": to_ms(values[-1]) if values else None
+        }
+    }
+
+
+def build_report(args, recorder, elapsed):
+    endpoints = {
+        endpoint: summarize(recorder.latencies[endpoint], recorder.errors[endpoint],
+                            recorder.status_codes[endpoint], elapsed)
+        for endpoint in recorder.latencies
+    }
+    all_latencies = [latency for values in recorder.latencies.values() for latency in values]
+    total = summarize(all_latencies, sum(recorder.errors.values()), {}, elapsed)
+    total.pop("status_codes")
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "version": os.environ.get('BENCHMARK_VERSION', 'unknown'),
+            "base_url": args.base_url,
+            "mode": "open-loop" if args.rps else "closed-loop",
+            "target_rps": args.rps,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 3),
+            "mix": args.mix,
+            "unique_texts": args.unique_texts,
+            "python": platform.python_version()
+        },
+        "endpoints": endpoints,
+        "total": total
+    }
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<16}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, stats in rows:
+        latency = stats["latency_ms"]
+        print(f"{name:<16}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10}"
+              f"{latency['p50'] or '-':>10}{latency['p95'] or '-':>10}{latency['p99'] or '-':>10}")
+
+
+def compare_reports(baseline, current, max_regression, max_error_rate_increase):
+    """
+    Print the relative change of p95/p99 latency, throughput and error rate per endpoint.
+
+    Returns the list of latency/throughput changes worse than max_regression (a fraction,
+    e.g. 0.2 = 20%) and error rate increases above max_error_rate_increase.
+    """
+    regressions = []
+    print(f"\nComparison with baseline ({baseline['meta'].get('version')}, {baseline['meta'].get('timestamp')}):")
+    names = [name for name in current["endpoints"] if name in baseline["endpoints"]] + ["TOTAL"]
+    for name in names:
+        old = baseline["total"] if name == "TOTAL" else baseline["endpoints"][name]
+        new = current["total"] if name == "TOTAL" else current["endpoints"][name]
+        checks = [
+            ("p95 ms", old["latency_ms"]["p95"], new["latency_ms"]["p95"], True),
+            ("p99 ms", old["latency_ms"]["p99"], new["latency_ms"]["p99"], True),
+            ("rps", old["throughput_rps"], new["throughput_rps"], False),
+        ]
+        for metric, old_value, new_value, higher_is_worse in checks:
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = change > max_regression if higher_is_worse else change < -max_regression
+            marker = "  REGRESSION" if worse else ""
+            print(f"  {name:<16}{metric:<8}{old_value:>10} -> {new_value:<10} ({change:+.1%}){marker}")
+            if worse:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+        if new["error_rate"] > old["error_rate"] + max_error_rate_increase:
+            print(f"  {name:<16}errors  {old['error_rate']:>10} -> {new['error_rate']:<10}  REGRESSION")
+            regressions.append(f"{name} error rate {old['error_rate']} -> {new['error_rate']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured duration in seconds')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Unmeasured warm-up in seconds')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Closed-loop clients, or maximum in-flight requests in open-loop mode')
+    parser.add_argument('--rps', type=float, default=0.0, help='Target request rate (open loop); 0 = closed loop')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weighted endpoint mix (default: {DEFAULT_MIX})')
+    parser.add_argument('--unique-texts', action='store_true', help='Make every review unique to bypass caching')
+    parser.add_argument('--timeout', type=float, default=35.0, help='Per-request timeout in seconds')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Relative change counted as a regression (default 0.2 = 20%%)')
+    parser.add_argument('--max-error-rate-increase', type=float, default=0.01,
+                        help='Absolute error rate increase counted as a regression (default 0.01)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mode = f"{args.rps} rps" if args.rps else f"{args.concurrency} concurrent clients"
+    print(f"Benchmarking {args.base_url} for {args.duration}s at {mode} ({args.mix})", flush=True)
+
+    generator = LoadGenerator(args)
+    elapsed = generator.run()
+    report = build_report(args, generator.recorder, elapsed)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print(f"\nBaseline {args.compare} not found, skipping comparison")
+            return 0
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.max_regression, args.max_error_rate_increase)
+        if regressions and args.fail_on_regression:
+            print(f"\n{len(regressions)} regression(s) above {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
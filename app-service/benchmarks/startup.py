@@ -0,0 +1,155 @@
+"""
+Startup-time benchmark for the app-service.
+
+Starts the service (gunicorn with the production config by default) repeatedly
+and measures, from process spawn, how long it takes until /health answers
+(liveness) and until /ready answers 200 (readiness). By default the
+model-service URL points at a port nothing listens on, the worst case for a
+cold pod; pass --model-service-url to measure against a running (fake)
+model-service instead.
+
+Usage:
+    python benchmarks/startup.py --runs 5 --output startup-results.json
+    python benchmarks/startup.py --model-service-url http://127.0.0.1:8080 --compare startup-baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, deadline, expect_ok):
+    """Poll url until it answers (with a 2xx status if expect_ok); return the time it did, or None."""
+    while time.monotonic() < deadline:
+        try:
+            response = requests.get(url, timeout=1)
+            if not expect_ok or response.ok:
+                return time.monotonic()
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_once(args, run_dir):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        MODEL_SERVICE_URL=args.model_service_url,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKERS=str(args.workers),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(run_dir, 'prometheus'),
+        RATINGS_DB_PATH=os.path.join(run_dir, 'ratings.db'),
+        PREDICTION_CACHE_PATH=os.path.join(run_dir, 'prediction_cache.sqlite3'),
+        LOG_LEVEL='WARNING',
+    )
+    start = time.monotonic()
+    process = subprocess.Popen(shlex.split(args.command), cwd=SERVICE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + args.timeout
+        live = wait_for(f"{base_url}/health", deadline, expect_ok=True)
+        ready = wait_for(f"{base_url}/ready", deadline, expect_ok=True) if live else None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return (
+        round((live - start) * 1000, 1) if live else None,
+        round((ready - start) * 1000, 1) if ready else None
+    )
+
+
+def summarize(values):
+    measured = [value for value in values if value is not None]
+    return {
+        "runs": len(values),
+        "timeouts": len(values) - len(measured),
+        "median": round(statistics.median(measured), 1) if measured else None,
+        "min": min(measured) if measured else None,
+        "max": max(measured) if measured else None
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--command', default='gunicorn -c gunicorn.conf.py',
+                        help='Command starting the service; it must honour GUNICORN_BIND')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--model-service-url', default=f"http://127.0.0.1:{free_port()}",
+                        help='Model-service the app is pointed at (default: a port nothing listens on)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds to wait for each run')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"Measuring startup of '{args.command}' over {args.runs} runs "
+          f"(model service at {args.model_service_url})", flush=True)
+
+    live_times, ready_times = [], []
+    for run in range(1, args.runs + 1):
+        with tempfile.TemporaryDirectory(prefix='app-service-startup-') as run_dir:
+            live_ms, ready_ms = measure_once(args, run_dir)
+        live_times.append(live_ms)
+        ready_times.append(ready_ms)
+        print(f"  run {run}: live after {live_ms} ms, ready after {ready_ms} ms", flush=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "version": os.environ.get('BENCHMARK_VERSION', 'unknown'),
+            "command": args.command,
+            "workers": args.workers,
+            "model_service_url": args.model_service_url,
+            "python": platform.python_version()
+        },
+        "time_to_live_ms": summarize(live_times),
+        "time_to_ready_ms": summarize(ready_times)
+    }
+    print(f"\nTime to live:  {report['time_to_live_ms']}")
+    print(f"Time to ready: {report['time_to_ready_ms']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparison with baseline ({baseline['meta'].get('version')}, {baseline['meta'].get('timestamp')}):")
+        for key in ("time_to_live_ms", "time_to_ready_ms"):
+            old, new = baseline[key]["median"], report[key]["median"]
+            if old and new:
+                print(f"  {key:<18}{old:>10} -> {new:<10} ({(new - old) / old:+.1%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import math
+import os
+import threading
+import time
+
+import requests
+from loguru import logger
+from prometheus_client import Counter, Gauge
+from config import (
+    CIRCUIT_BREAKER_ENABLED,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RECOVERY_TIMEOUT,
+    CIRCUIT_HALF_OPEN_MAX_CALLS
+)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+# Prometheus metrics for the model-service circuit breaker
+CIRCUIT_STATE = Gauge(
+    'model_service_circuit_state',
+    'Current model-service circuit breaker state (1 for the active state)',
+    ['state'],
+    multiprocess_mode='livemax'
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    'model_service_circuit_transitions_total',
+    'Number of model-service circuit breaker state transitions',
+    ['from_state', 'to_state']
+)
+
+CIRCUIT_REJECTIONS = Counter(
+    'model_service_circuit_rejections_total',
+    'Number of model-service calls rejected without being sent because the circuit was open'
+)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling the model service while the circuit is open."""
+
+    def __init__(self, retry_after):
+        super().__init__("Model service circuit is open, failing fast")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around model-service calls.
+
+    closed:    calls go through; CIRCUIT_FAILURE_THRESHOLD consecutive failures open the circuit.
+    open:      calls fail fast with CircuitOpenError until CIRCUIT_RECOVERY_TIMEOUT has passed.
+    half_open: up to CIRCUIT_HALF_OPEN_MAX_CALLS trial calls are let through; a success
+               closes the circuit again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 recovery_timeout=CIRCUIT_RECOVERY_TIMEOUT,
+                 half_open_max_calls=CIRCUIT_HALF_OPEN_MAX_CALLS):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._export_state()
+        # Gauges start at 0 in a forked gunicorn worker (preload_app), export its state there again
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._export_state()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be sent to the model service."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == OPEN:
+                CIRCUIT_REJECTIONS.inc()
+                raise CircuitOpenError(self._retry_after())
+            if self._state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    CIRCUIT_REJECTIONS.inc()
+                    raise CircuitOpenError(1)
+                self._half_open_calls += 1
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+
+    def _retry_after(self):
+        remaining = self.recovery_timeout - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def _transition(self, new_state):
+        logger.warning("Model service circuit breaker: {} -> {}", self._state, new_state)
+        CIRCUIT_TRANSITIONS.labels(from_state=self._state, to_state=new_state).inc()
+        self._state = new_state
+        self._half_open_calls = 0
+        self._export_state()
+
+    def _export_state(self):
+        for state in STATES:
+            CIRCUIT_STATE.labels(state=state).set(1 if state == self._state else 0)
+
+
+# Shared breaker for all model-service calls (None when CIRCUIT_BREAKER_ENABLED is off)
+model_service_breaker = CircuitBreaker() if CIRCUIT_BREAKER_ENABLED else None
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+from config import (
+    CONCURRENCY_LIMIT_ENABLED,
+    CONCURRENCY_INITIAL_LIMIT,
+    CONCURRENCY_MIN_LIMIT,
+    CONCURRENCY_MAX_LIMIT,
+    CONCURRENCY_LATENCY_TOLERANCE,
+    CONCURRENCY_BACKOFF_RATIO,
+    CONCURRENCY_LOW_PRIORITY_SHARE,
+    CONCURRENCY_PRIORITY_VARIANTS
+)
+
+# Prometheus metrics for the /predict concurrency limiter
+CONCURRENCY_LIMIT = Gauge(
+    'predict_concurrency_limit',
+    'Current adaptive limit on concurrent model-service calls from /predict',
+    multiprocess_mode='livesum'
+)
+
+CONCURRENCY_IN_FLIGHT = Gauge(
+    'predict_concurrency_in_flight',
+    'Model-service calls from /predict currently counted against the limit',
+    multiprocess_mode='livesum'
+)
+
+REQUESTS_SHED = Counter(
+    'predict_requests_shed_total',
+    'Number of /predict requests rejected because the concurrency limit was reached',
+    ['priority']
+)
+REQUESTS_SHED.labels(priority='high').inc(0)
+REQUESTS_SHED.labels(priority='low').inc(0)
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when a request is shed because the model service is at its concurrency limit."""
+
+    def __init__(self, limit):
+        super().__init__(f"Concurrency limit of {limit} model-service calls reached")
+        self.limit = limit
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent model-service calls, driven by observed latency.
+
+    The baseline is the lowest call latency seen in the current or previous
+    minute. A call slower than baseline * CONCURRENCY_LATENCY_TOLERANCE, or one
+    that failed, means the model service is queueing and multiplies the limit by
+    CONCURRENCY_BACKOFF_RATIO, at most once per round of in-flight calls. Other
+    calls grow it by 1/limit (about +1 per limit's worth of calls) while at least
+    half of it is in use. Requests beyond the limit are rejected instead of
+    queueing; low-priority experiment variants may only use
+    CONCURRENCY_LOW_PRIORITY_SHARE of it, so they are shed first.
+    """
+
+    def __init__(self, initial_limit=CONCURRENCY_INITIAL_LIMIT, min_limit=CONCURRENCY_MIN_LIMIT,
+                 max_limit=CONCURRENCY_MAX_LIMIT, latency_tolerance=CONCURRENCY_LATENCY_TOLERANCE,
+                 backoff_ratio=CONCURRENCY_BACKOFF_RATIO, low_priority_share=CONCURRENCY_LOW_PRIORITY_SHARE,
+                 baseline_window=60.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.low_priority_share = low_priority_share
+        self.baseline_window = baseline_window
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._window_start = time.monotonic()
+        self._window_min = None
+        self._previous_min = None
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+        CONCURRENCY_LIMIT.set(int(self._limit))
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released in the child,
+        # and the gauge of a forked gunicorn worker (preload_app) starts at 0
+        self._lock = threading.Lock()
+        CONCURRENCY_LIMIT.set(int(self._limit))
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def try_acquire(self, high_priority=True):
+        """Take a slot for one model-service call; returns False when the request should be shed."""
+        with self._lock:
+            allowed = self._limit if high_priority else self._limit * self.low_priority_share
+            if self._in_flight >= max(1, int(allowed)):
+                REQUESTS_SHED.labels(priority='high' if high_priority else 'low').inc()
+                return False
+            self._in_flight += 1
+        CONCURRENCY_IN_FLIGHT.inc()
+        return True
+
+    def release(self, latency=None, failed=False):
+        """
+        Return a slot and adapt the limit to the outcome of the call.
+
+        latency is None when no model-service call was made (e.g. the circuit was
+        open); such calls do not change the limit.
+        """
+        now = time.monotonic()
+        with self._lock:
+            in_flight = self._in_flight
+            self._in_flight -= 1
+            overloaded = failed
+            if latency is not None and not failed:
+                overloaded = latency > self._update_baseline(latency, now) * self.latency_tolerance
+            if overloaded:
+                # Back off once per round of calls: calls already in flight at the last
+                # decrease saw the same overload and must not shrink the limit again
+                if latency is None or now - latency >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+                    self._last_decrease = now
+            elif latency is not None and in_flight * 2 >= self._limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            limit = int(self._limit)
+        CONCURRENCY_IN_FLIGHT.dec()
+        CONCURRENCY_LIMIT.set(limit)
+
+    def _update_baseline(self, latency, now):
+        if now - self._window_start >= self.baseline_window:
+            # Roll the window so the baseline follows lasting changes of the model's speed
+            self._previous_min, self._window_min = self._window_min, None
+            self._window_start = now
+        if self._window_min is None or latency < self._window_min:
+            self._window_min = latency
+        if self._previous_min is None:
+            return self._window_min
+        return min(self._window_min, self._previous_min)
+
+
+def is_priority_variant(experiment_variant):
+    """Variants listed in CONCURRENCY_PRIORITY_VARIANTS (or all, when it is empty) are high priority."""
+    return not CONCURRENCY_PRIORITY_VARIANTS or experiment_variant in CONCURRENCY_PRIORITY_VARIANTS
+
+
+def create_concurrency_limiter():
+    """Build the /predict limiter configured by CONCURRENCY_LIMIT_ENABLED (None when disabled)."""
+    if not CONCURRENCY_LIMIT_ENABLED:
+        return None
+    return AdaptiveConcurrencyLimiter()
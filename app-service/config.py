@@ -11,6 +11,13 @@ except ImportError:
 
 load_dotenv()
 
+def _env_flag(name, default=False):
+    """Read a boolean flag from the environment ('1', 'true', 'yes' and 'on' enable it)."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
 # API Configuration settings
 DEFAULT_MODEL_PORT = 8080
 DEFAULT_MODEL_HOST = 'model-service'  # For docker network
@@ -39,6 +46,186 @@ def get_model_service_url():
     
     return url
 
+# Startup settings
+# LAZY_STARTUP: probe the model service in the background instead of blocking startup on it,
+# and defer the /version payload (libversion lookup) to first use
+LAZY_STARTUP = _env_flag('LAZY_STARTUP', default=True)
+# Seconds between model-service probes until the service is ready (/ready)
+STARTUP_PROBE_INTERVAL = float(os.environ.get('STARTUP_PROBE_INTERVAL', 2))
+
+# Logging settings
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 'text' (human readable) or 'json' (one structured object per line)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+LOG_COLORIZE = _env_flag('LOG_COLORIZE', default=True)
+# Include variable values in exception tracebacks (slow, may leak request data)
+LOG_DIAGNOSE = _env_flag('LOG_DIAGNOSE')
+# Format and write log records on a background thread instead of the request thread
+LOG_ASYNC = _env_flag('LOG_ASYNC', default=True)
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# What to do when the log queue is full: 'drop_new', 'drop_oldest' or 'block'
+LOG_OVERFLOW_POLICY = os.environ.get('LOG_OVERFLOW_POLICY', 'drop_new').lower()
+# Fraction of requests per route whose INFO logs are kept, e.g. 'predict=0.1,health_check=0'
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+
+# Profiling settings
+# Per-stage latency histograms of /predict (parse, cache, upstream, serialize, local)
+PREDICT_STAGE_TIMING = _env_flag('PREDICT_STAGE_TIMING', default=True)
+# Expose GET /debug/profile, which samples the stacks of all threads of the worker
+PROFILER_ENABLED = _env_flag('PROFILER_ENABLED')
+PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', 60))
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+
+# Model service HTTP client settings
+# A single pooled, keep-alive session is shared by all requests to the model service.
+MODEL_SERVICE_POOL_SIZE = int(os.environ.get('MODEL_SERVICE_POOL_SIZE', 10))
+# Request threads of a gunicorn worker in sync mode (see gunicorn.conf.py), used to size per-worker thread pools
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
+MODEL_SERVICE_CONNECT_TIMEOUT = float(os.environ.get('MODEL_SERVICE_CONNECT_TIMEOUT', 3.05))
+MODEL_SERVICE_READ_TIMEOUT = float(os.environ.get('MODEL_SERVICE_READ_TIMEOUT', 30))
+MODEL_SERVICE_VERSION_READ_TIMEOUT = float(os.environ.get('MODEL_SERVICE_VERSION_READ_TIMEOUT', 5))
+
+# Model-service load balancing
+# Comma-separated model-service instances; when empty the single MODEL_SERVICE_URL is used
+MODEL_SERVICE_URLS = os.environ.get('MODEL_SERVICE_URLS', '')
+# Dedicated instances per experiment variant, e.g. 'variant_b=http://model-v2:8080|http://model-v2b:8080'
+MODEL_SERVICE_VARIANT_URLS = os.environ.get('MODEL_SERVICE_VARIANT_URLS', '')
+# 'p2c' (power of two choices) or 'least_outstanding'
+LOAD_BALANCER_STRATEGY = os.environ.get('LOAD_BALANCER_STRATEGY', 'p2c').lower()
+# Outlier ejection: consecutive failures that eject an instance, and for how long
+OUTLIER_CONSECUTIVE_FAILURES = int(os.environ.get('OUTLIER_CONSECUTIVE_FAILURES', 5))
+OUTLIER_BASE_EJECTION_TIME = float(os.environ.get('OUTLIER_BASE_EJECTION_TIME', 30))
+OUTLIER_MAX_EJECTION_TIME = float(os.environ.get('OUTLIER_MAX_EJECTION_TIME', 300))
+OUTLIER_MAX_EJECTION_PERCENT = float(os.environ.get('OUTLIER_MAX_EJECTION_PERCENT', 50))
+
+# Hedged requests and retries of model-service calls
+# Hedging: a /predict call that has not answered after the HEDGE_QUANTILE of recent call latencies
+# (kept between HEDGE_MIN_DELAY_MS and HEDGE_MAX_DELAY_MS) is sent again and the first answer wins
+HEDGE_ENABLED = _env_flag('HEDGE_ENABLED')
+HEDGE_QUANTILE = float(os.environ.get('HEDGE_QUANTILE', 0.95))
+HEDGE_MIN_DELAY_MS = float(os.environ.get('HEDGE_MIN_DELAY_MS', 10))
+HEDGE_MAX_DELAY_MS = float(os.environ.get('HEDGE_MAX_DELAY_MS', 1000))
+# Attempts of idempotent calls (GETs and predictions) failing with a connection error, timeout or 5xx
+# (1 = no retries); retry n waits a random time up to RETRY_BACKOFF_BASE_MS * 2^(n-1), capped at RETRY_BACKOFF_MAX_MS
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 1))
+RETRY_BACKOFF_BASE_MS = float(os.environ.get('RETRY_BACKOFF_BASE_MS', 50))
+RETRY_BACKOFF_MAX_MS = float(os.environ.get('RETRY_BACKOFF_MAX_MS', 1000))
+# Budget shared by retries and hedges: extra attempts in flight are capped at RETRY_BUDGET_PERCENT
+# of the model-service calls in flight, but at least RETRY_BUDGET_MIN_CONCURRENCY are allowed
+RETRY_BUDGET_PERCENT = float(os.environ.get('RETRY_BUDGET_PERCENT', 20))
+RETRY_BUDGET_MIN_CONCURRENCY = int(os.environ.get('RETRY_BUDGET_MIN_CONCURRENCY', 3))
+
+# Circuit breaker around model-service calls
+CIRCUIT_BREAKER_ENABLED = _env_flag('CIRCUIT_BREAKER_ENABLED', default=True)
+# Consecutive failures (connection errors, timeouts, 5xx answers) that open the circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+# Seconds the circuit stays open before trial calls are let through
+CIRCUIT_RECOVERY_TIMEOUT = float(os.environ.get('CIRCUIT_RECOVERY_TIMEOUT', 30))
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.environ.get('CIRCUIT_HALF_OPEN_MAX_CALLS', 1))
+
+# Adaptive concurrency limit on model-service calls from /predict (per worker process)
+CONCURRENCY_LIMIT_ENABLED = _env_flag('CONCURRENCY_LIMIT_ENABLED', default=True)
+CONCURRENCY_INITIAL_LIMIT = int(os.environ.get('CONCURRENCY_INITIAL_LIMIT', 20))
+CONCURRENCY_MIN_LIMIT = int(os.environ.get('CONCURRENCY_MIN_LIMIT', 4))
+CONCURRENCY_MAX_LIMIT = int(os.environ.get('CONCURRENCY_MAX_LIMIT', 200))
+# A call slower than this multiple of the baseline (fastest recent) latency shrinks the limit
+CONCURRENCY_LATENCY_TOLERANCE = float(os.environ.get('CONCURRENCY_LATENCY_TOLERANCE', 2.0))
+CONCURRENCY_BACKOFF_RATIO = float(os.environ.get('CONCURRENCY_BACKOFF_RATIO', 0.9))
+# Experiment variants that may use the whole limit (comma separated; empty = all variants);
+# other variants are shed once CONCURRENCY_LOW_PRIORITY_SHARE of the limit is in use
+CONCURRENCY_PRIORITY_VARIANTS = frozenset(
+    v.strip() for v in os.environ.get('CONCURRENCY_PRIORITY_VARIANTS', 'control').split(',') if v.strip()
+)
+CONCURRENCY_LOW_PRIORITY_SHARE = float(os.environ.get('CONCURRENCY_LOW_PRIORITY_SHARE', 0.8))
+
+# Async (ASGI) serving mode settings
+ASYNC_MODEL_SERVICE_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MODEL_SERVICE_MAX_CONNECTIONS', 1000))
+# Threads serving the Flask routes that are not native to the async app
+ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 10))
+
+# Batch prediction settings
+# Path of the model-service batch endpoint, which accepts {"data": [texts]} and answers
+# {"predictions": [...]}. When empty, batches are sent as concurrent single /predict calls.
+MODEL_SERVICE_BATCH_PATH = os.environ.get('MODEL_SERVICE_BATCH_PATH', '')
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get('PREDICT_BATCH_MAX_SIZE', 256))
+# Maximum number of analytics events accepted by one /track/batch request
+TRACK_BATCH_MAX_EVENTS = int(os.environ.get('TRACK_BATCH_MAX_EVENTS', 500))
+# Micro-batching groups concurrent single /predict calls into one upstream batch call
+MICRO_BATCH_ENABLED = _env_flag('MICRO_BATCH_ENABLED')
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 32))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 5))
+# Micro-batches sent to the model service at the same time by one worker
+MICRO_BATCH_MAX_IN_FLIGHT = int(os.environ.get('MICRO_BATCH_MAX_IN_FLIGHT', 4))
+# Single-flight: concurrent /predict calls with the same data and experiment variant share one upstream call
+SINGLE_FLIGHT_ENABLED = _env_flag('SINGLE_FLIGHT_ENABLED', default=True)
+# Passthrough: /predict forwards the model-service answer bytes as-is instead of decoding and
+# re-encoding them; answers larger than PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES are streamed
+PREDICT_PASSTHROUGH = _env_flag('PREDICT_PASSTHROUGH', default=True)
+PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES = int(os.environ.get('PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES', 1048576))
+
+# Streaming (NDJSON) bulk scoring settings
+# Records are scored in chunks; at most STREAM_MAX_IN_FLIGHT chunks per stream are pending at once
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 32))
+STREAM_MAX_IN_FLIGHT = int(os.environ.get('STREAM_MAX_IN_FLIGHT', 4))
+# Threads shared by all streams for scoring chunks
+STREAM_WORKERS = int(os.environ.get('STREAM_WORKERS', 8))
+STREAM_MAX_LINE_BYTES = int(os.environ.get('STREAM_MAX_LINE_BYTES', 65536))
+
+# Prediction result cache settings
+# PREDICTION_CACHE_BACKEND: 'memory' (per worker), 'sqlite' (shared by all workers on the host) or 'none'
+PREDICTION_CACHE_BACKEND = os.environ.get('PREDICTION_CACHE_BACKEND', 'memory').lower()
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 300))
+PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH', '/tmp/app-service/prediction_cache.sqlite3')
+# Interval (seconds) at which the cached /version payload and the model-service version used
+# in prediction cache keys are refreshed in the background
+MODEL_VERSION_REFRESH_INTERVAL = float(os.environ.get('MODEL_VERSION_REFRESH_INTERVAL', 60))
+
+# Ratings storage settings
+RATINGS_DB_PATH = os.environ.get('RATINGS_DB_PATH', 'ratings.db')
+# Ratings stored by the previous ratings.json storage are imported once into an empty database
+RATINGS_LEGACY_FILE = os.environ.get('RATINGS_LEGACY_FILE', 'ratings.json')
+
+# Write-behind mode: /submit-rating returns once the rating is queued, a background thread
+# writes queued ratings in batches of up to RATINGS_WRITE_BATCH_SIZE, at most
+# RATINGS_WRITE_FLUSH_INTERVAL_MS after the first one arrived, with one fsynced commit per batch
+RATINGS_WRITE_BEHIND = _env_flag('RATINGS_WRITE_BEHIND')
+RATINGS_WRITE_BATCH_SIZE = int(os.environ.get('RATINGS_WRITE_BATCH_SIZE', 256))
+RATINGS_WRITE_FLUSH_INTERVAL_MS = float(os.environ.get('RATINGS_WRITE_FLUSH_INTERVAL_MS', 50))
+RATINGS_WRITE_QUEUE_SIZE = int(os.environ.get('RATINGS_WRITE_QUEUE_SIZE', 10000))
+RATINGS_WRITE_MAX_RETRIES = int(os.environ.get('RATINGS_WRITE_MAX_RETRIES', 3))
+
+# Ratings analytics API: default/maximum page size of GET /ratings and maximum buckets per histogram
+RATINGS_PAGE_SIZE = int(os.environ.get('RATINGS_PAGE_SIZE', 50))
+RATINGS_MAX_PAGE_SIZE = int(os.environ.get('RATINGS_MAX_PAGE_SIZE', 500))
+RATINGS_HISTOGRAM_MAX_BUCKETS = int(os.environ.get('RATINGS_HISTOGRAM_MAX_BUCKETS', 1000))
+
+# Review feeds: default/maximum page size of GET /reviews
+REVIEWS_PAGE_SIZE = int(os.environ.get('REVIEWS_PAGE_SIZE', 20))
+REVIEWS_MAX_PAGE_SIZE = int(os.environ.get('REVIEWS_MAX_PAGE_SIZE', 100))
+
+# HTTP response compression and conditional requests
+# Text responses of at least HTTP_COMPRESSION_MIN_SIZE bytes are compressed with brotli (when
+# installed) or gzip, as the client accepts; GET responses get an ETag and answer 304 when unchanged
+HTTP_COMPRESSION_ENABLED = _env_flag('HTTP_COMPRESSION_ENABLED', default=True)
+HTTP_COMPRESSION_MIN_SIZE = int(os.environ.get('HTTP_COMPRESSION_MIN_SIZE', 1024))
+HTTP_GZIP_LEVEL = int(os.environ.get('HTTP_GZIP_LEVEL', 6))
+HTTP_BROTLI_QUALITY = int(os.environ.get('HTTP_BROTLI_QUALITY', 5))
+HTTP_ETAGS_ENABLED = _env_flag('HTTP_ETAGS_ENABLED', default=True)
+
+# JSON encoding of request and response bodies
+# 'auto' uses orjson when it is installed and the standard library otherwise; 'orjson' or 'stdlib' pick one
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto').lower()
+# Compact JSON responses; set to false for indented output while debugging
+JSON_COMPACT = _env_flag('JSON_COMPACT', default=True)
+
+# Sliding-window sentiment statistics per experiment variant (GET /stats/sentiment and the
+# sentiment_window_* gauges): windows as '<number><s|m|h>', kept in buckets of
+# SENTIMENT_WINDOW_BUCKET_SECONDS; variants beyond SENTIMENT_WINDOW_MAX_VARIANTS are counted as 'other'
+SENTIMENT_WINDOWS = [w.strip() for w in os.environ.get('SENTIMENT_WINDOWS', '1m,5m,1h').split(',') if w.strip()]
+SENTIMENT_WINDOW_BUCKET_SECONDS = int(os.environ.get('SENTIMENT_WINDOW_BUCKET_SECONDS', 10))
+SENTIMENT_WINDOW_MAX_VARIANTS = int(os.environ.get('SENTIMENT_WINDOW_MAX_VARIANTS', 20))
+
 def get_app_version():
     """Get the application version from libversion."""
     if LIB_VERSION_AVAILABLE:
@@ -64,11 +251,11 @@ SWAGGER_CONFIG = {
     "specs_route": "/apidocs/"
 }
 
+# The "version" of the API info is filled in by app.py when the spec is first generated
 SWAGGER_TEMPLATE = {
     "info": {
         "title": "App Service API",
         "description": "API for the app service component",
-        "version": get_app_version(),
         "contact": {
             "name": "Team 21",
             "url": "https://github.com/remla25-team21"
@@ -0,0 +1,74 @@
+"""
+Production gunicorn configuration for the app service.
+
+Run with:  gunicorn -c gunicorn.conf.py
+
+All settings can be tuned through environment variables. Prometheus runs in
+multiprocess mode so counters, histograms and the positive-ratio gauge served
+at /metrics aggregate over every worker.
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+
+# Must be set before prometheus_client is imported by the app (preload_app imports it in the master)
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/app-service-prometheus')
+
+# Metric files left over from a previous run would be added to the new totals.
+# This runs when the config is loaded, before the app is preloaded in the master.
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import multiprocess  # noqa: E402
+
+# 'sync' serves the Flask app (app:app) with threaded workers,
+# 'async' serves asgi:app on uvicorn event-loop workers
+APP_SERVER_MODE = os.environ.get('APP_SERVER_MODE', 'sync').lower()
+
+if APP_SERVER_MODE == 'async':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'app:app'
+    worker_class = 'gthread'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+# Recycle workers after a number of requests to bound memory growth; jitter avoids simultaneous restarts
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Must exceed the model-service read timeout so workers are not killed mid-prediction
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # The preloaded app set its gauges in the master, which never serves a request: drop its
+    # live gauges and keep them out of /metrics should it set one again (metrics_exporter.py)
+    os.environ['PROMETHEUS_MASTER_PID'] = str(server.pid)
+    multiprocess.mark_process_dead(server.pid)
+
+
+def worker_exit(server, worker):
+    # Write the ratings still queued by the write-behind writer; atexit handlers do not run
+    # when gunicorn recycles a worker
+    service = sys.modules.get('app')
+    if service is not None and service.rating_writer is not None:
+        service.rating_writer.flush()
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of recycled or crashed workers
+    multiprocess.mark_process_dead(worker.pid)
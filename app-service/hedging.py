@@ -0,0 +1,348 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge
+from config import (
+    HEDGE_ENABLED,
+    HEDGE_QUANTILE,
+    HEDGE_MIN_DELAY_MS,
+    HEDGE_MAX_DELAY_MS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BACKOFF_BASE_MS,
+    RETRY_BACKOFF_MAX_MS,
+    RETRY_BUDGET_PERCENT,
+    RETRY_BUDGET_MIN_CONCURRENCY
+)
+
+# Prometheus metrics for hedged and retried model-service calls
+# Hedge rate: rate(...{outcome=~"primary_won|hedge_won"}) / rate(model_service_hedge_requests_total)
+# Hedge win rate: rate(...{outcome="hedge_won"}) / rate(...{outcome=~"primary_won|hedge_won"})
+HEDGE_REQUESTS = Counter(
+    'model_service_hedge_requests_total',
+    'Hedgeable model-service calls, by outcome',
+    # 'not_needed' (answered before the hedge delay), 'primary_won' / 'hedge_won' (a hedge was
+    # sent and that call answered first) or 'budget_exhausted' (no retry budget left for the hedge)
+    ['outcome']
+)
+for _outcome in ('not_needed', 'primary_won', 'hedge_won', 'budget_exhausted'):
+    HEDGE_REQUESTS.labels(outcome=_outcome).inc(0)
+
+HEDGE_DELAY = Gauge(
+    'model_service_hedge_delay_seconds',
+    'Time after which an unanswered model-service call is hedged',
+    multiprocess_mode='livemax'
+)
+
+RETRIES = Counter(
+    'model_service_retries_total',
+    'Retries of failed idempotent model-service calls, by outcome',
+    ['outcome']  # 'sent' or 'budget_exhausted' (the call failed without being retried)
+)
+RETRIES.labels(outcome='sent').inc(0)
+RETRIES.labels(outcome='budget_exhausted').inc(0)
+
+
+class RetryBudget:
+    """
+    Caps the extra attempts (retries and hedges) in flight at a share of the calls in flight.
+
+    At most percent % of the model-service calls in flight, and at least
+    min_concurrency, may be extra attempts. The budget follows the load: when the
+    model service slows down or fails, retries and hedges cannot multiply the
+    traffic it gets.
+    """
+
+    def __init__(self, percent=RETRY_BUDGET_PERCENT, min_concurrency=RETRY_BUDGET_MIN_CONCURRENCY):
+        self.percent = percent
+        self.min_concurrency = min_concurrency
+        self._init_state()
+        # Counts and locks of the parent process mean nothing in a forked worker
+        os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._extra = 0
+
+    @contextmanager
+    def call(self):
+        """Count a call as in flight for its whole duration, retries and hedges included."""
+        with self._lock:
+            self._calls += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._calls -= 1
+
+    def try_acquire(self):
+        """Take room for one extra attempt; release() it once the attempt is over."""
+        with self._lock:
+            if self._extra >= max(self.min_concurrency, self._calls * self.percent / 100):
+                return False
+            self._extra += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._extra -= 1
+
+
+class HedgeDelay:
+    """
+    The quantile of the latencies of recent calls, after which a call is hedged.
+
+    Keeps the last `samples` latencies and recomputes the quantile every
+    `refresh_every` calls, clamped to [min_delay, max_delay]. Until min_samples
+    calls were seen the delay is max_delay.
+    """
+
+    def __init__(self, quantile=HEDGE_QUANTILE, min_delay=HEDGE_MIN_DELAY_MS / 1000,
+                 max_delay=HEDGE_MAX_DELAY_MS / 1000, samples=1000, min_samples=50, refresh_every=32):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.samples = samples
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._init_state()
+        os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=self.samples)
+        self._observed = 0
+        self.value = self.max_delay
+        HEDGE_DELAY.set(self.value)
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._observed += 1
+            if len(self._latencies) < self.min_samples or self._observed % self.refresh_every:
+                return
+            latencies = sorted(self._latencies)
+        value = latencies[min(len(latencies) - 1, int(self.quantile * len(latencies)))]
+        self.value = min(max(value, self.min_delay), self.max_delay)
+        HEDGE_DELAY.set(self.value)
+
+
+class Hedger:
+    """
+    Hedged requests: a call that has not answered after the hedge delay is sent a
+    second time and the first successful answer wins.
+
+    Both attempts run on the given executor (or as tasks on the event loop for
+    acall()), which needs two threads per concurrent call. succeeded(result) tells answers that may win from failed ones (5xx),
+    discard(result) releases the answer of the losing attempt. Sync attempts cannot
+    be interrupted, so the losing one is discarded once it completes; async ones are
+    cancelled. Hedges take room in the retry budget and are not sent without it.
+    """
+
+    def __init__(self, enabled=HEDGE_ENABLED, delay=None, budget=None):
+        self.enabled = enabled
+        self.delay = delay if delay is not None else HedgeDelay()
+        self.budget = budget if budget is not None else retry_budget
+
+    def _timed(self, attempt, succeeded, started=None):
+        if started is not None:
+            started.set()
+        start_time = time.perf_counter()
+        result = attempt()
+        if succeeded(result):
+            self.delay.observe(time.perf_counter() - start_time)
+        return result
+
+    async def _atimed(self, attempt, succeeded):
+        start_time = time.perf_counter()
+        result = await attempt()
+        if succeeded(result):
+            self.delay.observe(time.perf_counter() - start_time)
+        return result
+
+    def call(self, attempt, executor, succeeded, discard):
+        started = threading.Event()
+        primary = executor.submit(self._timed, attempt, succeeded, started)
+        # The delay counts from when the primary is sent: time spent waiting for a free
+        # executor thread is local queueing, which a hedge would only make worse
+        started.wait()
+        done, _ = wait((primary,), timeout=self.delay.value)
+        if done:
+            HEDGE_REQUESTS.labels(outcome='not_needed').inc()
+            return primary.result()
+        if not self.budget.try_acquire():
+            HEDGE_REQUESTS.labels(outcome='budget_exhausted').inc()
+            return primary.result()
+
+        hedge = executor.submit(self._timed, attempt, succeeded)
+        hedge.add_done_callback(lambda _: self.budget.release())
+        winner = last = None
+        pending = {primary, hedge}
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, hedge):
+                if future in done:
+                    last = future
+                    if winner is None and _won(future, succeeded):
+                        winner = future
+
+        # When both attempts failed the last failure is reported, like for an unhedged call
+        chosen = winner if winner is not None else last
+        for future in (primary, hedge):
+            if future is not chosen:
+                future.add_done_callback(lambda f: _discard(f, discard))
+        if winner is not None:
+            HEDGE_REQUESTS.labels(outcome='hedge_won' if winner is hedge else 'primary_won').inc()
+        return chosen.result()
+
+    async def acall(self, attempt, succeeded, discard):
+        primary = asyncio.ensure_future(self._atimed(attempt, succeeded))
+        try:
+            done, _ = await asyncio.wait((primary,), timeout=self.delay.value)
+        except BaseException:
+            primary.cancel()
+            raise
+        if done:
+            HEDGE_REQUESTS.labels(outcome='not_needed').inc()
+            return primary.result()
+        if not self.budget.try_acquire():
+            HEDGE_REQUESTS.labels(outcome='budget_exhausted').inc()
+            return await primary
+
+        hedge = asyncio.ensure_future(self._atimed(attempt, succeeded))
+        winner = last = None
+        try:
+            pending = {primary, hedge}
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary, hedge):
+                    if task in done:
+                        last = task
+                        if winner is None and _won(task, succeeded):
+                            winner = task
+        except BaseException:
+            primary.cancel()
+            hedge.cancel()
+            raise
+        finally:
+            self.budget.release()
+
+        # When both attempts failed the last failure is reported, like for an unhedged call
+        chosen = winner if winner is not None else last
+        for task in (primary, hedge):
+            if task is chosen:
+                continue
+            if task.done():
+                await _adiscard(task, discard)
+            else:
+                task.cancel()
+        if winner is not None:
+            HEDGE_REQUESTS.labels(outcome='hedge_won' if winner is hedge else 'primary_won').inc()
+        return chosen.result()
+
+
+def _won(future, succeeded):
+    return not future.cancelled() and future.exception() is None and succeeded(future.result())
+
+
+def _discard(future, discard):
+    if not future.cancelled() and future.exception() is None:
+        discard(future.result())
+
+
+async def _adiscard(task, discard):
+    if not task.cancelled() and task.exception() is None:
+        await discard(task.result())
+
+
+class Retrier:
+    """
+    Retries of failed idempotent calls with jittered exponential backoff.
+
+    An attempt fails when it raises an exception accepted by retryable(exc) or its
+    answer does not pass succeeded(result). Retry n (from 1) waits a random time
+    between 0 and min(max_backoff, base_backoff * 2^(n-1)) ("full jitter", so that
+    callers failing together do not retry together) and needs room in the retry
+    budget; without it the failure is returned as is.
+    """
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_backoff=RETRY_BACKOFF_BASE_MS / 1000,
+                 max_backoff=RETRY_BACKOFF_MAX_MS / 1000, budget=None):
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.budget = budget if budget is not None else retry_budget
+
+    @property
+    def enabled(self):
+        return self.max_attempts > 1
+
+    def backoff(self, retry):
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (retry - 1)))
+
+    def _may_retry(self, retries):
+        if retries + 1 >= self.max_attempts:
+            return False
+        if not self.budget.try_acquire():
+            RETRIES.labels(outcome='budget_exhausted').inc()
+            return False
+        RETRIES.labels(outcome='sent').inc()
+        return True
+
+    def call(self, attempt, retryable, succeeded, discard):
+        retries = 0
+        while True:
+            try:
+                result, error = attempt(), None
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                result, error = None, e
+            finally:
+                if retries:
+                    self.budget.release()
+            if error is None and succeeded(result):
+                return result
+            if not self._may_retry(retries):
+                if error is not None:
+                    raise error
+                return result
+            if error is None:
+                discard(result)
+            retries += 1
+            time.sleep(self.backoff(retries))
+
+    async def acall(self, attempt, retryable, succeeded, discard):
+        retries = 0
+        while True:
+            try:
+                result, error = await attempt(), None
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                result, error = None, e
+            finally:
+                if retries:
+                    self.budget.release()
+            if error is None and succeeded(result):
+                return result
+            if not self._may_retry(retries):
+                if error is not None:
+                    raise error
+                return result
+            if error is None:
+                await discard(result)
+            retries += 1
+            await asyncio.sleep(self.backoff(retries))
+
+
+# Shared by the sync and async model-service clients
+retry_budget = RetryBudget()
+hedger = Hedger()
+retrier = Retrier()
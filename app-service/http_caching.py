@@ -0,0 +1,223 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import request
+from starlette.responses import Response as StarletteResponse
+from prometheus_client import Counter
+from werkzeug.http import generate_etag, parse_accept_header, parse_etags, quote_etag, unquote_etag
+from config import (
+    HTTP_COMPRESSION_ENABLED,
+    HTTP_COMPRESSION_MIN_SIZE,
+    HTTP_GZIP_LEVEL,
+    HTTP_BROTLI_QUALITY,
+    HTTP_ETAGS_ENABLED
+)
+
+# Brotli is optional, responses are gzip-compressed without it
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Prometheus metrics for response compression and conditional requests
+RESPONSES_COMPRESSED = Counter(
+    'http_responses_compressed_total',
+    'Responses sent compressed, by content encoding',
+    ['encoding']
+)
+RESPONSES_COMPRESSED.labels(encoding='gzip').inc(0)
+RESPONSES_COMPRESSED.labels(encoding='br').inc(0)
+
+RESPONSES_NOT_MODIFIED = Counter(
+    'http_responses_not_modified_total',
+    'Conditional requests answered with 304 Not Modified'
+)
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/javascript', 'text/javascript', 'text/css',
+    'text/html', 'text/plain', 'image/svg+xml'
+})
+
+ENCODINGS = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=HTTP_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=HTTP_GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodyCache:
+    """Small LRU of compressed bodies keyed by (ETag, encoding), so unchanged responses are compressed once."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+def matching_etag(etag):
+    """
+    The ETag the client revalidates (If-None-Match), if it is `etag` or a compressed variant of it.
+
+    Lets routes with their own ETags answer 304 before building the response body.
+    """
+    for candidate in (etag, *(f"{etag}-{encoding}" for encoding in ENCODINGS)):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def _replace_body(response, body):
+    # A file being passed through is closed with the response rather than left to the GC
+    close = getattr(response.response, 'close', None)
+    if response.direct_passthrough and close is not None:
+        response.call_on_close(close)
+    response.direct_passthrough = False
+    response.set_data(body)
+
+
+def finalize_response(response):
+    """
+    after_request hook adding strong ETags, 304 handling and content-negotiated compression.
+
+    GET and HEAD answers get an ETag (a hash of the body, unless the route set
+    its own) and Cache-Control: no-cache, so clients revalidate them and get a
+    304 without a body when nothing changed. Bodies of at least
+    HTTP_COMPRESSION_MIN_SIZE bytes in a text format are compressed with brotli
+    or gzip, whichever the client prefers; a compressed representation has its
+    own ETag ("<etag>-<encoding>"). Streamed responses are left alone, except
+    files (Swagger UI assets), which are read to be compressed.
+    """
+    if response.status_code == 304:
+        RESPONSES_NOT_MODIFIED.inc()
+        return response
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.is_streamed and not response.direct_passthrough:
+        return response
+
+    cacheable = request.method in ('GET', 'HEAD')
+    compressible = HTTP_COMPRESSION_ENABLED and response.mimetype in COMPRESSIBLE_MIMETYPES
+    if not cacheable and not compressible:
+        return response
+
+    etag, _ = response.get_etag()
+    if cacheable and HTTP_ETAGS_ENABLED and etag is None and not response.direct_passthrough:
+        etag = generate_etag(response.get_data())
+        response.set_etag(etag)
+    if cacheable and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = 'no-cache'
+
+    length = response.content_length
+    if length is None and not response.direct_passthrough:
+        length = len(response.get_data())
+    encoding = None
+    if compressible and length is not None and length >= HTTP_COMPRESSION_MIN_SIZE:
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+
+    if encoding is None:
+        if cacheable and etag is not None and not response.direct_passthrough:
+            response.make_conditional(request)
+            if response.status_code == 304:
+                RESPONSES_NOT_MODIFIED.inc()
+        return response
+
+    if etag is not None:
+        etag = f"{etag}-{encoding}"
+        if cacheable and request.if_none_match.contains(etag):
+            # Answer before reading or compressing the body
+            _replace_body(response, b"")
+            response.status_code = 304
+            del response.headers['Content-Length']
+            response.set_etag(etag)
+            RESPONSES_NOT_MODIFIED.inc()
+            return response
+
+    body = compressed_bodies.get((etag, encoding)) if etag is not None else None
+    if body is None:
+        response.direct_passthrough = False
+        body = compress(response.get_data(), encoding)
+        if etag is not None:
+            compressed_bodies.set((etag, encoding), body)
+    _replace_body(response, body)
+    response.headers['Content-Encoding'] = encoding
+    if etag is not None:
+        response.set_etag(etag)
+    RESPONSES_COMPRESSED.labels(encoding=encoding).inc()
+    return response
+
+
+def finalize_asgi_response(request, response):
+    """
+    finalize_response() for the routes asgi.py serves natively on Starlette.
+
+    Gives their answers the same ETags, Cache-Control, 304 handling and
+    compression as the Flask routes, with the same settings and metrics.
+    Streamed responses (which have no body) are left alone.
+    """
+    if response.status_code != 200 or 'content-encoding' in response.headers or not hasattr(response, 'body'):
+        return response
+
+    cacheable = request.method in ('GET', 'HEAD')
+    mimetype = response.headers.get('content-type', '').split(';')[0].strip()
+    compressible = HTTP_COMPRESSION_ENABLED and mimetype in COMPRESSIBLE_MIMETYPES
+    if not cacheable and not compressible:
+        return response
+
+    etag = None
+    if cacheable:
+        if 'etag' in response.headers:
+            etag, _ = unquote_etag(response.headers['etag'])
+        elif HTTP_ETAGS_ENABLED:
+            etag = generate_etag(response.body)
+        response.headers.setdefault('cache-control', 'no-cache')
+
+    encoding = None
+    if compressible and len(response.body) >= HTTP_COMPRESSION_MIN_SIZE:
+        response.headers.add_vary_header('Accept-Encoding')
+        encoding = parse_accept_header(request.headers.get('accept-encoding')).best_match(ENCODINGS)
+
+    if etag is not None:
+        if encoding is not None:
+            etag = f"{etag}-{encoding}"
+        response.headers['etag'] = quote_etag(etag)
+        if parse_etags(request.headers.get('if-none-match')).contains(etag):
+            # Answer before compressing the body
+            RESPONSES_NOT_MODIFIED.inc()
+            return StarletteResponse(status_code=304, headers={
+                name: response.headers[name] for name in ('etag', 'cache-control', 'vary') if name in response.headers
+            })
+    if encoding is None:
+        return response
+
+    body = compressed_bodies.get((etag, encoding)) if etag is not None else None
+    if body is None:
+        body = compress(response.body, encoding)
+        if etag is not None:
+            compressed_bodies.set((etag, encoding), body)
+    response.body = body
+    response.headers['content-encoding'] = encoding
+    response.headers['content-length'] = str(len(body))
+    RESPONSES_COMPRESSED.labels(encoding=encoding).inc()
+    return response
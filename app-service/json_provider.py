@@ -0,0 +1,92 @@
+import json
+
+from flasgger import LazyJSONEncoder
+from loguru import logger
+from config import JSON_PROVIDER, JSON_COMPACT
+
+# orjson is optional, the standard library json module is used without it
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if JSON_PROVIDER not in ('auto', 'orjson', 'stdlib'):
+    raise ValueError(f"Unknown JSON provider: {JSON_PROVIDER}")
+
+USE_ORJSON = ORJSON_AVAILABLE and JSON_PROVIDER != 'stdlib'
+
+_SEPARATORS = (',', ':') if JSON_COMPACT else None
+
+
+def json_dumps(obj):
+    """Serialize obj to a JSON string (compact unless JSON_COMPACT is disabled), with orjson when enabled."""
+    if USE_ORJSON:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits, which the json module supports
+    return json.dumps(obj, separators=_SEPARATORS)
+
+
+def json_loads(data):
+    """Parse a JSON str or bytes document, with orjson when enabled; raises ValueError when invalid."""
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class OrjsonProvider(LazyJSONEncoder):
+    """
+    Flask JSON provider encoding and decoding with orjson.
+
+    Behaves like flasgger's LazyJSONEncoder (Flask's default provider that also
+    serializes the lazy strings of the Swagger spec) which it extends: keys are
+    sorted, dates are formatted by Flask, other types go through default(), and
+    output is compact unless `compact` is False or the app runs in debug mode.
+    Values orjson cannot encode (integers beyond 64 bits) and calls with json
+    module arguments fall back to the standard library. Non-ASCII characters
+    are written as UTF-8 instead of being escaped.
+    """
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default,
+                                option=self._options(bool(kwargs.get('indent')))).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            # Encoded straight to bytes, without the str round trip of the default provider
+            body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def create_json_provider(app):
+    """The JSON provider of the app: orjson-backed when enabled, otherwise flasgger's LazyJSONEncoder."""
+    if JSON_PROVIDER == 'orjson' and not ORJSON_AVAILABLE:
+        logger.warning("JSON_PROVIDER is 'orjson' but orjson is not installed; using the json module")
+    provider = OrjsonProvider(app) if USE_ORJSON else LazyJSONEncoder(app)
+    # None keeps Flask's behaviour of indenting in debug mode only
+    provider.compact = None if JSON_COMPACT else False
+    return provider
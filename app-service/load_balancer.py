@@ -0,0 +1,224 @@
+import os
+import random
+import threading
+import time
+
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+from config import (
+    MODEL_SERVICE_URLS,
+    MODEL_SERVICE_VARIANT_URLS,
+    LOAD_BALANCER_STRATEGY,
+    OUTLIER_CONSECUTIVE_FAILURES,
+    OUTLIER_BASE_EJECTION_TIME,
+    OUTLIER_MAX_EJECTION_TIME,
+    OUTLIER_MAX_EJECTION_PERCENT,
+    get_model_service_url
+)
+
+# Prometheus metrics per model-service instance
+BACKEND_REQUESTS = Counter(
+    'model_service_backend_requests_total',
+    'Requests sent to each model-service instance, by outcome',
+    ['backend', 'outcome']  # outcome: 'success' or 'error' (connection error, timeout or 5xx)
+)
+
+BACKEND_LATENCY = Histogram(
+    'model_service_backend_latency_seconds',
+    'Latency of requests to each model-service instance',
+    ['backend'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+
+BACKEND_OUTSTANDING = Gauge(
+    'model_service_backend_outstanding_requests',
+    'Requests currently in flight to each model-service instance',
+    ['backend'],
+    multiprocess_mode='livesum'
+)
+
+BACKEND_EJECTED = Gauge(
+    'model_service_backend_ejected',
+    '1 while a model-service instance is ejected from load balancing as an outlier',
+    ['backend'],
+    multiprocess_mode='livemax'
+)
+
+BACKEND_EJECTIONS = Counter(
+    'model_service_backend_ejections_total',
+    'Number of times each model-service instance was ejected as an outlier',
+    ['backend']
+)
+
+
+def parse_urls(spec):
+    """Parse 'http://a:8080,http://b:8080' (or '|'-separated) into a list of base URLs."""
+    return [url.strip().rstrip('/') for url in spec.replace('|', ',').split(',') if url.strip()]
+
+
+def parse_variant_urls(spec):
+    """Parse 'variant_b=http://a:8080|http://b:8080,variant_c=http://c:8080' into {variant: [urls]}."""
+    routes = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        variant, _, urls = part.partition('=')
+        routes.setdefault(variant.strip(), []).extend(parse_urls(urls))
+    return routes
+
+
+class Backend:
+    """One model-service instance and its passive health state."""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+
+class BackendPool:
+    """
+    Load balancer over a set of model-service instances.
+
+    'least_outstanding' sends each call to the instance with the fewest calls in
+    flight; 'p2c' (power of two choices) compares two random instances instead,
+    which spreads load almost as well without every worker piling onto the same
+    instance. Health is checked passively: OUTLIER_CONSECUTIVE_FAILURES failed
+    calls in a row (connection errors, timeouts, 5xx) eject an instance for
+    OUTLIER_BASE_EJECTION_TIME seconds times the number of times it has been
+    ejected (capped at OUTLIER_MAX_EJECTION_TIME). At most
+    OUTLIER_MAX_EJECTION_PERCENT of the pool is ejected at once, so a single
+    instance is never ejected; failures of the whole pool are left to the
+    circuit breaker.
+    """
+
+    def __init__(self, name, urls, strategy=LOAD_BALANCER_STRATEGY,
+                 failure_threshold=OUTLIER_CONSECUTIVE_FAILURES,
+                 base_ejection_time=OUTLIER_BASE_EJECTION_TIME,
+                 max_ejection_time=OUTLIER_MAX_EJECTION_TIME,
+                 max_ejection_percent=OUTLIER_MAX_EJECTION_PERCENT):
+        if strategy not in ('least_outstanding', 'p2c'):
+            raise ValueError(f"Unknown load balancer strategy: {strategy}")
+        self.name = name
+        self.urls = list(urls)
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.base_ejection_time = base_ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.max_ejected = int(len(self.urls) * max_ejection_percent / 100)
+
+        self._init_state()
+        # In-flight counts and locks of the parent process mean nothing in a forked worker
+        os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self.backends = [Backend(url) for url in self.urls]
+        for backend in self.backends:
+            BACKEND_EJECTED.labels(backend=backend.url).set(0)
+
+    def acquire(self):
+        """Pick the instance for the next call and count the call as outstanding on it."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [backend for backend in self.backends if backend.available(now)] or self.backends
+            if len(candidates) == 1:
+                backend = candidates[0]
+            elif self.strategy == 'p2c':
+                first, second = random.sample(candidates, 2)
+                backend = first if first.outstanding <= second.outstanding else second
+            else:
+                fewest = min(backend.outstanding for backend in candidates)
+                backend = random.choice([b for b in candidates if b.outstanding == fewest])
+            backend.outstanding += 1
+        BACKEND_OUTSTANDING.labels(backend=backend.url).inc()
+        return backend
+
+    def release(self, backend, latency, failed):
+        """
+        Record the outcome of a call to backend and eject it if it keeps failing.
+
+        failed=None (e.g. the caller was cancelled) only frees the call's slot.
+        """
+        now = time.monotonic()
+        ejected_for = None
+        with self._lock:
+            backend.outstanding -= 1
+            if failed:
+                backend.consecutive_failures += 1
+                ejected = sum(1 for b in self.backends if not b.available(now))
+                if (backend.consecutive_failures >= self.failure_threshold and backend.available(now)
+                        and ejected < self.max_ejected):
+                    backend.ejections += 1
+                    ejected_for = min(self.base_ejection_time * backend.ejections, self.max_ejection_time)
+                    backend.ejected_until = now + ejected_for
+                    backend.consecutive_failures = 0
+            elif failed is not None:
+                backend.consecutive_failures = 0
+
+        BACKEND_OUTSTANDING.labels(backend=backend.url).dec()
+        if failed is None:
+            return
+        BACKEND_REQUESTS.labels(backend=backend.url, outcome='error' if failed else 'success').inc()
+        BACKEND_LATENCY.labels(backend=backend.url).observe(latency)
+        if ejected_for is not None:
+            logger.warning("Ejecting model-service instance {} for {}s after repeated failures",
+                           backend.url, ejected_for)
+            BACKEND_EJECTIONS.labels(backend=backend.url).inc()
+            BACKEND_EJECTED.labels(backend=backend.url).set(1)
+        elif not failed:
+            BACKEND_EJECTED.labels(backend=backend.url).set(0)
+
+    def status(self):
+        """Per-instance state for the health endpoint."""
+        now = time.monotonic()
+        return [
+            {
+                "url": backend.url,
+                "outstanding": backend.outstanding,
+                "ejected": not backend.available(now),
+            }
+            for backend in self.backends
+        ]
+
+
+class ModelServiceRouter:
+    """
+    Maps a request to the pool of model-service instances that serves it.
+
+    Experiment variants listed in MODEL_SERVICE_VARIANT_URLS get their own pool
+    (e.g. a newer model version); every other request uses the default pool
+    from MODEL_SERVICE_URLS, or the single MODEL_SERVICE_URL.
+    """
+
+    def __init__(self, default_urls, variant_urls=None):
+        self.default_pool = BackendPool('default', default_urls)
+        self.variant_pools = {
+            variant: BackendPool(variant, urls) for variant, urls in (variant_urls or {}).items() if urls
+        }
+
+    def routes_variant(self, experiment_variant):
+        """True if the variant is served by its own pool rather than the default one."""
+        return experiment_variant in self.variant_pools
+
+    def pool(self, experiment_variant=None):
+        return self.variant_pools.get(experiment_variant, self.default_pool)
+
+    def status(self):
+        pools = {"default": self.default_pool.status()}
+        for variant, pool in self.variant_pools.items():
+            pools[variant] = pool.status()
+        return pools
+
+
+def create_model_router():
+    """Build the router from MODEL_SERVICE_URLS / MODEL_SERVICE_VARIANT_URLS (falling back to MODEL_SERVICE_URL)."""
+    default_urls = parse_urls(MODEL_SERVICE_URLS) or [get_model_service_url().rstrip('/')]
+    return ModelServiceRouter(default_urls, parse_variant_urls(MODEL_SERVICE_VARIANT_URLS))
+
+
+# Shared router used by the sync and async model-service clients
+model_router = create_model_router()
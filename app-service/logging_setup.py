@@ -0,0 +1,214 @@
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import traceback
+
+from flask import g, has_request_context, request
+from loguru import logger
+from prometheus_client import Counter, Gauge
+from config import (
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_COLORIZE,
+    LOG_DIAGNOSE,
+    LOG_ASYNC,
+    LOG_QUEUE_SIZE,
+    LOG_OVERFLOW_POLICY,
+    LOG_SAMPLE_RATES
+)
+
+# Prometheus metrics for the logging pipeline
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Number of log records dropped because the log queue was full'
+)
+
+LOG_RECORDS_SAMPLED_OUT = Counter(
+    'log_records_sampled_out_total',
+    'Number of INFO log records skipped by per-route sampling'
+)
+
+LOG_QUEUE_DEPTH = Gauge(
+    'log_queue_depth',
+    'Number of log records waiting to be written',
+    multiprocess_mode='livesum'
+)
+
+LEVEL_COLORS = {
+    "DEBUG": "\033[34m",
+    "INFO": "\033[1m",
+    "SUCCESS": "\033[32m",
+    "WARNING": "\033[33m",
+    "ERROR": "\033[31m",
+    "CRITICAL": "\033[41m",
+}
+RESET = "\033[0m"
+
+
+def parse_sample_rates(spec):
+    """Parse 'predict=0.1,health_check=0.01' into {'predict': 0.1, 'health_check': 0.01}."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        route, _, rate = part.partition('=')
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+def format_record(record, log_format=LOG_FORMAT, colorize=LOG_COLORIZE):
+    """Render a loguru record as one output line (plain text or JSON)."""
+    exception = record["exception"]
+    exception_text = ""
+    if exception is not None and exception.type is not None:
+        exception_text = "".join(traceback.format_exception(exception.type, exception.value, exception.traceback))
+
+    if log_format == 'json':
+        entry = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "function": record["function"],
+            "module": record["module"],
+            "message": record["message"],
+        }
+        if record["extra"]:
+            entry["extra"] = record["extra"]
+        if exception_text:
+            entry["exception"] = exception_text
+        return json.dumps(entry, default=str) + "\n"
+
+    level = record["level"].name
+    timestamp = record["time"].strftime("%Y-%m-%d %H:%M:%S")
+    if colorize:
+        line = (f"\033[32m{timestamp}{RESET} | {LEVEL_COLORS.get(level, '')}{level: <8}{RESET} | "
+                f"\033[36m{record['function']}{RESET}: {record['message']}\n")
+    else:
+        line = f"{timestamp} | {level: <8} | {record['function']}: {record['message']}\n"
+    return line + exception_text
+
+
+class QueuedSink:
+    """
+    Loguru sink that hands records to a background writer thread.
+
+    The request thread only enqueues the record; formatting and the stdout write
+    happen off-thread. The queue is bounded: when it is full, 'drop_new' discards
+    the incoming record, 'drop_oldest' discards the oldest queued one and 'block'
+    waits for space. Dropped records are counted in log_records_dropped_total.
+    """
+
+    def __init__(self, stream=sys.stdout, max_size=LOG_QUEUE_SIZE, overflow_policy=LOG_OVERFLOW_POLICY):
+        self.stream = stream
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self._start()
+        # The writer thread does not survive fork, restart it in every gunicorn worker
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.flush)
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        record = message.record
+        if self.overflow_policy == 'block':
+            self._queue.put(record)
+        else:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                if self.overflow_policy == 'drop_oldest':
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        self._queue.put_nowait(record)
+                    except (queue.Empty, queue.Full):
+                        pass
+                LOG_RECORDS_DROPPED.inc()
+        LOG_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            # Write everything that is already queued in one go
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.stream.write("".join(format_record(record) for record in records))
+                self.stream.flush()
+            except Exception:
+                pass  # Logging must never take the service down
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+                LOG_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def flush(self):
+        """Wait until every queued record has been written (used at shutdown)."""
+        if self._thread.is_alive():
+            self._queue.join()
+
+
+class RouteSampler:
+    """
+    Loguru filter that keeps only a fraction of INFO (and lower) records per route.
+
+    The keep/skip decision is made once per request so a sampled request keeps all
+    of its log lines. WARNING and above are always kept.
+    """
+
+    def __init__(self, sample_rates):
+        self.sample_rates = sample_rates
+        self.always_keep_level = logger.level("WARNING").no
+
+    def __call__(self, record):
+        if not self.sample_rates or record["level"].no >= self.always_keep_level:
+            return True
+
+        if has_request_context():
+            route = request.endpoint or record["function"]
+            keep = g.get('_log_sampled')
+            if keep is None:
+                keep = random.random() < self.sample_rates.get(route, 1.0)
+                g._log_sampled = keep
+        else:
+            keep = random.random() < self.sample_rates.get(record["function"], 1.0)
+
+        if not keep:
+            LOG_RECORDS_SAMPLED_OUT.inc()
+        return keep
+
+
+def configure_logging():
+    """Replace loguru's default handler with the configured stdout pipeline (what Docker captures)."""
+    logger.remove()  # Remove default handler
+    sampler = RouteSampler(parse_sample_rates(LOG_SAMPLE_RATES))
+
+    if LOG_ASYNC:
+        logger.add(
+            QueuedSink(),
+            format="{message}",
+            level=LOG_LEVEL,
+            filter=sampler,
+            backtrace=False,
+            diagnose=LOG_DIAGNOSE,
+            catch=True,
+        )
+    else:
+        logger.add(
+            sys.stdout,
+            colorize=LOG_COLORIZE and LOG_FORMAT != 'json',
+            serialize=LOG_FORMAT == 'json',
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{function}</cyan>: {message}",
+            level=LOG_LEVEL,
+            filter=sampler,
+            backtrace=True,
+            diagnose=LOG_DIAGNOSE,
+        )
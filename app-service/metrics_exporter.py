@@ -0,0 +1,168 @@
+import glob
+import os
+
+from prometheus_client import CollectorRegistry, REGISTRY, make_wsgi_app, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+
+def multiprocess_enabled():
+    """Prometheus multiprocess mode is active when PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py)."""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+class WorkerMetricsCollector(multiprocess.MultiProcessCollector):
+    """
+    MultiProcessCollector leaving out the live gauges of the gunicorn master.
+
+    With preload_app the master imports the app, so gauges set at import time
+    (or by its startup probe) are written to files of its pid. The master never
+    serves a request but stays alive, so livesum and livemax gauges would count
+    it as a worker. gunicorn.conf.py puts its pid in PROMETHEUS_MASTER_PID.
+    """
+
+    def collect(self):
+        files = glob.glob(os.path.join(self._path, '*.db'))
+        master_pid = os.environ.get('PROMETHEUS_MASTER_PID')
+        if master_pid:
+            files = [
+                path for path in files
+                if not (os.path.basename(path).startswith('gauge_live') and path.endswith(f'_{master_pid}.db'))
+            ]
+        return self.merge(files, accumulate=True)
+
+
+class SentimentRatioCollector:
+    """
+    Exports sentiment_positive_ratio derived from the sentiment_predictions_total counter.
+
+    The ratio is computed at scrape time from whatever the source collector reports,
+    so with a MultiProcessCollector as source it reflects all gunicorn workers
+    instead of one worker's local state.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        positive = total = 0.0
+        for metric in self.source.collect():
+            if metric.name != 'sentiment_predictions':
+                continue
+            for sample in metric.samples:
+                if sample.name != 'sentiment_predictions_total':
+                    continue
+                total += sample.value
+                if sample.labels.get('sentiment') == 'positive':
+                    positive += sample.value
+
+        yield GaugeMetricFamily(
+            'sentiment_positive_ratio',
+            'Ratio of positive to total sentiments (0-1)',
+            value=positive / total if total else 0
+        )
+
+
+def read_window_stats(source):
+    """
+    Sliding-window totals from the sentiment_window_* gauges reported by source, with
+    the positive ratio and average latency of each window derived from them:
+    {variant: {window: {"predictions", "positive", "negative", "unknown", "positive_ratio",
+    "requests", "avg_latency_seconds"}}}.
+    """
+    windows = {}
+
+    def window(labels):
+        return windows.setdefault(labels['experiment_variant'], {}).setdefault(labels['window'], {
+            "predictions": 0, "positive": 0, "negative": 0, "unknown": 0, "requests": 0, "request_seconds": 0.0
+        })
+
+    for metric in source.collect():
+        for sample in metric.samples:
+            if sample.name == 'sentiment_window_predictions':
+                totals = window(sample.labels)
+                totals["predictions"] += sample.value
+                totals[sample.labels['sentiment']] += sample.value
+            elif sample.name == 'sentiment_window_requests':
+                window(sample.labels)["requests"] += sample.value
+            elif sample.name == 'sentiment_window_request_seconds':
+                window(sample.labels)["request_seconds"] += sample.value
+
+    for variant_windows in windows.values():
+        for totals in variant_windows.values():
+            for key in ("predictions", "positive", "negative", "unknown", "requests"):
+                totals[key] = int(totals[key])
+            totals["positive_ratio"] = totals["positive"] / totals["predictions"] if totals["predictions"] else 0
+            request_seconds = totals.pop("request_seconds")
+            totals["avg_latency_seconds"] = request_seconds / totals["requests"] if totals["requests"] else 0
+    return windows
+
+
+class WindowStatsCollector:
+    """
+    Exports sentiment_window_positive_ratio and sentiment_window_latency_avg_seconds
+    derived from the sentiment_window_* gauges, per experiment variant and window.
+
+    Like SentimentRatioCollector, they are computed at scrape time from the totals
+    of every worker rather than averaged over per-worker ratios.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        ratio = GaugeMetricFamily(
+            'sentiment_window_positive_ratio',
+            'Ratio of positive to total sentiments in the sliding window (0-1), by experiment variant',
+            labels=['experiment_variant', 'window']
+        )
+        latency = GaugeMetricFamily(
+            'sentiment_window_latency_avg_seconds',
+            'Average latency of the prediction requests served in the sliding window, by experiment variant',
+            labels=['experiment_variant', 'window']
+        )
+        for experiment_variant, windows in read_window_stats(self.source).items():
+            for window, totals in windows.items():
+                ratio.add_metric([experiment_variant, window], totals["positive_ratio"])
+                latency.add_metric([experiment_variant, window], totals["avg_latency_seconds"])
+        yield ratio
+        yield latency
+
+
+class LocalCollectors:
+    """The given in-process collectors, read as one source."""
+
+    def __init__(self, collectors):
+        self.collectors = collectors
+
+    def collect(self):
+        for collector in self.collectors:
+            yield from collector.collect()
+
+
+def metrics_source(*collectors):
+    """
+    Source reporting the metrics of every worker in multiprocess mode (read from
+    PROMETHEUS_MULTIPROC_DIR on each collect), otherwise the given collectors.
+    """
+    if multiprocess_enabled():
+        return WorkerMetricsCollector(None)
+    return LocalCollectors(collectors)
+
+
+def create_metrics_app(*collectors):
+    """
+    Build the WSGI app served at /metrics.
+
+    In multiprocess mode metrics are aggregated from every worker's files in
+    PROMETHEUS_MULTIPROC_DIR; otherwise the default in-process registry is used.
+    The derived gauges are computed from the given collectors in that case.
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        source = WorkerMetricsCollector(registry)
+    else:
+        registry = REGISTRY
+        source = LocalCollectors(collectors)
+    registry.register(SentimentRatioCollector(source))
+    registry.register(WindowStatsCollector(source))
+    return make_wsgi_app(registry)
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge
+from config import (
+    GUNICORN_THREADS,
+    MODEL_SERVICE_POOL_SIZE,
+    MODEL_SERVICE_CONNECT_TIMEOUT,
+    MODEL_SERVICE_READ_TIMEOUT,
+    MODEL_SERVICE_BATCH_PATH
+)
+from circuit_breaker import CircuitOpenError, model_service_breaker
+from load_balancer import model_router
+from hedging import hedger as default_hedger, retrier as default_retrier, retry_budget
+
+# Prometheus metrics for the shared model-service connection pool
+MODEL_CLIENT_POOL_SIZE = Gauge(
+    'model_client_pool_size',
+    'Maximum number of pooled connections to the model service',
+    multiprocess_mode='max'
+)
+
+MODEL_CLIENT_IN_FLIGHT = Gauge(
+    'model_client_requests_in_flight',
+    'Number of model-service requests currently holding a pooled connection',
+    multiprocess_mode='livesum'
+)
+
+MODEL_CLIENT_IDLE_CONNECTIONS = Gauge(
+    'model_client_idle_connections',
+    'Number of open keep-alive connections waiting in the pool',
+    multiprocess_mode='livesum'
+)
+
+MODEL_CLIENT_CONNECTIONS = Counter(
+    'model_client_connections_total',
+    'Connections used for model-service requests, by whether they were newly opened or reused',
+    ['state']  # 'new' or 'reused'
+)
+MODEL_CLIENT_CONNECTIONS.labels(state='new').inc(0)
+MODEL_CLIENT_CONNECTIONS.labels(state='reused').inc(0)
+
+
+class ModelServiceError(Exception):
+    """Raised when the model service answers a prediction call with a non-200 status."""
+
+    def __init__(self, status_code, payload):
+        super().__init__(f"Model service returned status code {status_code}")
+        self.status_code = status_code
+        self.payload = payload
+
+
+class ModelServiceClient:
+    """
+    Shared HTTP client for the model service.
+
+    Wraps a single requests.Session so that TCP (and TLS) connections are kept
+    alive and reused across requests instead of being opened per call. Calls
+    are spread over the model-service instances by the router, and may be
+    hedged and retried (see hedging.py).
+    """
+
+    def __init__(self, pool_size=MODEL_SERVICE_POOL_SIZE,
+                 connect_timeout=MODEL_SERVICE_CONNECT_TIMEOUT,
+                 read_timeout=MODEL_SERVICE_READ_TIMEOUT,
+                 breaker=model_service_breaker,
+                 router=model_router,
+                 hedger=default_hedger,
+                 retrier=default_retrier):
+        self.pool_size = pool_size
+        self.breaker = breaker
+        self.router = router
+        self.hedger = hedger
+        self.retrier = retrier
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self._init_pool()
+        # Sockets and threads must not be shared with forked gunicorn workers (preload_app)
+        os.register_at_fork(after_in_child=self._init_pool)
+
+        MODEL_CLIENT_POOL_SIZE.set(pool_size)
+
+    def _init_pool(self):
+        self._adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+        self._session = requests.Session()
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+        self._session.headers.update({"Connection": "keep-alive"})
+
+        # Last seen urllib3 pool counters, used to derive new/reused connection deltas
+        self._stats_lock = threading.Lock()
+        self._seen = {}
+
+        # Used to fan out batches when the model service has no batch endpoint
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="model-client")
+        # Runs the attempts of hedged calls, two per call while a hedge is out. Hedged calls come
+        # from the request threads and the fan-out executor above, so it is sized for all of them
+        # not to add a concurrency limit of its own (threads are only started when needed)
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * (GUNICORN_THREADS + self.pool_size),
+                                                  thread_name_prefix="model-hedge")
+
+    def _timeout(self, read_timeout=None):
+        return (self.connect_timeout, read_timeout or self.read_timeout)
+
+    def request(self, method, path, read_timeout=None, base_url=None, experiment_variant=None,
+                idempotent=None, hedge=False, **kwargs):
+        """
+        Send a request to the model service and return the requests.Response.
+
+        Unless base_url is given, the instance is picked by the router from the
+        pool serving experiment_variant, and the outcome feeds its passive health
+        checks. Raises requests.RequestException on connection errors and
+        timeouts, exactly like requests.request(), and CircuitOpenError (a
+        RequestException) while the circuit breaker is open.
+
+        Idempotent calls (GET and HEAD unless told otherwise) failing with a
+        connection error, timeout or 5xx answer are retried up to
+        RETRY_MAX_ATTEMPTS times; with hedge=True and HEDGE_ENABLED a slow call
+        is also sent a second time. The body must be given as bytes or json so
+        that it can be sent again.
+        """
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD')
+
+        def attempt():
+            return self._send(method, path, read_timeout, base_url, experiment_variant, **kwargs)
+
+        def hedged_attempt():
+            return self.hedger.call(attempt, self._hedge_executor, _succeeded, _discard)
+
+        hedged = hedge and self.hedger is not None and self.hedger.enabled
+        send = hedged_attempt if hedged else attempt
+
+        with retry_budget.call():
+            if idempotent and self.retrier is not None and self.retrier.enabled:
+                return self.retrier.call(send, _retryable, _succeeded, _discard)
+            return send()
+
+    def _send(self, method, path, read_timeout, base_url, experiment_variant, **kwargs):
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+        pool = backend = None
+        if base_url is None:
+            pool = self.router.pool(experiment_variant)
+            backend = pool.acquire()
+            base_url = backend.url
+
+        MODEL_CLIENT_IN_FLIGHT.inc()
+        start_time = time.perf_counter()
+        try:
+            response = self._session.request(
+                method,
+                f"{base_url}{path}",
+                timeout=self._timeout(read_timeout),
+                **kwargs
+            )
+        except requests.RequestException:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            if backend is not None:
+                pool.release(backend, time.perf_counter() - start_time, failed=True)
+            raise
+        finally:
+            MODEL_CLIENT_IN_FLIGHT.dec()
+            self._record_pool_stats()
+
+        failed = response.status_code >= 500
+        if backend is not None:
+            pool.release(backend, time.perf_counter() - start_time, failed=failed)
+        if self.breaker is not None:
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def predict_batch(self, texts, base_url=None, experiment_variant=None):
+        """
+        Get predictions for a list of texts, returned as {"prediction": ...} dicts in input order.
+
+        Uses the model-service batch endpoint when MODEL_SERVICE_BATCH_PATH is set,
+        otherwise sends one /predict call per text concurrently over the shared pool
+        (each routed to its own instance). Raises ModelServiceError on a non-200
+        answer or a batch answer without one prediction per text, and
+        requests.RequestException on connection errors.
+        """
+        if not texts:
+            return []
+
+        if MODEL_SERVICE_BATCH_PATH:
+            response = self.post(MODEL_SERVICE_BATCH_PATH, base_url=base_url,
+                                 experiment_variant=experiment_variant, idempotent=True, json={"data": texts})
+            if response.status_code != 200:
+                raise ModelServiceError(response.status_code, _response_payload(response))
+            predictions = response.json().get("predictions")
+            if not isinstance(predictions, list) or len(predictions) != len(texts):
+                # Predictions are matched to the texts by position
+                raise ModelServiceError(502, {
+                    "error": f"Model service did not return one prediction per text ({len(texts)} sent)"
+                })
+            return [p if isinstance(p, dict) else {"prediction": p} for p in predictions]
+
+        def predict_one(text):
+            response = self.post("/predict", base_url=base_url, experiment_variant=experiment_variant,
+                                 idempotent=True, hedge=True, json={"data": text})
+            if response.status_code != 200:
+                raise ModelServiceError(response.status_code, _response_payload(response))
+            return response.json()
+
+        return list(self._executor.map(predict_one, texts))
+
+    def _record_pool_stats(self):
+        """Export connection reuse and idle connection counts for the pooled connections."""
+        pools = self._adapter.poolmanager.pools
+        new_connections = new_requests = idle_connections = 0
+
+        with self._stats_lock:
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                seen_connections, seen_requests = self._seen.get(key, (0, 0))
+                new_connections += pool.num_connections - seen_connections
+                new_requests += pool.num_requests - seen_requests
+                self._seen[key] = (pool.num_connections, pool.num_requests)
+                # Connections checked out of the pool are replaced by None placeholders
+                if pool.pool is not None:
+                    idle_connections += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        if new_connections > 0:
+            MODEL_CLIENT_CONNECTIONS.labels(state='new').inc(new_connections)
+        if new_requests > new_connections:
+            MODEL_CLIENT_CONNECTIONS.labels(state='reused').inc(new_requests - new_connections)
+        MODEL_CLIENT_IDLE_CONNECTIONS.set(idle_connections)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._hedge_executor.shutdown(wait=False)
+        self._session.close()
+
+
+def _succeeded(response):
+    return response.status_code < 500
+
+
+def _discard(response):
+    # Give the connection of an unused answer back to the pool
+    response.close()
+
+
+def _retryable(exc):
+    # An open circuit fails fast, retrying would defeat it
+    return isinstance(exc, requests.RequestException) and not isinstance(exc, CircuitOpenError)
+
+
+def _response_payload(response):
+    """Decode an upstream error body, falling back to its raw text."""
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": response.text}
+
+
+# Shared client used by all routes
+model_client = ModelServiceClient()
@@ -0,0 +1,127 @@
+import json
+import threading
+
+from prometheus_client import Counter
+from config import PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES
+
+# Prometheus metrics for forwarded model-service answers
+PASSTHROUGH_RESPONSES = Counter(
+    'predict_passthrough_responses_total',
+    'Model-service /predict answers forwarded to the client without re-encoding',
+    ['mode']  # 'buffered' (read in full) or 'streamed' (larger than PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES)
+)
+PASSTHROUGH_RESPONSES.labels(mode='buffered').inc(0)
+PASSTHROUGH_RESPONSES.labels(mode='streamed').inc(0)
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_PREDICTION_KEY = b'"prediction"'
+
+
+def extract_prediction(body):
+    """
+    Decode only the value of the "prediction" key of a JSON answer.
+
+    Returns {"prediction": value}, or {} when the key is missing or cut off (a
+    streamed answer whose head does not contain it), so that record_predictions
+    counts it as 'unknown'.
+    """
+    index = body.find(_PREDICTION_KEY)
+    # An escaped quote means the key text is inside a string value
+    while index > 0 and body[index - 1] == ord('\\'):
+        index = body.find(_PREDICTION_KEY, index + 1)
+    if index == -1:
+        return {}
+    text = body[index + len(_PREDICTION_KEY):].decode('utf-8', 'replace').lstrip()
+    if not text.startswith(':'):
+        return {}
+    text = text[1:].lstrip()
+    try:
+        value, _ = _decoder.raw_decode(text)
+    except ValueError:
+        return {}
+    return {"prediction": value}
+
+
+class PassthroughResponse:
+    """
+    A successful model-service /predict answer, forwarded to the client as-is.
+
+    Answers up to PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES are held in body and can
+    be shared with single-flight followers and cached. Larger answers keep only
+    their first chunks in head and stream the rest from the model service, so
+    they can be sent once: the request that claim()s them first sends them and
+    the others have to fetch their own copy.
+    """
+
+    def __init__(self, status_code, content_type, body=None, head=None, chunks=None, close=None):
+        self.status_code = status_code
+        self.content_type = content_type
+        self.body = body
+        self.head = head
+        self._chunks = chunks
+        self._close = close
+        self._claimed = False
+        self._lock = threading.Lock()
+        self.result = extract_prediction(body if body is not None else head)
+        PASSTHROUGH_RESPONSES.labels(mode='buffered' if body is not None else 'streamed').inc()
+
+    @property
+    def streamed(self):
+        return self.body is None
+
+    def claim(self):
+        """Take the right to send this answer; always granted for buffered answers."""
+        if not self.streamed:
+            return True
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+    def iter_body(self):
+        """Yield a streamed answer: the buffered head, then the rest as it arrives."""
+        try:
+            yield self.head
+            yield from self._chunks
+        finally:
+            self._close()
+
+    async def aiter_body(self):
+        """Async counterpart of iter_body() for answers read with httpx."""
+        try:
+            yield self.head
+            async for chunk in self._chunks:
+                yield chunk
+        finally:
+            await self._close()
+
+
+def read_passthrough(response, max_buffer=PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES):
+    """Wrap a 200 requests.Response sent with stream=True, reading at most max_buffer bytes of it."""
+    content_type = response.headers.get('Content-Type', 'application/json')
+    chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > max_buffer:
+            return PassthroughResponse(response.status_code, content_type, head=b''.join(head),
+                                       chunks=chunks, close=response.close)
+    return PassthroughResponse(response.status_code, content_type, body=b''.join(head))
+
+
+async def read_passthrough_async(response, max_buffer=PREDICT_PASSTHROUGH_MAX_BUFFER_BYTES):
+    """Wrap a 200 httpx.Response sent with stream=True, reading at most max_buffer bytes of it."""
+    content_type = response.headers.get('Content-Type', 'application/json')
+    chunks = response.aiter_bytes(chunk_size=CHUNK_SIZE)
+    head, size = [], 0
+    async for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > max_buffer:
+            return PassthroughResponse(response.status_code, content_type, head=b''.join(head),
+                                       chunks=chunks, close=response.aclose)
+    return PassthroughResponse(response.status_code, content_type, body=b''.join(head))
@@ -0,0 +1,203 @@
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge
+from config import (
+    PREDICTION_CACHE_BACKEND,
+    PREDICTION_CACHE_MAX_ENTRIES,
+    PREDICTION_CACHE_TTL,
+    PREDICTION_CACHE_PATH
+)
+from json_provider import json_dumps, json_loads
+
+# Prometheus metrics for the prediction result cache
+PREDICTION_CACHE_HITS = Counter(
+    'prediction_cache_hits_total',
+    'Number of predictions served from the prediction cache'
+)
+
+PREDICTION_CACHE_MISSES = Counter(
+    'prediction_cache_misses_total',
+    'Number of predictions that had to be requested from the model service'
+)
+
+PREDICTION_CACHE_EVICTIONS = Counter(
+    'prediction_cache_evictions_total',
+    'Number of entries removed from the prediction cache',
+    ['reason']  # 'capacity' (LRU) or 'expired' (TTL)
+)
+PREDICTION_CACHE_EVICTIONS.labels(reason='capacity').inc(0)
+PREDICTION_CACHE_EVICTIONS.labels(reason='expired').inc(0)
+
+PREDICTION_CACHE_SIZE = Gauge(
+    'prediction_cache_entries',
+    'Number of entries currently held in the prediction cache',
+    # Per-worker memory caches add up, a shared SQLite cache is the same for every worker
+    multiprocess_mode='livemax' if PREDICTION_CACHE_BACKEND == 'sqlite' else 'livesum'
+)
+
+
+def normalize_text(text):
+    """Normalize review text so trivially different copies share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def make_cache_key(text, model_version):
+    """Build a cache key from the normalized review text and the model-service version."""
+    raw = f"{model_version}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryPredictionCache:
+    """
+    Bounded in-process prediction cache with LRU and TTL eviction.
+
+    Each gunicorn worker holds its own copy; use SQLitePredictionCache to share
+    entries between workers on the same host.
+    """
+
+    def __init__(self, max_entries=PREDICTION_CACHE_MAX_ENTRIES, ttl=PREDICTION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                PREDICTION_CACHE_MISSES.inc()
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                PREDICTION_CACHE_EVICTIONS.labels(reason='expired').inc()
+                PREDICTION_CACHE_MISSES.inc()
+                PREDICTION_CACHE_SIZE.set(len(self._entries))
+                return None
+            self._entries.move_to_end(key)
+        PREDICTION_CACHE_HITS.inc()
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                PREDICTION_CACHE_EVICTIONS.labels(reason='capacity').inc()
+            PREDICTION_CACHE_SIZE.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            PREDICTION_CACHE_SIZE.set(0)
+
+
+class SQLitePredictionCache:
+    """
+    Prediction cache stored in a local SQLite file shared by all workers on a host.
+
+    Uses WAL mode so readers in one worker do not block writers in another.
+    LRU order is tracked through a last-access timestamp. Counting the rows
+    scans the table, so the capacity is enforced by a sweep every sweep_every
+    inserts of a worker rather than on each one; in between the table may
+    briefly hold a few more than max_entries rows.
+    """
+
+    def __init__(self, path=PREDICTION_CACHE_PATH, max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+                 ttl=PREDICTION_CACHE_TTL, sweep_every=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sweep_every = sweep_every if sweep_every is not None else max(1, max_entries // 64)
+        self._inserts = itertools.count()
+        self._local = threading.local()
+        # SQLite connections must not be carried over into forked gunicorn workers
+        os.register_at_fork(after_in_child=self._reset_connections)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_last_access ON predictions (last_access)")
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # Cache contents are disposable
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires_at FROM predictions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            PREDICTION_CACHE_MISSES.inc()
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+            PREDICTION_CACHE_EVICTIONS.labels(reason='expired').inc()
+            PREDICTION_CACHE_MISSES.inc()
+            return None
+        conn.execute("UPDATE predictions SET last_access = ? WHERE key = ?", (now, key))
+        PREDICTION_CACHE_HITS.inc()
+        return json_loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO predictions (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json_dumps(value), now + self.ttl, now)
+        )
+        if next(self._inserts) % self.sweep_every == 0:
+            self._evict_overflow(conn)
+
+    def _evict_overflow(self, conn):
+        """Evict the least recently used entries beyond max_entries."""
+        size = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        overflow = size - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+            PREDICTION_CACHE_EVICTIONS.labels(reason='capacity').inc(overflow)
+            size = self.max_entries
+        PREDICTION_CACHE_SIZE.set(size)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM predictions")
+        PREDICTION_CACHE_SIZE.set(0)
+
+
+def create_prediction_cache(backend=PREDICTION_CACHE_BACKEND):
+    """Create the prediction cache configured by PREDICTION_CACHE_BACKEND ('memory', 'sqlite' or 'none')."""
+    if backend == 'memory':
+        return MemoryPredictionCache()
+    if backend == 'sqlite':
+        return SQLitePredictionCache()
+    return None
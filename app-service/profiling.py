@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+
+from prometheus_client import Histogram
+from config import PREDICT_STAGE_TIMING, PROFILER_INTERVAL_MS
+
+# Prometheus metrics for /predict stage timing
+# 'local' is the time not spent in any other stage: logging, metrics, cache writes, framework code
+PREDICT_STAGES = ('parse', 'cache', 'upstream', 'serialize', 'local')
+
+PREDICT_STAGE_LATENCY = Histogram(
+    'predict_stage_latency_seconds',
+    'Time spent by /predict requests in each stage of the handler',
+    ['stage'],
+    buckets=[0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+for _stage in PREDICT_STAGES:
+    PREDICT_STAGE_LATENCY.labels(stage=_stage)
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        durations = self.timer.durations
+        durations[self.name] = durations.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class StageTimer:
+    """
+    Times one /predict request on the monotonic clock, split into stages.
+
+    Wrap each stage in `with timer.stage('upstream'):`; finish() observes the
+    stages that ran plus the remaining 'local' time in predict_stage_latency_seconds
+    and returns the total, for sentiment_prediction_latency_seconds. With
+    PREDICT_STAGE_TIMING disabled only the total is measured.
+    """
+
+    __slots__ = ('enabled', 'start', 'durations')
+
+    def __init__(self, enabled=PREDICT_STAGE_TIMING):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.durations = {}
+
+    def stage(self, name):
+        return _Stage(self, name) if self.enabled else _NO_STAGE
+
+    def finish(self):
+        total = time.perf_counter() - self.start
+        if self.enabled:
+            for name, seconds in self.durations.items():
+                PREDICT_STAGE_LATENCY.labels(stage=name).observe(seconds)
+            PREDICT_STAGE_LATENCY.labels(stage='local').observe(max(0.0, total - sum(self.durations.values())))
+        return total
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is being captured in the same worker."""
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for live traffic, without dependencies or tracing hooks.
+
+    capture() samples the Python stacks of every other thread of the process
+    every interval and returns them in the folded ("collapsed") format read by
+    flamegraph.pl, speedscope and most flame graph viewers: one line per distinct
+    stack, 'thread;outer frame;...;inner frame count'. Nothing runs between
+    captures, so the service pays nothing unless a profile is being taken.
+    Only one capture runs per process at a time.
+    """
+
+    def __init__(self):
+        self._init_lock()
+        # A lock held by another thread at fork time would never be released in the child
+        os.register_at_fork(after_in_child=self._init_lock)
+
+    def _init_lock(self):
+        self._lock = threading.Lock()
+
+    def capture(self, seconds, interval=PROFILER_INTERVAL_MS / 1000):
+        """Sample for the given number of seconds; returns (folded stacks text, number of samples)."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being captured by this worker")
+        try:
+            stacks = StackCounter()
+            code_names = {}
+            own_thread = threading.get_ident()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    stacks[self._fold(frame, thread_names.get(thread_id, str(thread_id)), code_names)] += 1
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._lock.release()
+        folded = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return folded, samples
+
+    @staticmethod
+    def _fold(frame, thread_name, code_names):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            name = code_names.get(code)
+            if name is None:
+                name = code_names[code] = (
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+                )
+            frames.append(name)
+            frame = frame.f_back
+        frames.append(thread_name.replace(';', ':'))
+        return ";".join(reversed(frames))
+
+
+# Profiler behind GET /debug/profile (only exposed when PROFILER_ENABLED is set)
+sampling_profiler = SamplingProfiler()
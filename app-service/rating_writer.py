@@ -0,0 +1,140 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+from loguru import logger
+from prometheus_client import Counter, Histogram
+from config import (
+    RATINGS_WRITE_BATCH_SIZE,
+    RATINGS_WRITE_FLUSH_INTERVAL_MS,
+    RATINGS_WRITE_QUEUE_SIZE,
+    RATINGS_WRITE_MAX_RETRIES
+)
+
+# Prometheus metrics for the write-behind queue
+RATINGS_WRITE_QUEUE_DEPTH = Histogram(
+    'ratings_write_queue_depth',
+    'Number of ratings waiting in the write-behind queue, observed on every submission',
+    buckets=[0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000]
+)
+
+RATINGS_WRITE_FLUSH_LATENCY = Histogram(
+    'ratings_write_flush_seconds',
+    'Time spent writing and committing one batch of ratings',
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+RATINGS_WRITE_BATCH_SIZE_HISTOGRAM = Histogram(
+    'ratings_write_batch_size',
+    'Number of ratings committed per write-behind flush',
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500]
+)
+
+RATINGS_WRITE_FAILURES = Counter(
+    'ratings_write_failures_total',
+    'Number of ratings that could not be written by the write-behind queue'
+)
+
+
+class WriteBehindRatingWriter:
+    """
+    Write-behind queue in front of a RatingsStore.
+
+    submit() only enqueues the validated rating and returns. A background thread
+    collects up to RATINGS_WRITE_BATCH_SIZE ratings, waiting at most
+    RATINGS_WRITE_FLUSH_INTERVAL_MS after the first one, and writes them with a
+    single fsynced commit. When the queue is full the rating is written in the
+    caller's thread instead, so a stalled disk turns into back-pressure rather
+    than lost ratings. A batch that still fails after RATINGS_WRITE_MAX_RETRIES
+    is written one rating at a time, so only the ratings that cannot be stored
+    are dropped. The queue is drained on interpreter exit.
+    """
+
+    def __init__(self, store, max_batch_size=RATINGS_WRITE_BATCH_SIZE,
+                 flush_interval_ms=RATINGS_WRITE_FLUSH_INTERVAL_MS,
+                 max_queue_size=RATINGS_WRITE_QUEUE_SIZE, max_retries=RATINGS_WRITE_MAX_RETRIES):
+        self.store = store
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self._start()
+        # The writer thread does not survive fork, restart it in every gunicorn worker
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.flush)
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="ratings-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, rating):
+        """Queue a rating for the next batch (or write it directly if the queue is full)."""
+        try:
+            self._queue.put_nowait(rating)
+        except queue.Full:
+            logger.warning("Ratings write queue is full, writing synchronously")
+            self.store.add(rating)
+        RATINGS_WRITE_QUEUE_DEPTH.observe(self._queue.qsize())
+
+    def _collect(self):
+        # Block for the first rating, then fill the batch until it is full or the interval ends
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(1, self.max_retries + 2):
+            start_time = time.time()
+            try:
+                self.store.add_many(batch, durable=True)
+            except Exception as e:
+                logger.error("Writing {} ratings failed (attempt {}): {}", len(batch), attempt, str(e))
+                time.sleep(min(self.flush_interval * 2 ** attempt, 5.0))
+                continue
+            RATINGS_WRITE_FLUSH_LATENCY.observe(time.time() - start_time)
+            RATINGS_WRITE_BATCH_SIZE_HISTOGRAM.observe(len(batch))
+            return
+        if len(batch) > 1:
+            # One bad rating fails the whole transaction: write them one by one so that only
+            # the ratings that cannot be written are dropped, not the rest of the batch
+            for rating in batch:
+                self._write_one(rating)
+            return
+        self._drop(batch)
+
+    def _write_one(self, rating):
+        try:
+            self.store.add_many([rating], durable=True)
+        except Exception as e:
+            logger.error("Writing rating {} failed: {}", rating["id"], str(e))
+            self._drop([rating])
+
+    def _drop(self, ratings):
+        RATINGS_WRITE_FAILURES.inc(len(ratings))
+        logger.error("Dropped {} ratings after {} failed writes: {}",
+                     len(ratings), self.max_retries + 1, [rating["id"] for rating in ratings])
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued rating has been written (used at shutdown)."""
+        if self._thread.is_alive():
+            self._queue.join()
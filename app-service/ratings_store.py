@@ -0,0 +1,423 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+from loguru import logger
+from config import RATINGS_DB_PATH, RATINGS_LEGACY_FILE
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS ratings ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " id TEXT NOT NULL UNIQUE,"
+    " review_text TEXT NOT NULL,"
+    " rating INTEGER NOT NULL,"
+    " sentiment TEXT NOT NULL,"
+    " timestamp TEXT NOT NULL,"
+    " restaurant TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_ratings_restaurant ON ratings (restaurant)",
+    "CREATE INDEX IF NOT EXISTS idx_ratings_sentiment ON ratings (sentiment)",
+    "CREATE INDEX IF NOT EXISTS idx_ratings_timestamp ON ratings (timestamp)",
+    # Running totals per (restaurant, sentiment), updated in the same transaction as each insert
+    "CREATE TABLE IF NOT EXISTS rating_aggregates ("
+    " restaurant TEXT NOT NULL,"
+    " sentiment TEXT NOT NULL,"
+    " count INTEGER NOT NULL,"
+    " rating_sum INTEGER NOT NULL,"
+    " stars_1 INTEGER NOT NULL, stars_2 INTEGER NOT NULL, stars_3 INTEGER NOT NULL,"
+    " stars_4 INTEGER NOT NULL, stars_5 INTEGER NOT NULL,"
+    " PRIMARY KEY (restaurant, sentiment))",
+    # Running totals per hour/day bucket, restaurant and sentiment
+    "CREATE TABLE IF NOT EXISTS rating_buckets ("
+    " interval TEXT NOT NULL,"
+    " bucket TEXT NOT NULL,"
+    " restaurant TEXT NOT NULL,"
+    " sentiment TEXT NOT NULL,"
+    " count INTEGER NOT NULL,"
+    " rating_sum INTEGER NOT NULL,"
+    " PRIMARY KEY (interval, bucket, restaurant, sentiment))",
+    # Review feeds: reviews with their sentiment, written once at ingestion and read page by page
+    "CREATE TABLE IF NOT EXISTS review_feed ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " restaurant TEXT NOT NULL,"
+    " author TEXT,"
+    " review_text TEXT NOT NULL,"
+    " sentiment TEXT NOT NULL,"
+    " rating INTEGER,"
+    " timestamp TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_review_feed_restaurant ON review_feed (restaurant, seq)",
+    # Bumped with every review added to a restaurant's feed, used as its ETag
+    "CREATE TABLE IF NOT EXISTS review_feed_versions ("
+    " restaurant TEXT PRIMARY KEY,"
+    " version INTEGER NOT NULL)",
+]
+
+COLUMNS = ("id", "review_text", "rating", "sentiment", "timestamp", "restaurant")
+
+FEED_COLUMNS = ("restaurant", "author", "review_text", "sentiment", "rating", "timestamp")
+
+INTERVALS = ("hour", "day")
+
+UPSERT_AGGREGATE = (
+    "INSERT INTO rating_aggregates"
+    " (restaurant, sentiment, count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)"
+    " VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT (restaurant, sentiment) DO UPDATE SET"
+    " count = count + 1,"
+    " rating_sum = rating_sum + excluded.rating_sum,"
+    " stars_1 = stars_1 + excluded.stars_1, stars_2 = stars_2 + excluded.stars_2,"
+    " stars_3 = stars_3 + excluded.stars_3, stars_4 = stars_4 + excluded.stars_4,"
+    " stars_5 = stars_5 + excluded.stars_5"
+)
+
+UPSERT_BUCKET = (
+    "INSERT INTO rating_buckets (interval, bucket, restaurant, sentiment, count, rating_sum)"
+    " VALUES (?, ?, ?, ?, 1, ?)"
+    " ON CONFLICT (interval, bucket, restaurant, sentiment) DO UPDATE SET"
+    " count = count + 1, rating_sum = rating_sum + excluded.rating_sum"
+)
+
+
+INSERT_FEED_REVIEW = f"INSERT INTO review_feed ({', '.join(FEED_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)"
+
+BUMP_FEED_VERSION = (
+    "INSERT INTO review_feed_versions (restaurant, version) VALUES (?, 1)"
+    " ON CONFLICT (restaurant) DO UPDATE SET version = version + 1"
+)
+
+
+def bucket_start(timestamp, interval):
+    """Start of the hour or day bucket holding an ISO-8601 timestamp."""
+    if interval == 'hour':
+        return timestamp[:13] + ":00:00"
+    return timestamp[:10]
+
+
+def _summary(count, rating_sum, stars):
+    return {
+        "count": count,
+        "average_rating": round(rating_sum / count, 3) if count else None,
+        "stars": {str(star): stars[star - 1] for star in range(1, 6)}
+    }
+
+
+def _legacy_row(rating):
+    """
+    The ratings row of a ratings.json record, or None when it cannot be stored.
+
+    A missing id is generated and a missing restaurant is 'Unknown' (as the old
+    /submit-rating did); records without a 1-5 integer rating or a review text,
+    sentiment or timestamp string are skipped.
+    """
+    if not isinstance(rating, dict):
+        return None
+    stars = rating.get('rating')
+    if isinstance(stars, bool) or not isinstance(stars, int) or not 1 <= stars <= 5:
+        return None
+    if not all(isinstance(rating.get(column), str) for column in ('review_text', 'sentiment', 'timestamp')):
+        return None
+    row = {
+        **rating,
+        "id": rating['id'] if isinstance(rating.get('id'), str) else str(uuid.uuid4()),
+        "restaurant": rating['restaurant'] if isinstance(rating.get('restaurant'), str) else 'Unknown'
+    }
+    return tuple(row[column] for column in COLUMNS)
+
+
+class RatingsStore:
+    """
+    Append-only ratings storage backed by SQLite in WAL mode.
+
+    Each submission is a single indexed INSERT plus constant-size updates of the
+    precomputed aggregate tables, so write cost does not grow with the number of
+    stored ratings, and the analytics queries read those aggregates instead of
+    rescanning the ratings. Reviews, from ratings or ingested with their
+    sentiment already computed, are also indexed into per-restaurant review
+    feeds whose version changes whenever a feed does. WAL mode lets concurrent threads and gunicorn
+    workers append safely: writers are serialized by SQLite's file lock and
+    readers never block them.
+    """
+
+    def __init__(self, path=RATINGS_DB_PATH, legacy_file=RATINGS_LEGACY_FILE):
+        self.path = path
+        self._local = threading.local()
+        # SQLite connections must not be carried over into forked gunicorn workers
+        os.register_at_fork(after_in_child=self._reset_connections)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        self._import_legacy_file(legacy_file)
+        self._backfill_aggregates()
+        self._backfill_feed()
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL only fsyncs at checkpoints, batching disk flushes across commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, rating):
+        """Append one rating record and update the aggregates and review feed in the same transaction."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                f"INSERT INTO ratings ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                tuple(rating[column] for column in COLUMNS)
+            )
+            self._update_aggregates(conn, rating)
+            self._index_review(conn, {**rating, "author": None})
+
+    def add_many(self, ratings, durable=False):
+        """
+        Append a batch of ratings in a single transaction (group commit).
+
+        With durable=True the commit is fsynced (synchronous=FULL), so the whole
+        batch is on disk when this returns at the cost of one flush.
+        """
+        conn = self._connection()
+        if durable:
+            conn.execute("PRAGMA synchronous=FULL")
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO ratings ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [tuple(rating[column] for column in COLUMNS) for rating in ratings]
+                )
+                for rating in ratings:
+                    self._update_aggregates(conn, rating)
+                    self._index_review(conn, {**rating, "author": None})
+        finally:
+            if durable:
+                conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _update_aggregates(self, conn, rating):
+        stars = [1 if rating['rating'] == star else 0 for star in range(1, 6)]
+        conn.execute(UPSERT_AGGREGATE, (rating['restaurant'], rating['sentiment'], rating['rating'], *stars))
+        for interval in INTERVALS:
+            conn.execute(UPSERT_BUCKET, (
+                interval, bucket_start(rating['timestamp'], interval),
+                rating['restaurant'], rating['sentiment'], rating['rating']
+            ))
+
+    def _index_review(self, conn, review):
+        conn.execute(INSERT_FEED_REVIEW, tuple(review[column] for column in FEED_COLUMNS))
+        conn.execute(BUMP_FEED_VERSION, (review['restaurant'],))
+
+    def add_reviews(self, reviews):
+        """Add reviews (restaurant, author, review_text, sentiment, rating, timestamp) to the feeds in one transaction."""
+        conn = self._connection()
+        with conn:
+            for review in reviews:
+                self._index_review(conn, review)
+
+    def feed_version(self, restaurant):
+        """Version of a restaurant's review feed (0 while it is empty); it changes whenever the feed does."""
+        row = self._connection().execute(
+            "SELECT version FROM review_feed_versions WHERE restaurant = ?", (restaurant,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def feed(self, restaurant, limit=20, cursor=None):
+        """
+        Newest-first page of a restaurant's review feed, with the sentiment of each review.
+
+        Returns (reviews, next_cursor) like list(); each page is one range scan of
+        the (restaurant, seq) index.
+        """
+        conditions, params = ["restaurant = ?"], [restaurant]
+        if cursor is not None:
+            conditions.append("seq < ?")
+            params.append(cursor)
+        rows = self._connection().execute(
+            f"SELECT seq, author, review_text, sentiment, rating, timestamp FROM review_feed"
+            f" WHERE {' AND '.join(conditions)} ORDER BY seq DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        reviews = [
+            {"author": author, "review": review_text, "sentiment": sentiment, "rating": rating, "timestamp": timestamp}
+            for _, author, review_text, sentiment, rating, timestamp in rows[:limit]
+        ]
+        return reviews, next_cursor
+
+    def count(self):
+        row = self._connection().execute("SELECT COALESCE(SUM(count), 0) FROM rating_aggregates").fetchone()
+        return row[0]
+
+    def stats(self, restaurant=None, sentiment=None):
+        """Rating counts, averages and star distributions overall, per restaurant and per sentiment."""
+        query = ("SELECT restaurant, sentiment, count, rating_sum,"
+                 " stars_1, stars_2, stars_3, stars_4, stars_5 FROM rating_aggregates")
+        conditions, params = [], []
+        if restaurant is not None:
+            conditions.append("restaurant = ?")
+            params.append(restaurant)
+        if sentiment is not None:
+            conditions.append("sentiment = ?")
+            params.append(sentiment)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        total = [0, 0, [0] * 5]
+        by_restaurant, by_sentiment = {}, {}
+        for row_restaurant, row_sentiment, count, rating_sum, *stars in self._connection().execute(query, params):
+            for group in (total,
+                          by_restaurant.setdefault(row_restaurant, [0, 0, [0] * 5]),
+                          by_sentiment.setdefault(row_sentiment, [0, 0, [0] * 5])):
+                group[0] += count
+                group[1] += rating_sum
+                group[2] = [a + b for a, b in zip(group[2], stars)]
+
+        return {
+            "total": _summary(*total),
+            "by_restaurant": {name: _summary(*values) for name, values in sorted(by_restaurant.items())},
+            "by_sentiment": {name: _summary(*values) for name, values in sorted(by_sentiment.items())},
+        }
+
+    def histogram(self, interval='day', restaurant=None, sentiment=None, since=None, until=None, limit=1000):
+        """Rating counts and averages per time bucket, most recent `limit` buckets in ascending order."""
+        conditions, params = ["interval = ?"], [interval]
+        if restaurant is not None:
+            conditions.append("restaurant = ?")
+            params.append(restaurant)
+        if sentiment is not None:
+            conditions.append("sentiment = ?")
+            params.append(sentiment)
+        if since is not None:
+            conditions.append("bucket >= ?")
+            params.append(bucket_start(since, interval))
+        if until is not None:
+            conditions.append("bucket <= ?")
+            params.append(bucket_start(until, interval))
+
+        rows = self._connection().execute(
+            "SELECT bucket, SUM(count), SUM(rating_sum) FROM rating_buckets"
+            f" WHERE {' AND '.join(conditions)}"
+            " GROUP BY bucket ORDER BY bucket DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [
+            {"bucket": bucket, "count": count, "average_rating": round(rating_sum / count, 3)}
+            for bucket, count, rating_sum in reversed(rows)
+        ]
+
+    def list(self, restaurant=None, sentiment=None, limit=50, cursor=None):
+        """
+        Newest-first page of raw ratings using keyset pagination.
+
+        Returns (ratings, next_cursor); pass next_cursor back to get the following
+        page. Each page is an index range scan, independent of how deep it is.
+        """
+        conditions, params = [], []
+        if restaurant is not None:
+            conditions.append("restaurant = ?")
+            params.append(restaurant)
+        if sentiment is not None:
+            conditions.append("sentiment = ?")
+            params.append(sentiment)
+        if cursor is not None:
+            conditions.append("seq < ?")
+            params.append(cursor)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self._connection().execute(
+            f"SELECT seq, {', '.join(COLUMNS)} FROM ratings{where} ORDER BY seq DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [dict(zip(COLUMNS, row[1:])) for row in rows[:limit]], next_cursor
+
+    def _import_legacy_file(self, legacy_file):
+        """One-time import of ratings written by the old ratings.json storage."""
+        conn = self._connection()
+        if not legacy_file or not os.path.exists(legacy_file) or conn.execute("SELECT 1 FROM ratings LIMIT 1").fetchone():
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                ratings = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Could not import legacy ratings from {}: {}", legacy_file, str(e))
+            return
+        if not isinstance(ratings, list):
+            logger.error("Could not import legacy ratings from {}: expected a JSON list", legacy_file)
+            return
+
+        rows = [row for row in map(_legacy_row, ratings) if row is not None]
+        if len(rows) < len(ratings):
+            logger.warning("Skipped {} invalid legacy ratings in {}", len(ratings) - len(rows), legacy_file)
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO ratings ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        logger.info("Imported {} ratings from {}", len(rows), legacy_file)
+
+    def _backfill_aggregates(self):
+        """Build the aggregate tables once for databases created before they existed."""
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM rating_aggregates LIMIT 1").fetchone():
+            return
+        if not conn.execute("SELECT 1 FROM ratings LIMIT 1").fetchone():
+            return
+
+        with conn:
+            # Re-check inside the write transaction in case another worker got here first
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM rating_aggregates LIMIT 1").fetchone():
+                return
+            conn.execute(
+                "INSERT INTO rating_aggregates"
+                " (restaurant, sentiment, count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)"
+                " SELECT restaurant, sentiment, COUNT(*), SUM(rating),"
+                " SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)"
+                " FROM ratings GROUP BY restaurant, sentiment"
+            )
+            conn.execute(
+                "INSERT INTO rating_buckets (interval, bucket, restaurant, sentiment, count, rating_sum)"
+                " SELECT 'hour', substr(timestamp, 1, 13) || ':00:00', restaurant, sentiment, COUNT(*), SUM(rating)"
+                " FROM ratings GROUP BY 2, 3, 4"
+            )
+            conn.execute(
+                "INSERT INTO rating_buckets (interval, bucket, restaurant, sentiment, count, rating_sum)"
+                " SELECT 'day', substr(timestamp, 1, 10), restaurant, sentiment, COUNT(*), SUM(rating)"
+                " FROM ratings GROUP BY 2, 3, 4"
+            )
+        logger.info("Built rating aggregates from existing ratings")
+
+    def _backfill_feed(self):
+        """Index the reviews of ratings stored before the review feeds existed."""
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM review_feed_versions LIMIT 1").fetchone():
+            return
+        if not conn.execute("SELECT 1 FROM ratings LIMIT 1").fetchone():
+            return
+
+        with conn:
+            # Re-check inside the write transaction in case another worker got here first
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM review_feed_versions LIMIT 1").fetchone():
+                return
+            conn.execute(
+                f"INSERT INTO review_feed ({', '.join(FEED_COLUMNS)})"
+                " SELECT restaurant, NULL, review_text, sentiment, rating, timestamp FROM ratings ORDER BY seq"
+            )
+            conn.execute(
+                "INSERT INTO review_feed_versions (restaurant, version)"
+                " SELECT restaurant, COUNT(*) FROM review_feed GROUP BY restaurant"
+            )
+        logger.info("Built review feeds from existing ratings")
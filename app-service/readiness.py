@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+from loguru import logger
+from config import STARTUP_PROBE_INTERVAL
+
+
+class StartupProbe:
+    """
+    Readiness state of the service, backing /ready.
+
+    The model-service reachability check runs on a daemon thread and is retried
+    every STARTUP_PROBE_INTERVAL seconds until it succeeds, so an unreachable
+    model service delays readiness but not process startup or liveness (/health).
+    Once it succeeds the warm_ups (e.g. loading the version cache) run on the
+    same thread, and the service is ready when they have finished too. It then
+    stays ready; later model-service outages are handled by the circuit breaker.
+    """
+
+    def __init__(self, probe_fn, warm_ups=(), interval=STARTUP_PROBE_INTERVAL):
+        self.probe_fn = probe_fn
+        self.warm_ups = list(warm_ups)
+        self.interval = interval
+        self._ready = False
+        self._error = "Model service not probed yet"
+        self._init_thread()
+        # Workers forked before the probe succeeded need their own probe thread
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _init_thread(self):
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _after_fork(self):
+        self._init_thread()
+        if not self._ready:
+            self.start()
+
+    @property
+    def ready(self):
+        return self._ready
+
+    @property
+    def error(self):
+        """Why the last check failed, or None once ready."""
+        return self._error
+
+    def check(self):
+        """Run the probe, then the warm-ups, once in the calling thread; returns True when all succeeded."""
+        try:
+            self.probe_fn()
+            for warm_up in self.warm_ups:
+                warm_up()
+        except Exception as e:
+            self._error = str(e)
+            return False
+        self._ready = True
+        self._error = None
+        return True
+
+    def start(self):
+        """Probe in the background until the check succeeds."""
+        with self._lock:
+            if self._ready or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="startup-probe", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        attempts = 0
+        while not self.check():
+            attempts += 1
+            if attempts == 1:
+                logger.error("Model service not reachable yet, retrying every {}s: {}", self.interval, self._error)
+            time.sleep(self.interval)
+        logger.info("Service is ready (model service reachable after {} failed probes)", attempts)
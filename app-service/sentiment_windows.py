@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+
+from loguru import logger
+from prometheus_client import Gauge
+from config import SENTIMENT_WINDOWS, SENTIMENT_WINDOW_BUCKET_SECONDS, SENTIMENT_WINDOW_MAX_VARIANTS
+
+SENTIMENTS = ('positive', 'negative', 'unknown')
+OTHER_VARIANT = 'other'
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+# Prometheus metrics for the sliding windows. They hold this worker's totals and are summed
+# over live workers; the positive ratio and average latency are derived from them at scrape
+# time (see metrics_exporter.WindowStatsCollector) so they aggregate correctly across workers.
+WINDOW_PREDICTIONS = Gauge(
+    'sentiment_window_predictions',
+    'Predictions made in the sliding window, by experiment variant and sentiment',
+    ['experiment_variant', 'window', 'sentiment'],
+    multiprocess_mode='livesum'
+)
+WINDOW_REQUESTS = Gauge(
+    'sentiment_window_requests',
+    'Prediction requests served in the sliding window, by experiment variant',
+    ['experiment_variant', 'window'],
+    multiprocess_mode='livesum'
+)
+WINDOW_REQUEST_SECONDS = Gauge(
+    'sentiment_window_request_seconds',
+    'Total latency of the prediction requests served in the sliding window, by experiment variant',
+    ['experiment_variant', 'window'],
+    multiprocess_mode='livesum'
+)
+
+WINDOW_GAUGES = (WINDOW_PREDICTIONS, WINDOW_REQUESTS, WINDOW_REQUEST_SECONDS)
+
+
+def parse_window(label):
+    """Length in seconds of a window written as '<number><s|m|h>' ('90s', '5m', '1h')."""
+    try:
+        seconds = int(label[:-1]) * _UNITS[label[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise ValueError(f"Invalid window '{label}', expected '<number><s|m|h>'") from None
+    if seconds <= 0:
+        raise ValueError(f"Invalid window '{label}', it must be longer than 0s")
+    return seconds
+
+
+class _Buckets:
+    """Ring of per-bucket totals of one experiment variant, long enough for the longest window."""
+
+    __slots__ = ('epochs', 'predictions', 'requests', 'seconds')
+
+    def __init__(self, size):
+        self.epochs = [-1] * size
+        self.predictions = [[0] * len(SENTIMENTS) for _ in range(size)]
+        self.requests = [0] * size
+        self.seconds = [0.0] * size
+
+    def slot(self, epoch):
+        """Index of the bucket of an epoch, reusing (and clearing) the bucket it last held."""
+        index = epoch % len(self.epochs)
+        if self.epochs[index] != epoch:
+            self.epochs[index] = epoch
+            self.predictions[index] = [0] * len(SENTIMENTS)
+            self.requests[index] = 0
+            self.seconds[index] = 0.0
+        return index
+
+    def totals(self, epoch, buckets):
+        """Sum of the last `buckets` buckets up to epoch: (predictions per sentiment, requests, seconds)."""
+        predictions = [0] * len(SENTIMENTS)
+        requests = 0
+        seconds = 0.0
+        size = len(self.epochs)
+        for bucket_epoch in range(epoch - buckets + 1, epoch + 1):
+            index = bucket_epoch % size
+            if self.epochs[index] != bucket_epoch:
+                continue
+            for i, count in enumerate(self.predictions[index]):
+                predictions[i] += count
+            requests += self.requests[index]
+            seconds += self.seconds[index]
+        return predictions, requests, seconds
+
+
+class SlidingWindowStats:
+    """
+    Prediction volume, sentiment mix and latency per experiment variant over sliding windows.
+
+    Events are added to time buckets of bucket_seconds in a ring per variant that
+    covers the longest window, so memory does not grow with traffic and old traffic
+    is forgotten: a window's totals are the sum of its most recent buckets (the
+    current, partly filled bucket included). At most max_variants variants are
+    tracked, later ones are counted as 'other'.
+
+    A background thread copies the totals of this worker into the sentiment_window_*
+    gauges every bucket, so they slide even when no traffic comes in.
+    """
+
+    def __init__(self, windows=SENTIMENT_WINDOWS, bucket_seconds=SENTIMENT_WINDOW_BUCKET_SECONDS,
+                 max_variants=SENTIMENT_WINDOW_MAX_VARIANTS):
+        self.windows = {label: parse_window(label) for label in windows}
+        self.bucket_seconds = bucket_seconds
+        self.max_variants = max_variants
+        self._window_buckets = {
+            label: max(1, -(-seconds // bucket_seconds)) for label, seconds in self.windows.items()
+        }
+        self._size = max(self._window_buckets.values(), default=1)
+        self._start()
+        # Threads do not survive fork, and each gunicorn worker (preload_app) exports its own totals
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._variants = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sentiment-windows", daemon=True)
+        self._thread.start()
+
+    def _epoch(self):
+        return int(time.monotonic() // self.bucket_seconds)
+
+    def _buckets(self, experiment_variant):
+        # Called with the lock held
+        buckets = self._variants.get(experiment_variant)
+        if buckets is None:
+            if len(self._variants) >= self.max_variants:
+                experiment_variant = OTHER_VARIANT
+                buckets = self._variants.get(OTHER_VARIANT)
+            if buckets is None:
+                buckets = self._variants[experiment_variant] = _Buckets(self._size)
+        return buckets
+
+    def record_predictions(self, experiment_variant, label_counts):
+        """Add predictions, given as {sentiment label: count}."""
+        epoch = self._epoch()
+        with self._lock:
+            buckets = self._buckets(experiment_variant)
+            counts = buckets.predictions[buckets.slot(epoch)]
+            for label, count in label_counts.items():
+                counts[SENTIMENTS.index(label)] += count
+
+    def record_request(self, experiment_variant, seconds):
+        """Add a prediction request that took the given number of seconds."""
+        epoch = self._epoch()
+        with self._lock:
+            buckets = self._buckets(experiment_variant)
+            index = buckets.slot(epoch)
+            buckets.requests[index] += 1
+            buckets.seconds[index] += seconds
+
+    def snapshot(self):
+        """
+        Current totals of this worker:
+        {variant: {window: {"predictions": {sentiment: count}, "requests": n, "request_seconds": s}}}.
+        """
+        epoch = self._epoch()
+        with self._lock:
+            totals = {
+                experiment_variant: {
+                    label: buckets.totals(epoch, window_buckets)
+                    for label, window_buckets in self._window_buckets.items()
+                }
+                for experiment_variant, buckets in self._variants.items()
+            }
+        return {
+            experiment_variant: {
+                label: {
+                    "predictions": dict(zip(SENTIMENTS, predictions)),
+                    "requests": requests,
+                    "request_seconds": seconds
+                }
+                for label, (predictions, requests, seconds) in windows.items()
+            }
+            for experiment_variant, windows in totals.items()
+        }
+
+    def export(self):
+        """Copy the current totals into the sentiment_window_* gauges."""
+        for experiment_variant, windows in self.snapshot().items():
+            for label, window in windows.items():
+                for sentiment, count in window["predictions"].items():
+                    WINDOW_PREDICTIONS.labels(
+                        experiment_variant=experiment_variant, window=label, sentiment=sentiment
+                    ).set(count)
+                WINDOW_REQUESTS.labels(experiment_variant=experiment_variant, window=label).set(window["requests"])
+                WINDOW_REQUEST_SECONDS.labels(
+                    experiment_variant=experiment_variant, window=label
+                ).set(window["request_seconds"])
+
+    def _run(self):
+        while True:
+            time.sleep(self.bucket_seconds)
+            try:
+                self.export()
+            except Exception as e:
+                logger.error("Exporting the sentiment windows failed: {}", str(e))
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import Future
+
+from prometheus_client import Counter
+
+# Prometheus metrics for request coalescing
+# Coalescing ratio: rate(...{role="follower"}) / rate(prediction_singleflight_requests_total)
+SINGLE_FLIGHT_REQUESTS = Counter(
+    'prediction_singleflight_requests_total',
+    'Upstream prediction calls made (leader) or shared with an identical in-flight call (follower)',
+    ['role']
+)
+SINGLE_FLIGHT_REQUESTS.labels(role='leader').inc(0)
+SINGLE_FLIGHT_REQUESTS.labels(role='follower').inc(0)
+
+
+def make_flight_key(data, experiment_variant):
+    """Identify a prediction request by its 'data' payload and experiment variant."""
+    return json.dumps([data, experiment_variant], sort_keys=True)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one (for threaded workers).
+
+    The first caller for a key runs fn() and the callers arriving while it is in
+    flight wait for it and receive the same result, or the same exception. The
+    key is forgotten as soon as the call finishes, so nothing is cached.
+    """
+
+    def __init__(self):
+        self._init_state()
+        # A lock held by another thread at fork time would never be released in the child
+        os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            SINGLE_FLIGHT_REQUESTS.labels(role='follower').inc()
+            return future.result()
+
+        SINGLE_FLIGHT_REQUESTS.labels(role='leader').inc()
+        try:
+            result = fn()
+        except Exception as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent identical calls into one (for the asyncio event loop).
+
+    The shared call runs as its own task, so a leader whose client disconnects
+    does not cancel the call the other waiters depend on.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coroutine_fn):
+        task = self._calls.get(key)
+        if task is not None:
+            SINGLE_FLIGHT_REQUESTS.labels(role='follower').inc()
+        else:
+            SINGLE_FLIGHT_REQUESTS.labels(role='leader').inc()
+            task = self._calls[key] = asyncio.ensure_future(coroutine_fn())
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark the exception retrieved even if every waiter went away
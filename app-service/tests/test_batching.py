@@ -0,0 +1,53 @@
+"""
+Grouping of concurrent single predictions into upstream batch calls.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def predict_all(batcher, texts):
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        futures = [executor.submit(batcher.predict, text, 5) for text in texts]
+        return [future.result() for future in futures]
+
+
+def test_concurrent_predictions_are_sent_as_one_batch():
+    batches = []
+
+    def predict_batch(texts):
+        batches.append(texts)
+        return [{"prediction": len(text)} for text in texts]
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=3, max_wait_ms=5000, max_in_flight=1)
+    results = predict_all(batcher, ["a", "bb", "ccc"])
+
+    # Each caller gets the result of its own text
+    assert results == [{"prediction": 1}, {"prediction": 2}, {"prediction": 3}]
+    assert len(batches) == 1 and sorted(batches[0]) == ["a", "bb", "ccc"]
+
+
+def test_a_batch_is_sent_when_the_wait_ends():
+    batcher = MicroBatcher(lambda texts: [{"prediction": 1} for _ in texts],
+                           max_batch_size=100, max_wait_ms=10, max_in_flight=1)
+    assert batcher.predict("a", timeout=5) == {"prediction": 1}
+
+
+def test_every_caller_gets_the_batch_failure():
+    def predict_batch(texts):
+        raise ConnectionError("model down")
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=2, max_wait_ms=5000, max_in_flight=1)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(batcher.predict, text, 5) for text in ("a", "b")]
+        for future in futures:
+            with pytest.raises(ConnectionError):
+                future.result()
+
+
+def test_a_wrong_number_of_predictions_fails_the_batch():
+    batcher = MicroBatcher(lambda texts: [], max_batch_size=1, max_wait_ms=10, max_in_flight=1)
+    with pytest.raises(ValueError):
+        batcher.predict("a", timeout=5)
@@ -0,0 +1,70 @@
+"""
+State transitions of the model-service circuit breaker.
+"""
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+RECOVERY_TIMEOUT = 0.05
+
+
+def open_breaker(**kwargs):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=RECOVERY_TIMEOUT, **kwargs)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_consecutive_failures_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert 1 <= excinfo.value.retry_after <= 30
+
+
+def test_a_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_a_limited_number_of_trial_calls_through():
+    breaker = open_breaker(half_open_max_calls=1)
+    time.sleep(RECOVERY_TIMEOUT)
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_a_successful_trial_call_closes_the_circuit():
+    breaker = open_breaker()
+    time.sleep(RECOVERY_TIMEOUT)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_a_failed_trial_call_opens_the_circuit_again():
+    breaker = open_breaker()
+    time.sleep(RECOVERY_TIMEOUT)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
@@ -0,0 +1,67 @@
+"""
+Shedding and AIMD adaptation of the /predict concurrency limiter.
+"""
+from concurrency_limit import AdaptiveConcurrencyLimiter
+
+
+def make_limiter(initial_limit=4):
+    return AdaptiveConcurrencyLimiter(initial_limit=initial_limit, min_limit=1, max_limit=100,
+                                      latency_tolerance=2.0, backoff_ratio=0.5, low_priority_share=0.5)
+
+
+def test_requests_beyond_the_limit_are_shed():
+    limiter = make_limiter()
+    assert all(limiter.try_acquire() for _ in range(4))
+    assert not limiter.try_acquire()
+
+    limiter.release()
+    assert limiter.try_acquire()
+
+
+def test_low_priority_requests_are_shed_first():
+    limiter = make_limiter()
+    assert limiter.try_acquire(high_priority=False)
+    assert limiter.try_acquire(high_priority=False)
+    assert not limiter.try_acquire(high_priority=False)
+    assert limiter.try_acquire(high_priority=True)
+
+
+def test_fast_calls_under_load_grow_the_limit():
+    limiter = make_limiter(initial_limit=10)
+    for _ in range(10):
+        limiter.try_acquire()
+    # Each call grows the limit by 1/limit while all of it is in use
+    for _ in range(30):
+        limiter.release(latency=0.01)
+        assert limiter.try_acquire()
+    assert limiter.limit == 12
+
+
+def test_calls_without_load_keep_the_limit():
+    limiter = make_limiter(initial_limit=10)
+    for _ in range(50):
+        limiter.try_acquire()
+        limiter.release(latency=0.01)
+    assert limiter.limit == 10
+
+
+def test_a_round_of_slow_calls_backs_off_once():
+    limiter = make_limiter(initial_limit=10)
+    for _ in range(4):
+        limiter.try_acquire()
+    limiter.release(latency=0.01)
+    # Three calls sent before the first backoff all see the overload
+    limiter.release(latency=0.1)
+    limiter.release(latency=0.1)
+    limiter.release(latency=0.1)
+    assert limiter.limit == 5
+
+
+def test_failed_calls_back_off_and_calls_without_latency_do_not():
+    limiter = make_limiter(initial_limit=10)
+    limiter.try_acquire()
+    limiter.release()
+    assert limiter.limit == 10
+    limiter.try_acquire()
+    limiter.release(failed=True)
+    assert limiter.limit == 5
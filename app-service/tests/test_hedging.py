@@ -0,0 +1,165 @@
+"""
+Retry budget, retries and hedged requests for model-service calls.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hedging import HedgeDelay, Hedger, Retrier, RetryBudget
+
+HEDGE_DELAY = 0.02
+
+
+def succeeded(result):
+    return result != 'error'
+
+
+def make_hedger(budget=None):
+    delay = HedgeDelay(min_delay=HEDGE_DELAY, max_delay=HEDGE_DELAY)
+    return Hedger(enabled=True, delay=delay, budget=budget or RetryBudget(percent=100, min_concurrency=1))
+
+
+def slow_then_fast(slow='slow', fast='fast'):
+    """An attempt whose first call answers after 0.3s and every later call at once."""
+    calls = itertools.count()
+
+    def attempt():
+        if next(calls) == 0:
+            time.sleep(0.3)
+            return slow
+        return fast
+    return attempt
+
+
+def test_retry_budget_follows_the_calls_in_flight():
+    budget = RetryBudget(percent=50, min_concurrency=1)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    budget.release()
+
+    with budget.call(), budget.call(), budget.call(), budget.call():
+        assert budget.try_acquire()
+        assert budget.try_acquire()
+        assert not budget.try_acquire()
+
+
+def test_hedge_delay_is_the_quantile_of_recent_latencies():
+    delay = HedgeDelay(quantile=0.9, min_delay=0.001, max_delay=1.0, min_samples=10, refresh_every=10)
+    assert delay.value == 1.0
+    for latency in range(1, 11):
+        delay.observe(latency / 100)
+    assert delay.value == 0.10
+
+    for _ in range(10):
+        delay.observe(5.0)
+    assert delay.value == 1.0
+
+
+def test_retries_until_an_attempt_succeeds():
+    answers = iter(['error', 'error', 'ok'])
+    discarded = []
+    retrier = Retrier(max_attempts=3, base_backoff=0, budget=RetryBudget(percent=100, min_concurrency=5))
+
+    assert retrier.call(lambda: next(answers), lambda e: True, succeeded, discarded.append) == 'ok'
+    assert discarded == ['error', 'error']
+
+
+def test_gives_up_after_max_attempts():
+    attempts = []
+
+    def attempt():
+        attempts.append(1)
+        raise ConnectionError("model down")
+
+    retrier = Retrier(max_attempts=3, base_backoff=0, budget=RetryBudget(percent=100, min_concurrency=5))
+    with pytest.raises(ConnectionError):
+        retrier.call(attempt, lambda e: isinstance(e, ConnectionError), succeeded, lambda result: None)
+    assert len(attempts) == 3
+
+
+def test_does_not_retry_without_budget_or_for_other_errors():
+    budget = RetryBudget(percent=0, min_concurrency=0)
+    retrier = Retrier(max_attempts=3, base_backoff=0, budget=budget)
+    assert retrier.call(lambda: 'error', lambda e: True, succeeded, lambda result: None) == 'error'
+
+    attempts = []
+
+    def attempt():
+        attempts.append(1)
+        raise KeyError('data')
+
+    retrier = Retrier(max_attempts=3, base_backoff=0, budget=RetryBudget(percent=100, min_concurrency=5))
+    with pytest.raises(KeyError):
+        retrier.call(attempt, lambda e: isinstance(e, ConnectionError), succeeded, lambda result: None)
+    assert attempts == [1]
+
+
+def test_a_fast_call_is_not_hedged():
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        return 'fast'
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert make_hedger().call(attempt, executor, succeeded, lambda result: None) == 'fast'
+    assert calls == [1]
+
+
+def test_a_slow_call_is_hedged_and_the_loser_discarded():
+    discarded = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = make_hedger().call(slow_then_fast(), executor, succeeded, discarded.append)
+    assert result == 'fast'
+    assert discarded == ['slow']
+
+
+def test_a_failed_hedge_does_not_win():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = make_hedger().call(slow_then_fast(fast='error'), executor, succeeded, lambda result: None)
+    assert result == 'slow'
+
+
+def test_no_hedge_is_sent_without_budget():
+    budget = RetryBudget(percent=0, min_concurrency=0)
+    calls = []
+    lock = threading.Lock()
+
+    def attempt():
+        with lock:
+            calls.append(1)
+        time.sleep(HEDGE_DELAY * 3)
+        return 'slow'
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert make_hedger(budget).call(attempt, executor, succeeded, lambda result: None) == 'slow'
+    assert calls == [1]
+
+
+def test_the_losing_async_attempt_is_cancelled():
+    cancelled = []
+    calls = itertools.count()
+
+    async def attempt():
+        if next(calls) == 0:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return 'slow'
+        return 'fast'
+
+    async def discard(result):
+        pass
+
+    budget = RetryBudget(percent=100, min_concurrency=1)
+    result = asyncio.run(make_hedger(budget).acall(attempt, succeeded, discard))
+    assert result == 'fast'
+    assert cancelled == [1]
+    # The hedge gave its room in the budget back
+    assert budget.try_acquire()
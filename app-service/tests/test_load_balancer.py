@@ -0,0 +1,86 @@
+"""
+Instance selection and outlier ejection of the model-service load balancer.
+"""
+import pytest
+
+from load_balancer import BackendPool, ModelServiceRouter, parse_urls, parse_variant_urls
+
+URLS = ['http://a:8080', 'http://b:8080']
+
+
+def make_pool(urls=URLS, strategy='least_outstanding', max_ejection_percent=50):
+    return BackendPool('test', urls, strategy=strategy, failure_threshold=2, base_ejection_time=30,
+                       max_ejection_time=300, max_ejection_percent=max_ejection_percent)
+
+
+def fail(pool, backend, times):
+    """Record `times` failed calls to backend."""
+    for _ in range(times):
+        backend.outstanding += 1
+        pool.release(backend, 0.01, failed=True)
+
+
+def test_urls_are_parsed():
+    assert parse_urls(" http://a:8080/, http://b:8080|http://c:8080 ,") == [
+        'http://a:8080', 'http://b:8080', 'http://c:8080'
+    ]
+    assert parse_variant_urls("variant_b=http://a:8080|http://b:8080, variant_c=http://c:8080") == {
+        'variant_b': ['http://a:8080', 'http://b:8080'], 'variant_c': ['http://c:8080']
+    }
+
+
+def test_unknown_strategies_are_rejected():
+    with pytest.raises(ValueError):
+        make_pool(strategy='round_robin')
+
+
+@pytest.mark.parametrize('strategy', ['least_outstanding', 'p2c'])
+def test_calls_go_to_the_least_busy_instance(strategy):
+    pool = make_pool(strategy=strategy)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.url, second.url} == set(URLS)
+
+    pool.release(first, 0.01, failed=False)
+    assert pool.acquire() is first
+
+
+def test_failing_instances_are_ejected():
+    pool = make_pool()
+    bad, good = pool.backends
+    fail(pool, bad, 2)
+    assert [status["ejected"] for status in pool.status()] == [True, False]
+    assert all(pool.acquire() is good for _ in range(5))
+
+
+def test_a_success_resets_the_failure_count():
+    pool = make_pool()
+    backend = pool.backends[0]
+    fail(pool, backend, 1)
+    backend.outstanding += 1
+    pool.release(backend, 0.01, failed=False)
+    fail(pool, backend, 1)
+    assert not any(status["ejected"] for status in pool.status())
+
+
+def test_no_more_than_the_max_ejection_percent_is_ejected():
+    pool = make_pool()
+    first, second = pool.backends
+    fail(pool, first, 2)
+    fail(pool, second, 2)
+    assert [status["ejected"] for status in pool.status()] == [True, False]
+
+    # A single instance is never ejected
+    single = make_pool(urls=URLS[:1])
+    fail(single, single.backends[0], 5)
+    assert single.status()[0]["ejected"] is False
+
+
+def test_variants_are_routed_to_their_own_pool():
+    router = ModelServiceRouter(URLS, {'variant_b': ['http://c:8080'], 'variant_c': []})
+    assert router.routes_variant('variant_b')
+    assert not router.routes_variant('variant_c')
+    assert router.pool('variant_b').urls == ['http://c:8080']
+    assert router.pool('variant_c') is router.default_pool
+    assert router.pool() is router.default_pool
+    assert set(router.status()) == {'default', 'variant_b'}
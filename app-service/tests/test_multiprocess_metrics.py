@@ -0,0 +1,138 @@
+"""
+Gauges of a preloaded 2-worker gunicorn run, scraped from /metrics.
+
+Starts the fake model-service and the service with the production gunicorn
+config, sends predictions through both workers and checks that the livesum and
+livemax gauges add up over the workers only, without the gunicorn master.
+"""
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+from prometheus_client.parser import text_string_to_metric_families
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 2
+INITIAL_LIMIT = 20
+MAX_HEDGE_DELAY_MS = 1000
+
+pytestmark = pytest.mark.skipif(shutil.which('gunicorn') is None, reason="gunicorn is not installed")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def wait_for_workers(metrics_dir, master_pid, timeout=30):
+    """Wait until every worker has written its live gauges."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pids = {path.stem.rsplit('_', 1)[1] for path in metrics_dir.glob('gauge_live*.db')}
+        if len(pids - {str(master_pid)}) >= WORKERS:
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"{WORKERS} workers did not start within {timeout}s")
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+@pytest.fixture(scope='module')
+def service(tmp_path_factory):
+    run_dir = tmp_path_factory.mktemp('gunicorn')
+    model_port, app_port = free_port(), free_port()
+    model_service = subprocess.Popen(
+        [sys.executable, os.path.join('benchmarks', 'fake_model_service.py'),
+         '--port', str(model_port), '--latency-ms', '5', '--jitter-ms', '1'],
+        cwd=SERVICE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    env = dict(
+        os.environ,
+        MODEL_SERVICE_URL=f"http://127.0.0.1:{model_port}",
+        GUNICORN_BIND=f"127.0.0.1:{app_port}",
+        GUNICORN_WORKERS=str(WORKERS),
+        GUNICORN_PRELOAD='true',
+        PROMETHEUS_MULTIPROC_DIR=str(run_dir / 'prometheus'),
+        RATINGS_DB_PATH=str(run_dir / 'ratings.db'),
+        PREDICTION_CACHE_BACKEND='none',
+        CONCURRENCY_INITIAL_LIMIT=str(INITIAL_LIMIT),
+        HEDGE_ENABLED='true',
+        HEDGE_MAX_DELAY_MS=str(MAX_HEDGE_DELAY_MS),
+        LOG_LEVEL='WARNING',
+    )
+    app_service = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py'], cwd=SERVICE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f"http://127.0.0.1:{app_port}"
+        wait_for(f"http://127.0.0.1:{model_port}/")
+        wait_for(f"{base_url}/ready")
+        wait_for_workers(run_dir / 'prometheus', app_service.pid)
+        yield base_url
+    finally:
+        stop(app_service)
+        stop(model_service)
+
+
+def scrape(base_url):
+    """{(sample name, sorted labels): value} of every sample served at /metrics."""
+    text = requests.get(f"{base_url}/metrics", timeout=5).text
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+    }
+
+
+def predict(base_url, predictions=400):
+    with requests.Session() as session:
+        for i in range(predictions):
+            # A new connection per call spreads the calls over the workers
+            response = session.post(f"{base_url}/predict", json={"data": f"great food {i}"},
+                                    headers={"Connection": "close"}, timeout=10)
+            assert response.status_code == 200
+
+
+def test_gauges_count_workers_but_not_the_master(service):
+    base_url = service
+    before = scrape(base_url)
+    # Every worker starts at the initial limit; the master's copy is not added to the livesum
+    assert before[('predict_concurrency_limit', ())] == WORKERS * INITIAL_LIMIT
+    # Each live process reports exactly one circuit state, and every worker reports closed
+    assert before[('model_service_circuit_state', (('state', 'closed'),))] == 1
+    assert before[('model_service_circuit_state', (('state', 'open'),))] == 0
+    assert before[('model_service_circuit_state', (('state', 'half_open'),))] == 0
+
+    predict(base_url)
+    after = scrape(base_url)
+    # The learned per-worker delays are no longer masked by the master's initial maximum
+    assert after[('model_service_hedge_delay_seconds', ())] < MAX_HEDGE_DELAY_MS / 1000
+    assert after[('model_service_circuit_state', (('state', 'closed'),))] == 1
+    assert after[('predict_concurrency_limit', ())] >= WORKERS
@@ -0,0 +1,56 @@
+"""
+Keys and LRU/TTL eviction of the memory and SQLite prediction caches.
+"""
+import pytest
+
+from prediction_cache import MemoryPredictionCache, SQLitePredictionCache, make_cache_key, normalize_text
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    def make(max_entries=100, ttl=60):
+        if request.param == 'memory':
+            return MemoryPredictionCache(max_entries=max_entries, ttl=ttl)
+        return SQLitePredictionCache(path=str(tmp_path / 'cache.sqlite3'), max_entries=max_entries,
+                                     ttl=ttl, sweep_every=1)
+    return make
+
+
+def test_trivially_different_texts_share_a_key():
+    assert normalize_text("  great\tfood \n") == "great food"
+    assert make_cache_key("great  food", "v1") == make_cache_key(" great food", "v1")
+    assert make_cache_key("great food", "v1") != make_cache_key("great food", "v2")
+
+
+def test_stored_predictions_are_returned(make_cache):
+    cache = make_cache()
+    assert cache.get('a') is None
+    cache.set('a', {"prediction": 1})
+    assert cache.get('a') == {"prediction": 1}
+
+    cache.clear()
+    assert cache.get('a') is None
+
+
+def test_expired_entries_are_misses(make_cache):
+    cache = make_cache(ttl=0)
+    cache.set('a', {"prediction": 1})
+    assert cache.get('a') is None
+
+
+def test_the_least_recently_used_entry_is_evicted(make_cache):
+    cache = make_cache(max_entries=2)
+    cache.set('a', {"prediction": 1})
+    cache.set('b', {"prediction": 0})
+    assert cache.get('a') == {"prediction": 1}
+    cache.set('c', {"prediction": 1})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {"prediction": 1}
+    assert cache.get('c') == {"prediction": 1}
+
+
+def test_sqlite_entries_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    SQLitePredictionCache(path=path).set('a', {"prediction": 1})
+    assert SQLitePredictionCache(path=path).get('a') == {"prediction": 1}
@@ -0,0 +1,49 @@
+"""
+Write-behind queue in front of the ratings store.
+"""
+import uuid
+
+from prometheus_client import REGISTRY
+
+from rating_writer import WriteBehindRatingWriter
+from ratings_store import RatingsStore
+
+
+def make_rating(rating=5, restaurant='Bistro'):
+    return {
+        "id": str(uuid.uuid4()),
+        "review_text": "great food",
+        "rating": rating,
+        "sentiment": "positive",
+        "timestamp": "2025-06-01T12:30:00",
+        "restaurant": restaurant
+    }
+
+
+def failures():
+    return REGISTRY.get_sample_value('ratings_write_failures_total') or 0
+
+
+def test_submitted_ratings_are_written_on_flush(tmp_path):
+    store = RatingsStore(path=str(tmp_path / 'ratings.db'), legacy_file=None)
+    writer = WriteBehindRatingWriter(store, max_batch_size=10, flush_interval_ms=10)
+    for _ in range(25):
+        writer.submit(make_rating())
+    writer.flush()
+    assert store.count() == 25
+
+
+def test_only_the_bad_ratings_of_a_failing_batch_are_dropped(tmp_path):
+    store = RatingsStore(path=str(tmp_path / 'ratings.db'), legacy_file=None)
+    writer = WriteBehindRatingWriter(store, max_batch_size=10, flush_interval_ms=50, max_retries=1)
+    duplicate = make_rating()
+    store.add(duplicate)
+    dropped_before = failures()
+
+    for rating in (make_rating(), make_rating(), duplicate, make_rating()):
+        writer.submit(rating)
+    writer.flush()
+
+    # The duplicate id fails the batch's transaction, the other ratings are written one by one
+    assert store.count() == 4
+    assert failures() - dropped_before == 1
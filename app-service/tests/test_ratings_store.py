@@ -0,0 +1,114 @@
+"""
+Precomputed aggregates and review feeds of the SQLite ratings store.
+"""
+import sqlite3
+import uuid
+
+import pytest
+
+from ratings_store import COLUMNS, RatingsStore
+
+
+def make_rating(rating, restaurant='Bistro', sentiment='positive', timestamp='2025-06-01T12:30:00'):
+    return {
+        "id": str(uuid.uuid4()),
+        "review_text": f"{rating} stars",
+        "rating": rating,
+        "sentiment": sentiment,
+        "timestamp": timestamp,
+        "restaurant": restaurant
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RatingsStore(path=str(tmp_path / 'ratings.db'), legacy_file=None)
+
+
+def test_stats_are_kept_up_to_date(store):
+    store.add(make_rating(5))
+    store.add_many([make_rating(4), make_rating(1, sentiment='negative'), make_rating(2, restaurant='Diner')])
+
+    stats = store.stats()
+    assert store.count() == 4
+    assert stats["total"]["count"] == 4
+    assert stats["total"]["average_rating"] == 3.0
+    assert stats["total"]["stars"] == {"1": 1, "2": 1, "3": 0, "4": 1, "5": 1}
+    assert stats["by_restaurant"]["Bistro"]["average_rating"] == pytest.approx(10 / 3, abs=0.001)
+    assert stats["by_restaurant"]["Diner"]["count"] == 1
+    assert stats["by_sentiment"]["negative"]["stars"]["1"] == 1
+
+
+def test_stats_can_be_filtered(store):
+    store.add_many([make_rating(5), make_rating(1, sentiment='negative'), make_rating(3, restaurant='Diner')])
+
+    stats = store.stats(restaurant='Bistro', sentiment='positive')
+    assert stats["total"]["count"] == 1
+    assert list(stats["by_restaurant"]) == ["Bistro"]
+    assert store.stats(restaurant='Nowhere')["total"] == {
+        "count": 0, "average_rating": None, "stars": {str(star): 0 for star in range(1, 6)}
+    }
+
+
+def test_histogram_buckets_ratings_by_hour_and_day(store):
+    store.add_many([
+        make_rating(5, timestamp='2025-06-01T12:30:00'),
+        make_rating(3, timestamp='2025-06-01T12:45:00'),
+        make_rating(1, timestamp='2025-06-01T18:00:00'),
+        make_rating(4, timestamp='2025-06-02T09:00:00'),
+    ])
+
+    assert store.histogram('day') == [
+        {"bucket": "2025-06-01", "count": 3, "average_rating": 3.0},
+        {"bucket": "2025-06-02", "count": 1, "average_rating": 4.0},
+    ]
+    hours = store.histogram('hour', since='2025-06-01T12:00:00', until='2025-06-01T23:59:59')
+    assert [(bucket["bucket"], bucket["count"]) for bucket in hours] == [
+        ("2025-06-01T12:00:00", 2), ("2025-06-01T18:00:00", 1)
+    ]
+    assert len(store.histogram('day', limit=1)) == 1
+
+
+def test_aggregates_are_built_for_existing_ratings(tmp_path):
+    path = str(tmp_path / 'ratings.db')
+    RatingsStore(path=path, legacy_file=None)
+    ratings = [make_rating(5), make_rating(2, restaurant='Diner')]
+    # Ratings stored before the aggregate tables and feeds existed
+    with sqlite3.connect(path) as conn:
+        conn.executemany(f"INSERT INTO ratings ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                         [tuple(rating[column] for column in COLUMNS) for rating in ratings])
+
+    store = RatingsStore(path=path, legacy_file=None)
+    assert store.count() == 2
+    assert store.stats()["by_restaurant"]["Diner"]["average_rating"] == 2.0
+    assert store.histogram('day') == [{"bucket": "2025-06-01", "count": 2, "average_rating": 3.5}]
+    assert store.feed_version('Bistro') == 1
+    assert [review["review"] for review in store.feed('Diner')[0]] == ["2 stars"]
+
+
+def test_feed_pages_are_newest_first(store):
+    store.add_many([make_rating(star) for star in range(1, 6)])
+
+    page, cursor = store.feed('Bistro', limit=2)
+    assert [review["rating"] for review in page] == [5, 4]
+    page, cursor = store.feed('Bistro', limit=2, cursor=cursor)
+    assert [review["rating"] for review in page] == [3, 2]
+    page, cursor = store.feed('Bistro', limit=2, cursor=cursor)
+    assert [review["rating"] for review in page] == [1]
+    assert cursor is None
+
+
+def test_feeds_hold_ingested_reviews_and_change_version(store):
+    assert store.feed_version('Bistro') == 0
+    store.add(make_rating(4))
+    store.add_reviews([{
+        "restaurant": 'Bistro', "author": 'Sam', "review_text": "lovely", "sentiment": 'positive',
+        "rating": None, "timestamp": '2025-06-02T10:00:00'
+    }])
+
+    assert store.feed_version('Bistro') == 2
+    assert store.feed_version('Diner') == 0
+    reviews, _ = store.feed('Bistro')
+    assert [(review["author"], review["review"]) for review in reviews] == [("Sam", "lovely"), (None, "4 stars")]
+    # Ingested reviews are not ratings
+    assert store.count() == 1
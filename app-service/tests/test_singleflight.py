@@ -0,0 +1,106 @@
+"""
+Coalescing of concurrent identical prediction calls.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight, make_flight_key
+
+FOLLOWERS = 4
+
+
+def run_concurrently(flight, fn):
+    """Call flight.do() from a leader and FOLLOWERS threads while fn is in flight; returns their outcomes."""
+    started, release = threading.Event(), threading.Event()
+    outcomes = []
+
+    def blocking_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def caller():
+        try:
+            outcomes.append(flight.do('key', blocking_fn))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=caller)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=caller) for _ in range(FOLLOWERS)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)  # Let the followers join the call in flight
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_flight_key_depends_on_data_and_variant():
+    assert make_flight_key({"data": "a", "x": 1}, 'control') == make_flight_key({"x": 1, "data": "a"}, 'control')
+    assert make_flight_key("a", 'control') != make_flight_key("a", 'variant_b')
+
+
+def test_concurrent_calls_share_one_result():
+    calls = []
+    outcomes = run_concurrently(SingleFlight(), lambda: calls.append(1) or "positive")
+    assert calls == [1]
+    assert outcomes == ["positive"] * (FOLLOWERS + 1)
+
+
+def test_concurrent_calls_share_the_exception():
+    def fail():
+        raise ValueError("model down")
+
+    outcomes = run_concurrently(SingleFlight(), fail)
+    assert len(outcomes) == FOLLOWERS + 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+
+def test_nothing_is_cached_after_the_call():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int("not a number"))
+    assert flight.do('key', lambda: 3) == 3
+
+
+def test_async_calls_share_one_result():
+    calls = []
+
+    async def predict():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "positive"
+
+    async def main():
+        flight = AsyncSingleFlight()
+        results = await asyncio.gather(*(flight.do('key', predict) for _ in range(FOLLOWERS + 1)))
+        return results, await flight.do('key', predict)
+
+    results, later = asyncio.run(main())
+    assert results == ["positive"] * (FOLLOWERS + 1)
+    assert later == "positive"
+    assert calls == [1, 1]
+
+
+def test_async_call_survives_a_cancelled_leader():
+    async def predict():
+        await asyncio.sleep(0.05)
+        return "positive"
+
+    async def main():
+        flight = AsyncSingleFlight()
+        leader = asyncio.ensure_future(flight.do('key', predict))
+        follower = asyncio.ensure_future(flight.do('key', predict))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "positive"
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+
+from loguru import logger
+from config import MODEL_VERSION_REFRESH_INTERVAL
+from json_provider import json_dumps
+
+
+# Served until the first fetch has finished
+LOADING = {"error": "loading"}
+
+
+class VersionCache:
+    """
+    Cached /version payload refreshed in the background.
+
+    start() loads the app and lib-version details, which never change at
+    runtime, on a daemon thread and publishes them right away, then fetches the
+    model-service version and refreshes it every MODEL_VERSION_REFRESH_INTERVAL
+    seconds. Lookups never wait on the model service: until the first fetch has
+    finished they get a placeholder ({"error": "loading"} as model-service
+    version) next to the static details, and when a refresh fails the last good
+    model-service version keeps being served (marked stale), so /version
+    answers from memory even while the model service is unreachable.
+    """
+
+    def __init__(self, fetch_model_version, load_static_info, refresh_interval=MODEL_VERSION_REFRESH_INTERVAL):
+        self.fetch_model_version = fetch_model_version
+        self.load_static_info = load_static_info
+        self.static_info = None
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loaded = False
+        self._model_version = None
+        self._stale = False
+        self._publish(LOADING, False)
+        # The refresher thread does not survive fork, start a new one in every worker
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        started = self._thread is not None
+        self._lock = threading.Lock()
+        self._thread = None
+        if started:
+            self.start()
+
+    def _publish(self, model_version, stale):
+        static_info = self.static_info or {}
+        payload = {
+            "app_version": static_info.get("app_version"),
+            "model_service": model_version,
+            "model_service_stale": stale,
+            "lib_version": static_info.get("lib_version")
+        }
+        self._payload = payload
+        self._body = json_dumps(payload).encode("utf-8")
+
+    def _load_static_info(self):
+        """Load the app and lib-version details once and publish them with the current model-service version."""
+        if self.static_info is None:
+            self.static_info = self.load_static_info()
+            self._publish(self._model_version or LOADING, self._stale)
+
+    def _refresh(self):
+        """Fetch the model-service version and rebuild the cached payload."""
+        self._load_static_info()
+        try:
+            model_version = self.fetch_model_version()
+            stale = False
+        except Exception as e:
+            logger.warning("Could not refresh model service version: {}", str(e))
+            if self._model_version is not None and "error" not in self._model_version:
+                # Stale-while-revalidate: keep serving the last good version
+                model_version, stale = self._model_version, True
+            else:
+                model_version, stale = {"error": str(e)}, False
+
+        self._model_version = model_version
+        self._stale = stale
+        self._publish(model_version, stale)
+        self._loaded = True
+
+    def _run(self):
+        self._load_static_info()
+        if not self._loaded:
+            self._refresh()
+        while True:
+            time.sleep(self.refresh_interval)
+            self._refresh()
+
+    def start(self):
+        """Load the payload (unless already loaded) and keep it fresh on a background thread."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="version-refresh", daemon=True)
+                self._thread.start()
+
+    def load(self):
+        """Fetch the model-service version in the calling thread unless a good one is cached, then start() refreshing it."""
+        if self.model_version_key() == "unknown":
+            self._refresh()
+        self.start()
+
+    @property
+    def ready(self):
+        """True once the first fetch has finished (successfully or not)."""
+        return self._loaded
+
+    def payload(self):
+        """The /version response as a dict."""
+        return self._payload
+
+    def body(self):
+        """The /version response pre-serialized as JSON bytes."""
+        return self._body
+
+    def model_version_key(self):
+        """A string identifying the current model-service version, or 'unknown'."""
+        model_version = self._model_version
+        if model_version is None or "error" in model_version:
+            return "unknown"
+        return json.dumps(model_version, sort_keys=True)